@@ -0,0 +1,2 @@
+# coding=utf-8
+"""Benchmarks for the hansei client, models and report code."""
@@ -0,0 +1,79 @@
+# coding=utf-8
+"""Benchmark decoding and summing large cost report payloads.
+
+Compare the time taken to decode a report with each JSON codec and numeric
+mode of ``hansei.codec`` and to sum its line items the way
+``KokuBaseReport.calculate_total`` does.
+
+Usage::
+
+    python -m benchmarks.bench_json_codec --accounts 20 --services 20 --days 60
+"""
+import argparse
+import json
+import time
+
+from hansei import synthetic
+from hansei.codec import CODECS, NUMBER_MODES
+from hansei.exceptions import KokuException
+from hansei.koku_models import KokuCostReport
+
+
+class _CodecClient(object):
+    """Minimal stand-in for ``hansei.api.Client`` holding only a codec."""
+
+    def __init__(self, codec):
+        self.codec = codec
+
+
+def build_payload(accounts, services, days):
+    """Return a cost report grouped by account and service as JSON bytes."""
+    return json.dumps(synthetic.generate_report(
+        'costs', accounts=accounts, services=services, days=days)).encode('utf-8')
+
+
+def run(payload, codec, repeat):
+    """Return the best decode and sum times for ``codec`` in seconds."""
+    decode_time = sum_time = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        report_json = codec.decode(payload)
+        decoded = time.perf_counter()
+
+        report = KokuCostReport(_CodecClient(codec))
+        report.last_report = report_json
+        report.calculate_total()
+        summed = time.perf_counter()
+
+        decode_time = min(decode_time, decoded - start)
+        sum_time = min(sum_time, summed - decoded)
+
+    return decode_time, sum_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--services', type=int, default=20)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payload = build_payload(args.accounts, args.services, args.days)
+    print('{} line items, {:.1f} MB'.format(
+        args.accounts * args.services * args.days, len(payload) / 1024 / 1024))
+    print('{:<8} {:<8} {:>10} {:>10} {:>10}'.format('codec', 'numbers', 'decode', 'sum', 'total'))
+
+    for name, codec_class in sorted(CODECS.items()):
+        for numbers in NUMBER_MODES:
+            try:
+                codec = codec_class(numbers=numbers)
+            except KokuException:
+                continue
+            decode_time, sum_time = run(payload, codec, args.repeat)
+            print('{:<8} {:<8} {:>9.3f}s {:>9.3f}s {:>9.3f}s'.format(
+                name, numbers, decode_time, sum_time, decode_time + sum_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# coding=utf-8
+"""Benchmark the traversal of report line items.
+
+Compare the time and peak memory of the former recursive traversal, which
+built a new list at every level of the report, with the explicit stack walk
+of ``KokuBaseReport``, both to list the line items and to sum them the way
+``calculate_total`` does. ``paths`` iterates over ``iter_line_items``, which
+also builds the group path of every line item.
+
+Usage::
+
+    python -m benchmarks.bench_line_items --accounts 200 --services 50 --days 60
+"""
+import argparse
+import time
+import tracemalloc
+
+from hansei import synthetic
+from hansei.codec import get_codec
+from hansei.koku_models import KokuCostReport
+
+
+class _CodecClient(object):
+    """Minimal stand-in for ``hansei.api.Client`` holding only a codec."""
+
+    def __init__(self, codec):
+        self.codec = codec
+
+
+def recursive_line_items(root_object):
+    """The recursive traversal ``iter_line_items`` replaced, for reference."""
+    line_item_list = []
+
+    root_object_type = type(root_object)
+    if not root_object or (root_object_type not in [list, dict]):
+        return line_item_list
+
+    if root_object_type is list:
+        for item in root_object:
+            if type(item) in [list, dict]:
+                line_item_list.extend(recursive_line_items(item))
+    else:
+        if 'values' in root_object:
+            return line_item_list + root_object['values']
+
+        for key, val in root_object.items():
+            if type(val) in [list, dict]:
+                line_item_list.extend(recursive_line_items(val))
+
+    return line_item_list
+
+
+def measure(func, repeat):
+    """Return the best time and the peak memory in bytes of ``func()``."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=200)
+    parser.add_argument('--services', type=int, default=50)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    report = KokuCostReport(_CodecClient(get_codec('stdlib')))
+    report.last_report = synthetic.generate_report(
+        'costs', accounts=args.accounts, services=args.services, days=args.days)
+    data = report.data
+
+    def recursive_total():
+        report._sum(item['total'] for item in recursive_line_items(data))
+
+    def iterative_total():
+        report._clear_report_cache()
+        report.calculate_total()
+
+    cases = [
+        ('list', 'recursive', lambda: recursive_line_items(data)),
+        ('list', 'iterative', lambda: report._traverse_report_line_items(data)),
+        ('paths', 'iterative', lambda: sum(1 for _ in report.iter_line_items(data))),
+        ('total', 'recursive', recursive_total),
+        ('total', 'iterative', iterative_total),
+    ]
+
+    print('{} line items'.format(args.accounts * args.services * args.days))
+    print('{:<6} {:<10} {:>10} {:>12}'.format('task', 'traversal', 'time', 'peak memory'))
+    for task, traversal, func in cases:
+        best, peak = measure(func, args.repeat)
+        print('{:<6} {:<10} {:>9.3f}s {:>9.1f} MB'.format(
+            task, traversal, best, peak / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# coding=utf-8
+"""Benchmark how the report code scales with the number of line items.
+
+Synthetic cost reports grouped by account and service are written to disk by
+``hansei.synthetic``, from a thousand line items up to ``--max-items``. For
+each size the report is decoded whole and traversed with
+``KokuBaseReport.report_line_items`` and ``calculate_total``, then parsed
+incrementally with ``hansei.streaming.ReportStream``.
+
+Usage::
+
+    python -m benchmarks.bench_report_scale --max-items 10000000 --skip-decode-above 1000000
+"""
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+from hansei import synthetic
+from hansei.codec import get_codec
+from hansei.koku_models import KokuCostReport
+from hansei.streaming import ReportStream
+
+
+class _CodecClient(object):
+    """Minimal stand-in for ``hansei.api.Client`` holding only a codec."""
+
+    def __init__(self, codec):
+        self.codec = codec
+
+
+def shape(items, days=10, services=10):
+    """Return (accounts, services, days) giving about ``items`` line items."""
+    days = min(days, items)
+    services = min(services, max(items // days, 1))
+    accounts = max(items // (days * services), 1)
+    return accounts, services, days
+
+
+def read_chunks(path, chunk_size=64 * 1024):
+    with gzip.open(path, 'rb') as report_file:
+        for chunk in iter(lambda: report_file.read(chunk_size), b''):
+            yield chunk
+
+
+def run(path, codec, decode):
+    """Return the (decode, traverse, total, stream) times of a report file."""
+    times = [None, None, None, None]
+    if decode:
+        start = time.perf_counter()
+        with gzip.open(path, 'rb') as report_file:
+            report_json = codec.decode(report_file.read())
+        times[0] = time.perf_counter() - start
+
+        report = KokuCostReport(_CodecClient(codec))
+        report.last_report = report_json
+        start = time.perf_counter()
+        report.report_line_items()
+        times[1] = time.perf_counter() - start
+
+        report._clear_report_cache()
+        start = time.perf_counter()
+        report.calculate_total()
+        times[2] = time.perf_counter() - start
+        del report, report_json
+
+    start = time.perf_counter()
+    stream = ReportStream(read_chunks(path), decoder=codec.json_decoder)
+    codec.sum(line_item['total'] for _, line_item in stream)
+    times[3] = time.perf_counter() - start
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-items', type=int, default=1000000)
+    parser.add_argument('--skip-decode-above', type=int, default=None,
+                        help='Only stream the reports larger than this many line items')
+    parser.add_argument('--json-codec', default='auto')
+    parser.add_argument('--directory', default=None,
+                        help='Directory the reports are written to. Defaults to a temporary one')
+    args = parser.parse_args()
+
+    codec = get_codec(args.json_codec)
+    directory = args.directory or tempfile.mkdtemp(prefix='hansei-bench-')
+
+    def seconds(value):
+        return '{:>9.3f}s'.format(value) if value is not None else '{:>10}'.format('-')
+
+    print('{:>10} {:>9} {:>10} {:>10} {:>10} {:>10} {:>10} {:>12}'.format(
+        'items', 'MB (gz)', 'generate', 'decode', 'traverse', 'total', 'stream',
+        'stream/item'))
+
+    items = 1000
+    while items <= args.max_items:
+        accounts, services, days = shape(items)
+        path = os.path.join(directory, 'costs-{}.json.gz'.format(items))
+
+        start = time.perf_counter()
+        line_items = synthetic.write_report(
+            path, 'costs', accounts=accounts, services=services, days=days)
+        generate_time = time.perf_counter() - start
+
+        decode = args.skip_decode_above is None or line_items <= args.skip_decode_above
+        decode_time, traverse_time, total_time, stream_time = run(path, codec, decode)
+        print('{:>10} {:>9.1f} {} {} {} {} {} {:>10.2f}us'.format(
+            line_items, os.path.getsize(path) / 1024 / 1024, seconds(generate_time),
+            seconds(decode_time), seconds(traverse_time), seconds(total_time),
+            seconds(stream_time), stream_time / line_items * 1e6))
+
+        if not args.directory:
+            os.remove(path)
+        items *= 10
+
+    if not args.directory:
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,8 @@ Global pytest plugins and hooks
 
 import os
 
-from hansei import config as hansei_config
+from hansei import config as hansei_config, metrics as hansei_metrics
+from hansei.cassette import close_shared_cassettes
 
 # This file should be reserved for command line args to modify the Hansei environment for a test run
 # TODO: Use a plugin to move this functionality under the hansei folder
@@ -22,8 +23,27 @@ def pytest_addoption(parser):
     koku_group.addoption(
         "--koku-host-port", action="store", default=os.environ.get('KOKU_PORT'),
         help='Set the Koku service port. DEFAULT: KOKU_PORT')
+    koku_group.addoption(
+        "--koku-record", action="store", default=None, metavar='CASSETTE',
+        help='Record every Koku request and response to the CASSETTE file')
+    koku_group.addoption(
+        "--koku-replay", action="store", default=None, metavar='CASSETTE',
+        help='Serve Koku responses from the CASSETTE file instead of the server')
+    koku_group.addoption(
+        "--koku-metrics", action="store_true", default=False,
+        help='Report per-endpoint request metrics and report latencies at the end of the run. '
+             'Use -v to list the latency of every report query')
 
 def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'report_matrix(report_class=...): fetch the report_filter and group_by parameters of the '
+        'test once per session with the report_matrix fixture')
+    config.addinivalue_line(
+        'markers',
+        'fake_koku(**kwargs): data set options of the fake Koku server run by the fake_koku_server '
+        'fixture')
+
     koku_admin = config.getoption('koku_admin_username')
     koku_admin_pw = config.getoption('koku_admin_password')
     koku_hostname = config.getoption('koku_hostname')
@@ -42,3 +62,33 @@ def pytest_configure(config):
 
     if koku_host_port:
         koku_config['port'] = koku_host_port
+
+    if config.getoption('koku_metrics'):
+        koku_config['metrics'] = True
+
+    if config.getoption('koku_record'):
+        koku_config['cassette'] = {'mode': 'record', 'path': config.getoption('koku_record')}
+    elif config.getoption('koku_replay'):
+        koku_config['cassette'] = {'mode': 'replay', 'path': config.getoption('koku_replay')}
+
+def pytest_unconfigure(config):
+    # Complete the cassette being recorded
+    close_shared_cassettes()
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    # --koku-metrics sets the config key in pytest_configure
+    if not hansei_config.get_config().get('koku', {}).get('metrics'):
+        return
+
+    terminalreporter.section('Koku request metrics')
+    terminalreporter.write_line(hansei_metrics.SESSION_METRICS.report())
+
+    # Set by the report_matrix fixture
+    report_matrix = getattr(config, 'koku_report_matrix', None)
+    if report_matrix is not None and report_matrix.fetched:
+        terminalreporter.section('Koku report latency')
+        terminalreporter.write_line(report_matrix.latency_summary())
+        # The latency of every query for every customer
+        if config.getoption('verbose') > 0:
+            terminalreporter.write_line('')
+            terminalreporter.write_line(report_matrix.latency_report())
@@ -6,23 +6,50 @@ server, allowing the user to customize how return codes are handled depending
 on the context.
 
 """
+import asyncio
+import contextlib
+import functools
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from json import JSONDecodeError
 from pprint import pformat
-from urllib.parse import urljoin, urlunparse
+from urllib.parse import urljoin, urlsplit, urlunparse, urlunsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
 
 from hansei import config
 from hansei import exceptions
+from hansei import metrics
+from hansei.cassette import RecordingAdapter, ReplayAdapter, shared_cassette
+from hansei.codec import get_codec
+from hansei.http_cache import ResponseCache, request_key
+from hansei.ratelimit import shared_limiter
+from hansei.report_cache import shared_report_cache
+from hansei.retry import RetryPolicy
+from hansei.single_flight import SingleFlight
+from hansei.token_cache import TokenCache
 from hansei.constants import (
     KOKU_API_VERSION,
     KOKU_TOKEN_PATH,
     KOKU_DEFAULT_USER,
     KOKU_DEFAULT_PASSWORD,
+    KOKU_FIXED_POINT_SCALE,
+    KOKU_KEEP_ALIVE_TIMEOUT,
+    KOKU_POOL_CONNECTIONS,
+    KOKU_POOL_MAX_RETRIES,
+    KOKU_POOL_MAXSIZE,
+    KOKU_TOKEN_CACHE_TTL,
 )
 
 
+COALESCED_KWARGS = frozenset(['params', 'verify'])
+"""Request keyword arguments covered by the key of a coalesced GET request."""
+
+
 def raise_error_for_status(response):
     """Generate an error message and raise HTTPError for bad return codes.
 
@@ -50,6 +77,7 @@ def raise_error_for_status(response):
             [
                 'request path : {}'.format(pformat(
                     r.request.path_url)),
+                'request attempts : {}'.format(getattr(r, 'attempts', 1)),
                 'request body : {}'.format(pformat(
                     r.request.body)),
                 'request headers : {}'.format(pformat(
@@ -79,6 +107,19 @@ def code_handler(response):
     return response
 
 
+def decode_json(response):
+    """Decode the response body as JSON.
+
+    Responses received through ``hansei.api.Client`` are decoded with the
+    client's codec, see ``hansei.codec``. Other responses are decoded by
+    ``requests``.
+    """
+    codec = getattr(response, 'codec', None)
+    if codec is None:
+        return response.json()
+    return codec.decode(response.content)
+
+
 def json_handler(response):
     """Like ``code_handler``, but also return a JSON-decoded response body.
 
@@ -86,7 +127,51 @@ def json_handler(response):
     response body as JSON and return the result.
     """
     raise_error_for_status(response)
-    return response.json()
+    return decode_json(response)
+
+
+class PooledAdapter(HTTPAdapter):
+    """A ``requests`` transport adapter that keeps connection statistics.
+
+    urllib3 counts the connections it opens and the requests it sends on each
+    connection pool. Those counters are lost whenever a pool is evicted or
+    cleared, so this adapter folds them into running totals before the pool
+    is disposed of.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._stats_lock = threading.Lock()
+        self._closed_connections = 0
+        self._closed_requests = 0
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Initialize the pool manager and hook into pool disposal."""
+        super().init_poolmanager(*args, **kwargs)
+        pools = self.poolmanager.pools
+        dispose_func = pools.dispose_func
+
+        def dispose(pool):
+            with self._stats_lock:
+                self._closed_connections += pool.num_connections
+                self._closed_requests += pool.num_requests
+            if dispose_func:
+                dispose_func(pool)
+
+        pools.dispose_func = dispose
+
+    def connection_stats(self):
+        """Return the number of connections opened and requests sent."""
+        with self._stats_lock:
+            connections = self._closed_connections
+            num_requests = self._closed_requests
+            pools = self.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    num_requests += pool.num_requests
+        return connections, num_requests
 
 
 class Client(object):
@@ -118,12 +203,20 @@ class Client(object):
         >>> # I can change the base url
         >>> client.url = 'https://www.whatever.com'
 
+    Requests are sent through a ``requests.Session`` owned by the client, so
+    TCP/TLS connections to the server are kept alive and reused. Every
+    ``hansei.koku_models.KokuObject`` built on top of the same client shares
+    its connection pool.
+
     .. _Requests: http://docs.python-requests.org/en/master/
     """
 
     def __init__(
             self, response_handler=None, url=None,
-            authenticate=True, username=None, password=None):
+            authenticate=True, username=None, password=None,
+            retry_policy=None, token_cache=None, http_cache=None,
+            single_flight=None, codec=None, event_sinks=None,
+            rate_limiter=None, cassette=None, report_cache=None):
         """Initialize this object, collecting base URL from config file.
 
         If no response handler is specified, use the `code_handler` which will
@@ -143,20 +236,125 @@ class Client(object):
                 https: false  # change to true if server is published over
                               # https. Defaults to false if not defined
 
+        The connection pool used by the client is configured from the same
+        section::
+
+            koku:
+                pool-connections: 10   # number of per-host pools to cache
+                pool-maxsize: 10       # connections kept alive per pool
+                max-retries: 0         # connection level retries
+                keep-alive-timeout: 30 # seconds before idle connections
+                                       # are dropped and re-opened
+
+        Requests that fail with a transient error are retried according to
+        ``self.retry_policy``, a ``hansei.retry.RetryPolicy`` built from the
+        ``retry`` subsection of the ``koku`` section unless one is passed in.
+
+        Tokens obtained by ``login`` are shared with other processes through
+        a ``hansei.token_cache.TokenCache`` stored in the XDG cache directory::
+
+            koku:
+                token-cache: false    # defaults to true, false always logs in
+                token-cache-ttl: 3600 # seconds a cached token is reused
+
+        GET responses can optionally be kept in a
+        ``hansei.http_cache.ResponseCache`` and revalidated with conditional
+        requests, see ``hansei.http_cache.ResponseCache.from_config``.
+
+        Parsed reports can optionally be kept in the
+        ``hansei.report_cache.ReportCache`` shared by every client, see
+        ``hansei.report_cache.ReportCache.from_config``.
+
+        Identical GET requests sent by several threads at the same time are
+        coalesced: only one of them reaches the server and every caller gets
+        its result. Set ``coalesce-requests: false`` in the ``koku`` section
+        to disable this.
+
+        JSON bodies are decoded by ``decode_json`` with a pluggable codec from
+        ``hansei.codec``::
+
+            koku:
+                json-codec: auto       # auto, stdlib or orjson
+                json-numbers: float    # float, decimal or fixed
+                fixed-point-scale: 9   # decimal digits kept by fixed
+
+        A ``hansei.metrics.RequestEvent`` is emitted for each request to the
+        callables in ``self.event_sinks``. Set ``metrics: true`` in the
+        ``koku`` section to aggregate the events of every client in
+        ``hansei.metrics.SESSION_METRICS``.
+
+        Requests are throttled by the rate limiter shared by every client of
+        the same server when a ``rate-limit`` subsection is configured, see
+        ``hansei.ratelimit.RateLimiter.from_config``. The first client of a
+        server sets its limits, see ``hansei.ratelimit.shared_limiter``.
+
+        Requests and responses can be recorded to a cassette and replayed
+        without any network, see ``hansei.cassette``. The token cache is not
+        used while a cassette is.
+
         Arguments: 
             response_handler - Customer handler wrapper for formatting response
             url - Url for the Koku server. Default is localhost (127.0.0.1)
             authenticate - If True, login to the server during initialization
             username - Username used for server authentication
             password - Password used for server authentication
+            retry_policy - ``hansei.retry.RetryPolicy`` applied to requests
+            token_cache - ``hansei.token_cache.TokenCache`` used by ``login``
+            http_cache - ``hansei.http_cache.ResponseCache`` for GET requests
+            single_flight - ``hansei.single_flight.SingleFlight`` used to
+                coalesce identical GET requests sent at the same time
+            codec - ``hansei.codec.JSONCodec`` used to decode JSON bodies
+            event_sinks - List of callables receiving the
+                ``hansei.metrics.RequestEvent`` of each request
+            rate_limiter - ``hansei.ratelimit.RateLimiter`` throttling the
+                requests. Defaults to the limiter shared by every client of
+                the same server
+            cassette - ``hansei.cassette.Cassette`` recording the requests or
+                replaying their responses
+            report_cache - ``hansei.report_cache.ReportCache`` used by
+                ``hansei.koku_models.KokuBaseReport.get``. Defaults to the
+                cache shared by every client, if enabled
         """
         # Stores the response of the last request made.
         self._last_response = None
         self.url = url
         self.token = None
+        # (token, username, password) of the last successful login
+        self._login_credentials = None
         cfg = config.get_config().get('koku', {})
         self.verify = cfg.get('ssl-verify', False)
 
+        self.keep_alive_timeout = cfg.get(
+            'keep-alive-timeout', KOKU_KEEP_ALIVE_TIMEOUT)
+        self._pool_lock = threading.Lock()
+        self._last_used = None
+        self.pool_maxsize = cfg.get('pool-maxsize', KOKU_POOL_MAXSIZE)
+        self._adapter = PooledAdapter(
+            pool_connections=cfg.get('pool-connections', KOKU_POOL_CONNECTIONS),
+            pool_maxsize=self.pool_maxsize,
+            max_retries=cfg.get('max-retries', KOKU_POOL_MAX_RETRIES))
+        self.session = requests.Session()
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+        self.retry_policy = retry_policy or RetryPolicy.from_config(
+            cfg.get('retry', {}))
+
+        if token_cache is None and cfg.get('token-cache', True):
+            token_cache = TokenCache(ttl=cfg.get('token-cache-ttl', KOKU_TOKEN_CACHE_TTL))
+        self.token_cache = token_cache or None
+        self.http_cache = http_cache or ResponseCache.from_config(cfg.get('http-cache', {}))
+        self.report_cache = report_cache or shared_report_cache(cfg.get('report-cache'))
+        if single_flight is None and cfg.get('coalesce-requests', True):
+            single_flight = SingleFlight()
+        self.single_flight = single_flight or None
+        self.codec = codec or get_codec(
+            cfg.get('json-codec', 'auto'),
+            numbers=cfg.get('json-numbers', 'float'),
+            scale=cfg.get('fixed-point-scale', KOKU_FIXED_POINT_SCALE))
+        self.event_sinks = list(event_sinks or [])
+        if cfg.get('metrics', False):
+            self.event_sinks.append(metrics.SESSION_METRICS)
+
         if not self.url:
             hostname = cfg.get('hostname')
 
@@ -176,6 +374,19 @@ class Client(object):
                 'No base url was specified to the client either with the '
                 'url="host" option or with the hansei config file.')
 
+        self.rate_limiter = rate_limiter or shared_limiter(self.url, cfg.get('rate-limit'))
+
+        self.cassette = cassette or shared_cassette(cfg.get('cassette'), base_url=self.url)
+        if self.cassette:
+            if self.cassette.mode == 'record':
+                cassette_adapter = RecordingAdapter(self._adapter, self.cassette)
+            else:
+                cassette_adapter = ReplayAdapter(self.cassette)
+            self.session.mount('http://', cassette_adapter)
+            self.session.mount('https://', cassette_adapter)
+            # Every login must go through the cassette
+            self.token_cache = None
+
         if response_handler is None:
             self.response_handler = code_handler
         else:
@@ -189,22 +400,94 @@ class Client(object):
         """Returns True if the client is currently logged in"""
         return self.token is not None
 
-    def login(self, username, password):
+    def identity(self):
+        """Return a string identifying the user the requests are sent as.
+
+        This is the username of the last login if the client still uses its
+        token, a digest of the token otherwise, or None if not logged in.
+        """
+        if not self.token:
+            return None
+        if self._login_credentials and self._login_credentials[0] == self.token:
+            return 'user:{}'.format(self._login_credentials[1])
+        return 'token:{}'.format(hashlib.sha256(self.token.encode('utf-8')).hexdigest())
+
+    def close(self):
+        """Close all of the pooled connections held by this client."""
+        self.session.close()
+
+    def connection_stats(self):
+        """Return counters for the connections used by this client.
+
+        Returns: Dictionary
+            connections - number of new connections opened to the server
+            requests - number of requests sent over those connections
+            reused - number of requests that reused a kept-alive connection
+        """
+        connections, num_requests = self._adapter.connection_stats()
+        return {
+            'connections': connections,
+            'requests': num_requests,
+            'reused': max(num_requests - connections, 0),
+        }
+
+    def _expire_idle_connections(self):
+        """Drop pooled connections that stayed idle for too long.
+
+        Servers and routers in front of Koku close idle connections on their
+        own schedule. Dropping them first avoids sending a request on a socket
+        that is about to be reset.
+        """
+        with self._pool_lock:
+            now = time.monotonic()
+            if (self.keep_alive_timeout and self._last_used is not None and
+                    now - self._last_used > self.keep_alive_timeout):
+                self._adapter.poolmanager.clear()
+            self._last_used = now
+
+    def login(self, username, password, refresh=False):
         """Login to the server to receive an authorization token.
 
+        If the client has a token cache, a valid token cached for this server
+        and user by any process is reused and no request is sent to the
+        server. ``None`` is returned in that case.
+
         Arguments:
             username - Username for initial server authentication
             password - Password for initial server authentication
+            refresh - If True, always request a new token from the server
         """
+        if not (self.token_cache and username):
+            return self._login(username, password)
+
+        with self.token_cache.locked(self.url, username):
+            token = None if refresh else self.token_cache.get(self.url, username, password)
+            if token:
+                self.token = token
+                self._login_credentials = (token, username, password)
+                return None
+
+            login_request = self._login(username, password)
+            self.token_cache.set(self.url, username, password, self.token)
+
+        return login_request
+
+    def _login(self, username, password):
+        """Send the login request and keep the received token."""
         login_request = self.request(
             'POST',
             urljoin(self.url, KOKU_TOKEN_PATH),
             json={
                 'username': username,
                 'password': password
-            }
+            },
+            response_handler=code_handler,
+            # Obtaining a token has no side effect on the server
+            retry_policy=self.retry_policy.allowing('POST') if self.retry_policy else None,
+            reauthenticate=False
         )
         self.token = login_request.json()['token']
+        self._login_credentials = (self.token, username, password)
         return login_request
 
     def logout(self, **kwargs):
@@ -291,25 +574,490 @@ class Client(object):
         url = urljoin(self.url, endpoint)
         return self.request('PUT', url, json=payload, **kwargs)
 
+    def map(self, calls, max_workers=None):
+        """Send many independent requests concurrently.
+
+        The requests run on a bounded pool of threads sharing this client's
+        kept-alive connections. A failing request does not stop the others:
+        the exception it raised takes its place in the returned list.
+
+        Example::
+            >>> results = client.map([
+            ...     ('GET', 'reports/costs/', {'params': {'filter[resolution]': 'daily'}}),
+            ...     ('GET', 'reports/inventory/storage/', {}),
+            ... ])
+
+        Arguments:
+            calls - Iterable of (method, endpoint, kwargs) tuples. kwargs are
+                passed to ``self.request``
+            max_workers - Number of requests sent at once. Defaults to the
+                size of the connection pool
+
+        Returns: List with the handled response, or the raised exception, of
+            each call in the same order as ``calls``
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+
+        def send(call):
+            method, endpoint, kwargs = call
+            try:
+                return self.request(method, urljoin(self.url, endpoint), **(kwargs or {}))
+            except Exception as exc:
+                return exc
+
+        workers = min(max_workers or self.pool_maxsize, len(calls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(send, calls))
+
+    @contextlib.contextmanager
+    def batch(self, max_workers=None):
+        """Collect requests and send them concurrently when the block exits.
+
+        Example::
+            >>> with client.batch() as batch:
+            ...     for customer in customers:
+            ...         batch.get(customer.path())
+            >>> batch.results
+
+        Arguments:
+            max_workers - Number of requests sent at once. Defaults to the
+                size of the connection pool
+
+        Yields: ``hansei.api.Batch`` object. Its ``results`` are set once the
+            block exits without raising
+        """
+        batch = Batch(self, max_workers=max_workers)
+        yield batch
+        batch.execute()
+
     def request(self, method, url, **kwargs):
         """Send an HTTP request.
 
         Arguments passed directly in to this method override (but do not
         overwrite!) arguments specified in ``self.request_kwargs``.
+
+        A ``response_handler`` keyword argument overrides the client's
+        response handler for this request only, and a ``retry_policy`` keyword
+        argument overrides ``self.retry_policy``. Pass ``retry_policy=None`` to
+        send the request exactly once.
+
+        If the server answers 401 to a request sent with a token obtained by
+        ``self.login``, the client logs in again with the same credentials and
+        sends the request one more time. Pass ``reauthenticate=False`` to
+        disable this.
+
+        The number of attempts made is recorded on the returned response as
+        ``response.attempts``.
+
+        Identical GET requests in flight at the same time are only sent once
+        and all callers receive the same handled result. Requests sent with
+        ``stream=True`` are never coalesced nor cached, and neither are
+        requests given keyword arguments other than those in
+        ``COALESCED_KWARGS``.
+        """
+        response_handler = kwargs.pop('response_handler', self.response_handler)
+        retry_policy = kwargs.pop('retry_policy', self.retry_policy)
+        reauthenticate = kwargs.pop('reauthenticate', True)
+        extra_headers = kwargs.pop('headers', None) or {}
+        kwargs.setdefault('verify', self.verify)
+
+        # Only requests fully described by the flight key can share a call
+        if (self.single_flight and method.upper() == 'GET' and
+                COALESCED_KWARGS.issuperset(kwargs)):
+            flight_key = (
+                request_key(method, url, kwargs.get('params'), self.token),
+                tuple(sorted(extra_headers.items())),
+                kwargs['verify'],
+                response_handler,
+                retry_policy,
+                reauthenticate,
+            )
+            return self.single_flight.do(
+                flight_key, self._request, method, url, response_handler,
+                retry_policy, reauthenticate, extra_headers, **kwargs)
+
+        return self._request(
+            method, url, response_handler, retry_policy, reauthenticate,
+            extra_headers, **kwargs)
+
+    def _request(
+            self, method, url, response_handler, retry_policy, reauthenticate,
+            extra_headers, **kwargs):
+        """Send the request, login again if needed and handle the response."""
+        started = time.perf_counter()
+        try:
+            response = self._send_cached(method, url, retry_policy, extra_headers, **kwargs)
+        except Exception as exc:
+            self._emit(method, url, started, kwargs, error=exc)
+            raise
+
+        # The token may have been revoked or may have been read from a stale
+        # cache entry. Login again with the credentials that obtained it, as
+        # long as the client is still using that token.
+        if (response.status_code == 401 and reauthenticate and
+                self._login_credentials and self._login_credentials[0] == self.token):
+            token, username, password = self._login_credentials
+            if self.token_cache:
+                self.token_cache.invalidate(self.url, username, token)
+            self.login(username, password, refresh=True)
+            try:
+                response = self._send_cached(
+                    method, url, retry_policy, extra_headers, **kwargs)
+            except Exception as exc:
+                self._emit(method, url, started, kwargs, error=exc)
+                raise
+
+        self._emit(method, url, started, kwargs, response=response)
+        response.codec = self.codec
+        self._last_response = response
+        return response_handler(self._last_response)
+
+    def add_event_sink(self, sink):
+        """Send the ``hansei.metrics.RequestEvent`` of each request to ``sink``.
+
+        Arguments:
+            sink - Callable accepting a ``hansei.metrics.RequestEvent``
         """
+        self.event_sinks.append(sink)
+
+    def _emit(self, method, url, started, kwargs, response=None, error=None):
+        """Build the event of a request and hand it to the event sinks."""
+        if not self.event_sinks:
+            return
+
+        if response is not None:
+            request_body = response.request.body if response.request else None
+            if kwargs.get('stream'):
+                # Reading the content would consume the stream
+                length = response.headers.get('Content-Length')
+                response_bytes = int(length) if length else None
+            else:
+                response_bytes = len(response.content or b'')
+        else:
+            request_body = None
+            response_bytes = None
+
+        event = metrics.RequestEvent(
+            method=method.upper(),
+            path=metrics.template_path(url, self.url),
+            url=urlunsplit(urlsplit(url)[:3] + ('', '')),
+            status=response.status_code if response is not None else None,
+            request_bytes=len(request_body or b''),
+            response_bytes=response_bytes,
+            latency=time.perf_counter() - started,
+            attempts=getattr(response, 'attempts', 1),
+            cache_hit=getattr(response, 'from_cache', False),
+            limiter_wait=getattr(response, 'limiter_wait', 0.0),
+            error=type(error).__name__ if error is not None else None)
+
+        for sink in self.event_sinks:
+            sink(event)
+
+    def _send_cached(self, method, url, retry_policy, extra_headers, **kwargs):
+        """Send the request through ``self.http_cache``, if there is one.
+
+        GET responses are looked up in the cache and revalidated with a
+        conditional request. Any other method invalidates the cached entries
+        under the requested path once it succeeded.
+        """
+        if not self.http_cache or kwargs.get('stream'):
+            return self._send(method, url, retry_policy, extra_headers, **kwargs)
+
+        if method.upper() != 'GET':
+            response = self._send(method, url, retry_policy, extra_headers, **kwargs)
+            if response.status_code < 400:
+                self.http_cache.invalidate(url)
+            return response
+
+        cache_key = self.http_cache.key(method, url, kwargs.get('params'), self.token)
+        entry = self.http_cache.get(cache_key)
+        if entry is None:
+            response = self._send(method, url, retry_policy, extra_headers, **kwargs)
+            self.http_cache.store(cache_key, response)
+            return response
+
+        if self.http_cache.is_fresh(entry):
+            return self.http_cache.serve(entry)
+
+        headers = entry.conditional_headers()
+        headers.update(extra_headers)
+        response = self._send(method, url, retry_policy, headers, **kwargs)
+        if response.status_code == 304:
+            return self.http_cache.serve(entry, response)
+
+        self.http_cache.store(cache_key, response)
+        return response
+
+    def _send(self, method, url, retry_policy, extra_headers, **kwargs):
+        """Send the request, retrying it according to ``retry_policy``."""
         # The `self.request_kwargs` dict should *always* have a "url" argument.
         # This is enforced by `self.__init__`. This allows us to call the
-        # `requests.request` function and satisfy its signature:
+        # `requests.Session.request` method and satisfy its signature:
         #
         #     request(method, url, **kwargs)
         #
         headers = self.default_headers()
-        headers.update(kwargs.get('headers', {}))
+        headers.update(extra_headers)
         kwargs['headers'] = headers
-        kwargs.setdefault('verify', self.verify)
-        self._last_response = requests.request(method, url, **kwargs)
-        return self.response_handler(self._last_response)
+
+        limit_path = metrics.template_path(url, self.url)
+        limiter_wait = 0.0
+        attempt = 0
+        while True:
+            attempt += 1
+            self._expire_idle_connections()
+            try:
+                if self.rate_limiter:
+                    with self.rate_limiter.acquire(limit_path) as wait:
+                        limiter_wait += wait
+                        response = self.session.request(method, url, **kwargs)
+                else:
+                    response = self.session.request(method, url, **kwargs)
+            except Exception as exc:
+                if not (retry_policy and retry_policy.should_retry(
+                        method, attempt, exception=exc)):
+                    raise
+                time.sleep(retry_policy.delay(attempt))
+                continue
+
+            if not (retry_policy and retry_policy.should_retry(
+                    method, attempt, response=response)):
+                break
+
+            # Release the connection back to the pool before waiting
+            response.close()
+            time.sleep(retry_policy.delay(attempt, response))
+
+        response.attempts = attempt
+        response.limiter_wait = limiter_wait
+        return response
 
     @property
     def last_response(self):
         return self._last_response
+
+
+class Batch(object):
+    """Requests queued with ``hansei.api.Client.batch``.
+
+    The request methods mirror the ones of ``hansei.api.Client`` but only
+    queue the request and return its index in ``self.results``.
+    """
+
+    def __init__(self, client, max_workers=None):
+        self.client = client
+        self.max_workers = max_workers
+        self.calls = []
+        self.results = None
+
+    def request(self, method, endpoint, **kwargs):
+        """Queue an HTTP request and return its index."""
+        self.calls.append((method, endpoint, kwargs))
+        return len(self.calls) - 1
+
+    def delete(self, endpoint, **kwargs):
+        """Queue an HTTP DELETE request."""
+        return self.request('DELETE', endpoint, **kwargs)
+
+    def get(self, endpoint, **kwargs):
+        """Queue an HTTP GET request."""
+        return self.request('GET', endpoint, **kwargs)
+
+    def head(self, endpoint, **kwargs):
+        """Queue an HTTP HEAD request."""
+        return self.request('HEAD', endpoint, **kwargs)
+
+    def options(self, endpoint, **kwargs):
+        """Queue an HTTP OPTIONS request."""
+        return self.request('OPTIONS', endpoint, **kwargs)
+
+    def post(self, endpoint, payload, **kwargs):
+        """Queue an HTTP POST request."""
+        return self.request('POST', endpoint, json=payload, **kwargs)
+
+    def put(self, endpoint, payload, **kwargs):
+        """Queue an HTTP PUT request."""
+        return self.request('PUT', endpoint, json=payload, **kwargs)
+
+    def execute(self):
+        """Send the queued requests and return their results in order."""
+        self.results = self.client.map(self.calls, max_workers=self.max_workers)
+        return self.results
+
+
+class AsyncClient(object):
+    """An asyncio flavored client for interacting with the koku API.
+
+    Every method of ``hansei.api.Client`` that talks to the server is exposed
+    here as a coroutine. Requests are still sent by a blocking
+    ``hansei.api.Client``, but they run on a bounded pool of worker threads so
+    many independent requests can be awaited concurrently from a single event
+    loop while sharing the client's kept-alive connections. The
+    ``response_handler`` contract is the same: ``code_handler``,
+    ``json_handler`` and ``echo_handler`` all work unchanged.
+
+    Example::
+        >>> import asyncio
+        >>> from hansei import api
+        >>> client = api.AsyncClient(username='admin', password='pass')
+        >>> async def get_reports():
+        ...     return await asyncio.gather(
+        ...         client.get('reports/costs/'),
+        ...         client.get('reports/inventory/storage/'),
+        ...         client.get('reports/inventory/instance-type/'))
+        >>> responses = asyncio.run(get_reports())
+    """
+
+    def __init__(
+            self, response_handler=None, url=None,
+            authenticate=True, username=None, password=None,
+            concurrency=None, client=None):
+        """Initialize this object, wrapping a blocking ``hansei.api.Client``.
+
+        Arguments:
+            response_handler - Customer handler wrapper for formatting response
+            url - Url for the Koku server. Default is read from the config file
+            authenticate - If True, login to the server during initialization
+            username - Username used for server authentication
+            password - Password used for server authentication
+            concurrency - Maximum number of requests in flight at once.
+                Defaults to the size of the client connection pool
+            client - Existing ``hansei.api.Client`` to send requests with. All
+                other arguments but concurrency are ignored if provided
+        """
+        if client is None:
+            client = Client(
+                response_handler=response_handler, url=url,
+                authenticate=authenticate, username=username,
+                password=password)
+        self.client = client
+        self.concurrency = concurrency or self.client.pool_maxsize
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    @property
+    def url(self):
+        """The base URL of the Koku server"""
+        return self.client.url
+
+    @property
+    def token(self):
+        """The authorization token of the wrapped client"""
+        return self.client.token
+
+    @property
+    def response_handler(self):
+        """The handler applied to every response"""
+        return self.client.response_handler
+
+    @property
+    def logged_in(self):
+        """Returns True if the client is currently logged in"""
+        return self.client.logged_in
+
+    @property
+    def last_response(self):
+        return self.client.last_response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    def close(self):
+        """Stop the worker threads and close the pooled connections."""
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    async def aclose(self):
+        """Close the client without blocking the event loop.
+
+        The worker threads are drained and the connections closed on the
+        loop's default executor, so other tasks keep running meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.close)
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking client method on the worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs))
+
+    async def login(self, username, password, refresh=False):
+        """Login to the server to receive an authorization token.
+
+        Arguments:
+            username - Username for initial server authentication
+            password - Password for initial server authentication
+            refresh - If True, always request a new token from the server
+        """
+        return await self._run(self.client.login, username, password, refresh=refresh)
+
+    def logout(self, **kwargs):
+        """Start sending unauthorized requests."""
+        self.client.logout(**kwargs)
+
+    async def get_user(self, **kwargs):
+        """Get the username of the user logged in."""
+        return await self._run(self.client.get_user, **kwargs)
+
+    async def server_status(self, **kwargs):
+        """Get the Koku server status"""
+        return await self._run(self.client.server_status, **kwargs)
+
+    async def delete(self, endpoint, **kwargs):
+        """Send an HTTP DELETE request.
+
+        Arguments:
+            endpoint - API endpoint to send request
+        """
+        return await self._run(self.client.delete, endpoint, **kwargs)
+
+    async def get(self, endpoint, **kwargs):
+        """Send an HTTP GET request.
+
+        Arguments:
+            endpoint - API endpoint to send request
+        """
+        return await self._run(self.client.get, endpoint, **kwargs)
+
+    async def options(self, endpoint, **kwargs):
+        """Send an HTTP OPTIONS request.
+
+        Arguments:
+            endpoint - API endpoint to send request
+        """
+        return await self._run(self.client.options, endpoint, **kwargs)
+
+    async def head(self, endpoint, **kwargs):
+        """Send an HTTP HEAD request.
+
+        Arguments:
+            endpoint - API endpoint to send request
+        """
+        return await self._run(self.client.head, endpoint, **kwargs)
+
+    async def post(self, endpoint, payload, **kwargs):
+        """Send an HTTP POST request.
+
+        Arguments:
+            endpoint - API endpoint to send request
+            payload - json data to include in the request
+        """
+        return await self._run(self.client.post, endpoint, payload, **kwargs)
+
+    async def put(self, endpoint, payload, **kwargs):
+        """Send an HTTP PUT request.
+
+        Arguments:
+            endpoint - API endpoint to send request
+            payload - json data to include in the request
+        """
+        return await self._run(self.client.put, endpoint, payload, **kwargs)
+
+    async def request(self, method, url, **kwargs):
+        """Send an HTTP request."""
+        return await self._run(self.client.request, method, url, **kwargs)
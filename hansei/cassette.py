@@ -0,0 +1,330 @@
+# coding=utf-8
+"""Record requests to the Koku server and replay them without any network.
+
+In ``record`` mode every request sent by a ``hansei.api.Client`` and the
+response it received are appended to a cassette: a gzip compressed file of
+JSON lines. In ``replay`` mode the responses are served from the cassette and
+no request leaves the machine, so the report validation and model code can be
+regression tested in seconds without a live Koku and a pre-populated
+database.
+
+Requests are matched on their method, their path relative to the API root,
+their normalized query parameters and their normalized JSON body. Secrets
+are scrubbed before anything is written: ``Authorization`` headers are never
+stored, passwords in request bodies and tokens in response bodies are
+replaced.
+
+A cassette being recorded keeps its file open as a single gzip stream, and
+must be closed for the stream to be complete. Shared cassettes are closed at
+the end of the pytest session, or when the interpreter exits.
+
+Recording reads every response body in full before handing it to the
+caller, so streamed responses (``KokuBaseReport.stream``) are buffered while
+a cassette is recorded. They stream again when it is replayed or disabled.
+
+Cassettes are used through the ``cassette`` subsection of the koku config, or
+through the ``--koku-record`` and ``--koku-replay`` pytest options::
+
+    koku:
+        cassette:
+            mode: replay   # record or replay
+            path: tests.cassette.gz
+"""
+import atexit
+import datetime
+import gzip
+import json
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from hansei import exceptions
+from hansei.http_cache import normalize_params
+
+
+CASSETTE_MODES = ('record', 'replay')
+"""Supported cassette modes."""
+
+CASSETTE_VERSION = 1
+"""Version of the cassette file format."""
+
+SCRUBBED = '********'
+"""Placeholder written in place of secrets."""
+
+_SECRET_REQUEST_KEYS = frozenset(['password'])
+_SECRET_RESPONSE_KEYS = frozenset(['token'])
+_RECORDED_HEADERS = frozenset([
+    'content-type', 'etag', 'last-modified', 'location', 'retry-after'])
+
+
+def _scrub(payload, secret_keys):
+    """Return a copy of a decoded JSON payload with secret values replaced."""
+    if isinstance(payload, dict):
+        return {
+            key: SCRUBBED if key in secret_keys and value else _scrub(value, secret_keys)
+            for key, value in payload.items()
+        }
+    if isinstance(payload, list):
+        return [_scrub(value, secret_keys) for value in payload]
+    return payload
+
+
+def _normalize_body(body):
+    """Return a request body as canonical, scrubbed JSON text."""
+    if not body:
+        return None
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return body
+    return json.dumps(_scrub(payload, _SECRET_REQUEST_KEYS), sort_keys=True)
+
+
+class Cassette(object):
+    """A recording of the requests sent to a Koku server."""
+
+    def __init__(self, path, mode='replay', base_url=None):
+        """
+        Arguments:
+            path - Path of the cassette file
+            mode - ``record`` to write a new cassette, ``replay`` to serve the
+                responses of an existing one
+            base_url - Base URL of the API. Paths are stored relative to it so
+                a cassette can be replayed against any host
+        """
+        if mode not in CASSETTE_MODES:
+            raise exceptions.CassetteError(
+                'Unknown cassette mode {!r}, expecting one of {}'.format(
+                    mode, ', '.join(CASSETTE_MODES)))
+
+        self.path = path
+        self.mode = mode
+        self.base_url = base_url
+        self.interactions = defaultdict(list)
+        self._played = defaultdict(int)
+        self._lock = threading.Lock()
+        self._file = None
+
+        if mode == 'record':
+            self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+            self._file.write(json.dumps({'version': CASSETTE_VERSION}) + '\n')
+            atexit.register(self.close)
+        else:
+            self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Finish writing a cassette being recorded.
+
+        Nothing can be recorded once the cassette is closed.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @classmethod
+    def from_config(cls, cfg, base_url=None):
+        """Build a cassette from the ``cassette`` subsection of the koku config.
+
+        Returns None if no cassette is configured.
+        """
+        if not cfg or not cfg.get('mode'):
+            return None
+        return cls(cfg['path'], mode=cfg['mode'], base_url=base_url)
+
+    def _load(self):
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as cassette_file:
+                header = json.loads(next(cassette_file))
+                if header.get('version') != CASSETTE_VERSION:
+                    raise exceptions.CassetteError(
+                        'Unsupported cassette version {!r} in {}'.format(
+                            header.get('version'), self.path))
+                for line in cassette_file:
+                    interaction = json.loads(line)
+                    self.interactions[self._key(interaction['request'])].append(
+                        interaction['response'])
+        except (OSError, StopIteration) as exc:
+            raise exceptions.CassetteError(
+                'Unable to read cassette {}: {}'.format(self.path, exc))
+
+    def _path(self, url):
+        path = urlsplit(url).path
+        if self.base_url:
+            base_path = urlsplit(self.base_url).path
+            if path.startswith(base_path):
+                path = path[len(base_path):]
+        return path
+
+    @staticmethod
+    def _key(request):
+        return (
+            request['method'],
+            request['path'],
+            tuple(tuple(pair) for pair in request['query']),
+            request['body'],
+        )
+
+    def _request(self, request):
+        """Return the normalized form of a ``requests.PreparedRequest``."""
+        return {
+            'method': request.method.upper(),
+            'path': self._path(request.url),
+            'query': [list(pair) for pair in normalize_params(urlsplit(request.url).query)],
+            'body': _normalize_body(request.body),
+        }
+
+    def record(self, request, response):
+        """Append a request and the response it received to the cassette."""
+        text = response.content.decode(response.encoding or 'utf-8', 'replace')
+        try:
+            text = json.dumps(_scrub(json.loads(text), _SECRET_RESPONSE_KEYS))
+        except ValueError:
+            pass
+
+        interaction = {
+            'request': self._request(request),
+            'response': {
+                'status': response.status_code,
+                'reason': response.reason,
+                'headers': {
+                    key: value for key, value in response.headers.items()
+                    if key.lower() in _RECORDED_HEADERS
+                },
+                'body': text,
+            },
+        }
+
+        with self._lock:
+            if self._file is None:
+                raise exceptions.CassetteError('Cassette {} is closed'.format(self.path))
+            self.interactions[self._key(interaction['request'])].append(
+                interaction['response'])
+            self._file.write(json.dumps(interaction, separators=(',', ':')) + '\n')
+
+    def play(self, request):
+        """Return the recorded response of a ``requests.PreparedRequest``.
+
+        Identical requests are answered with the recorded responses in the
+        order they were recorded; the last one is repeated once all of them
+        were played.
+
+        :raises: ``hansei.exceptions.CassetteError`` if the request was not
+            recorded.
+        """
+        normalized = self._request(request)
+        key = self._key(normalized)
+        with self._lock:
+            responses = self.interactions.get(key)
+            if not responses:
+                raise exceptions.CassetteError(
+                    'No recorded response in {} for {method} {path} query={query} '
+                    'body={body}'.format(self.path, **normalized))
+            index = min(self._played[key], len(responses) - 1)
+            self._played[key] += 1
+            return responses[index]
+
+
+class RecordingAdapter(BaseAdapter):
+    """Transport adapter recording what another adapter sends and receives.
+
+    The body of every response is read in full to be recorded, so streamed
+    responses are buffered while recording.
+    """
+
+    def __init__(self, adapter, cassette):
+        """
+        Arguments:
+            adapter - Transport adapter actually sending the requests
+            cassette - ``Cassette`` in ``record`` mode
+        """
+        super().__init__()
+        self.adapter = adapter
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        # Reads the whole body; iter_content then serves it from memory
+        self.cassette.record(request, response)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter serving responses from a cassette."""
+
+    def __init__(self, cassette):
+        """
+        Arguments:
+            cassette - ``Cassette`` in ``replay`` mode
+        """
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        recorded = self.cassette.play(request)
+
+        response = Response()
+        response.status_code = recorded['status']
+        response.reason = recorded['reason']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response.encoding = 'utf-8'
+        response._content = recorded['body'].encode('utf-8')
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = datetime.timedelta(0)
+        return response
+
+    def close(self):
+        pass
+
+
+_SHARED_CASSETTES = {}
+_SHARED_CASSETTES_LOCK = threading.Lock()
+
+
+def shared_cassette(cfg, base_url=None):
+    """Return the cassette shared by every client using the same cassette file.
+
+    Opening a cassette in ``record`` mode truncates it, so all the clients of
+    a test session must record into the same ``Cassette`` object.
+
+    Arguments:
+        cfg - Dictionary with the ``cassette`` configuration
+        base_url - Base URL of the API
+
+    Returns: ``Cassette`` or None if no cassette is configured
+    """
+    if not cfg or not cfg.get('mode'):
+        return None
+
+    key = (cfg['path'], cfg['mode'])
+    with _SHARED_CASSETTES_LOCK:
+        if key not in _SHARED_CASSETTES:
+            _SHARED_CASSETTES[key] = Cassette.from_config(cfg, base_url=base_url)
+        return _SHARED_CASSETTES[key]
+
+
+def close_shared_cassettes():
+    """Close the cassettes shared by the clients, e.g. at the end of a test session."""
+    with _SHARED_CASSETTES_LOCK:
+        for cassette in _SHARED_CASSETTES.values():
+            if cassette is not None:
+                cassette.close()
+        _SHARED_CASSETTES.clear()
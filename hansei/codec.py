@@ -0,0 +1,194 @@
+# coding=utf-8
+"""Pluggable JSON codecs used to decode Koku responses.
+
+The standard library decoder turns every number with a fraction into a
+``float``, which ``KokuBaseReport.calculate_total`` then converts to
+``Decimal`` one line item at a time. A codec can instead decode numbers
+straight to ``Decimal``, or to integers in fixed-point notation, and can be
+backed by a faster JSON library when one is installed.
+
+Numeric modes:
+    float - numbers are decoded as ``int`` and ``float`` (the default)
+    decimal - numbers with a fraction are decoded as ``Decimal``
+    fixed - the amounts of the line items and of the report total (their
+        ``total`` and ``value`` members) are decoded as an ``int`` holding the
+        value multiplied by ``10 ** scale``. Sums of such values are exact and
+        fast. Other integers (counts, time scopes, pagination) are left as
+        ``int`` and other numbers with a fraction are decoded as ``Decimal``.
+        ``KokuBaseReport`` keeps the fixed point integers internal: its
+        accessors return the amounts as ``Decimal``, see ``JSONCodec.amounts``
+"""
+import json
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from hansei import exceptions
+from hansei.constants import KOKU_FIXED_POINT_SCALE
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+NUMBER_MODES = ('float', 'decimal', 'fixed')
+"""Supported numeric modes."""
+
+FIXED_POINT_MEMBERS = ('total', 'value')
+"""Members holding the amounts decoded to fixed point by the ``fixed`` mode."""
+
+
+class JSONCodec(object):
+    """Decode JSON documents with the standard library ``json`` module."""
+
+    name = 'stdlib'
+
+    def __init__(self, numbers='float', scale=KOKU_FIXED_POINT_SCALE):
+        """
+        Arguments:
+            numbers - Numeric mode, one of ``NUMBER_MODES``
+            scale - Number of decimal digits kept by the ``fixed`` mode
+        """
+        if numbers not in NUMBER_MODES:
+            raise exceptions.KokuException(
+                'Unknown JSON numeric mode {!r}, expecting one of {}'.format(
+                    numbers, ', '.join(NUMBER_MODES)))
+
+        self.numbers = numbers
+        self.scale = scale
+        self.json_decoder = json.JSONDecoder(**self._number_hooks())
+
+    def _number_hooks(self):
+        """Return the ``json.JSONDecoder`` arguments for the numeric mode."""
+        if self.numbers == 'decimal':
+            return {'parse_float': Decimal}
+
+        if self.numbers == 'fixed':
+            quantum = Decimal(1)
+
+            def fixed_point(value):
+                return int(Decimal(value).scaleb(self.scale).quantize(
+                    quantum, rounding=ROUND_HALF_EVEN))
+
+            def fixed_pairs(pairs):
+                return {
+                    key: fixed_point(value) if (
+                        key in FIXED_POINT_MEMBERS and
+                        isinstance(value, (int, Decimal)) and not isinstance(value, bool))
+                    else value
+                    for key, value in pairs}
+
+            return {'parse_float': Decimal, 'object_pairs_hook': fixed_pairs}
+
+        return {}
+
+    def decode(self, data):
+        """Decode a JSON document given as ``bytes`` or ``str``."""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return self.json_decoder.decode(data)
+
+    def _is_fixed_point(self, value):
+        """Tell whether an amount is a fixed point integer decoded by the codec."""
+        return self.numbers == 'fixed' and isinstance(value, int) and not isinstance(value, bool)
+
+    def number(self, value):
+        """Return a decoded amount as a ``Decimal``.
+
+        Floats are converted exactly, as ``Decimal(value)`` does, and fixed
+        point integers are scaled back down. Amounts that were not decoded
+        by the codec, e.g. computed locally, are converted the same way.
+        """
+        if value is None:
+            return None
+        if self._is_fixed_point(value):
+            return Decimal(value).scaleb(-self.scale)
+        return value if isinstance(value, Decimal) else Decimal(value)
+
+    def sum(self, values):
+        """Return the sum of decoded amounts as a ``Decimal``.
+
+        Null values count as zero. Fixed point integers are summed as
+        integers and scaled down once, other amounts are converted by
+        ``number``.
+        """
+        if self.numbers != 'fixed':
+            return sum((self.number(value) for value in values if value), Decimal(0))
+
+        fixed_total = 0
+        total = Decimal(0)
+        for value in values:
+            if not value:
+                continue
+            if self._is_fixed_point(value):
+                fixed_total += value
+            else:
+                total += self.number(value)
+        return Decimal(fixed_total).scaleb(-self.scale) + total
+
+    def amounts(self, obj):
+        """Return a report member with its amounts as ``Decimal``.
+
+        The fixed point integers of the amounts of ``obj``, a line item, a
+        report total or report data, are converted by ``number`` in a copy.
+        Documents decoded by the other numeric modes are returned as is.
+        """
+        if self.numbers != 'fixed':
+            return obj
+        if isinstance(obj, list):
+            return [self.amounts(value) for value in obj]
+        if isinstance(obj, dict):
+            return type(obj)(
+                (key, self.number(value) if (
+                    key in FIXED_POINT_MEMBERS and self._is_fixed_point(value))
+                 else self.amounts(value))
+                for key, value in obj.items())
+        return obj
+
+
+class OrjsonCodec(JSONCodec):
+    """Decode JSON documents with ``orjson``.
+
+    ``orjson`` cannot hook into number parsing, so it only supports the
+    ``float`` numeric mode.
+    """
+
+    name = 'orjson'
+
+    def __init__(self, numbers='float', scale=KOKU_FIXED_POINT_SCALE):
+        if orjson is None:
+            raise exceptions.KokuException('The orjson JSON codec requires orjson to be installed')
+        if numbers != 'float':
+            raise exceptions.KokuException(
+                'The orjson JSON codec only supports the float numeric mode')
+        super().__init__(numbers=numbers, scale=scale)
+
+    def decode(self, data):
+        """Decode a JSON document given as ``bytes`` or ``str``."""
+        return orjson.loads(data)
+
+
+CODECS = {
+    JSONCodec.name: JSONCodec,
+    OrjsonCodec.name: OrjsonCodec,
+}
+"""Available codecs by name."""
+
+
+def get_codec(name='auto', numbers='float', scale=KOKU_FIXED_POINT_SCALE):
+    """Return a codec instance.
+
+    Arguments:
+        name - Name of the codec. ``auto`` picks the fastest installed codec
+            supporting the numeric mode
+        numbers - Numeric mode, one of ``NUMBER_MODES``
+        scale - Number of decimal digits kept by the ``fixed`` mode
+    """
+    if name == 'auto':
+        name = OrjsonCodec.name if (orjson is not None and numbers == 'float') else JSONCodec.name
+
+    if name not in CODECS:
+        raise exceptions.KokuException(
+            'Unknown JSON codec {!r}, expecting one of auto, {}'.format(
+                name, ', '.join(sorted(CODECS))))
+
+    return CODECS[name](numbers=numbers, scale=scale)
@@ -0,0 +1,247 @@
+# coding=utf-8
+"""Columnar materialization of report line items.
+
+Summing a large report with ``KokuBaseReport.calculate_total`` walks every
+line item dictionary and converts its total to ``Decimal``, and every other
+aggregate (per account, per day...) walks them again. ``ReportColumns``
+converts the line items once into compact columns:
+
+    date, units and each group key (account, service, instance_type...)
+        categorical columns: integer codes and the list of their labels
+    total
+        floats, or integers in fixed-point notation (``total * 10 ** scale``)
+        so that sums are exact
+    count
+        integers, when the line items have a count (instance-type reports)
+
+Totals, per-group subtotals and per-day sums are then vectorized
+operations. The columns are NumPy arrays when NumPy is installed and
+``array.array`` otherwise.
+
+Example::
+    >>> columns = report.to_columns(fixed_point=True)
+    >>> columns.sum()
+    Decimal('1234.5678')
+    >>> columns.group_sum('account')
+    OrderedDict([('1234', Decimal('1000.0000')), ('5678', Decimal('234.5678'))])
+"""
+import array
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from hansei.constants import KOKU_FIXED_POINT_SCALE
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+_INT64_MAX = 2 ** 63 - 1
+_QUANTUM = Decimal(1)
+
+
+def to_fixed_point(value, scale, value_scale=None):
+    """Return a decoded number as an integer holding ``value * 10 ** scale``.
+
+    Floats are converted from their shortest representation, which is the
+    number as it was written in the JSON document.
+
+    Arguments:
+        value - int, float, Decimal or None
+        scale - Number of decimal digits kept
+        value_scale - Scale of ``value`` if it already is a fixed-point
+            integer, as decoded by the ``fixed`` mode of ``hansei.codec``
+    """
+    if value is None:
+        return 0
+    if value_scale is not None:
+        if scale >= value_scale:
+            return value * 10 ** (scale - value_scale)
+        value = Decimal(value).scaleb(-value_scale)
+    elif isinstance(value, int):
+        return value * 10 ** scale
+    elif isinstance(value, float):
+        text = repr(value)
+        whole, _, fraction = text.partition('.')
+        if len(fraction) <= scale and fraction.isdigit():
+            # Fast path: shift the decimal point of the representation
+            return int(whole + fraction.ljust(scale, '0'))
+        value = Decimal(text)
+    return int(value.scaleb(scale).quantize(_QUANTUM, rounding=ROUND_HALF_EVEN))
+
+
+def _int_column(values):
+    if numpy is not None:
+        if all(-_INT64_MAX <= value <= _INT64_MAX for value in values):
+            return numpy.array(values, dtype=numpy.int64)
+        return numpy.array(values, dtype=object)
+    try:
+        return array.array('q', values)
+    except OverflowError:
+        return list(values)
+
+
+def _float_column(values):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.float64)
+    return array.array('d', values)
+
+
+def _exact_int_sum(values):
+    """Sum an integer column without overflowing 64 bits."""
+    if numpy is not None and getattr(values, 'dtype', None) == numpy.int64 and len(values):
+        # No partial sum can overflow if this bound holds
+        if int(numpy.abs(values).max()) * len(values) <= _INT64_MAX:
+            return int(values.sum())
+        return sum(int(value) for value in values.tolist())
+    return sum(values)
+
+
+class ReportColumns(object):
+    """Line items of a report stored as columns."""
+
+    def __init__(self, scale=None):
+        """
+        Arguments:
+            scale - Number of decimal digits of the fixed-point ``total``
+                column, or None if it holds floats
+        """
+        self.scale = scale
+        self.columns = OrderedDict()
+        self.labels = OrderedDict()
+        self.size = 0
+
+    @classmethod
+    def from_line_items(cls, line_items, fixed_point=False, scale=None, codec=None):
+        """Build the columns from ``(group_path, line_item)`` pairs.
+
+        Arguments:
+            line_items - Iterable of pairs, as yielded by
+                ``KokuBaseReport.iter_line_items`` or ``KokuBaseReport.stream``
+            fixed_point - Store ``total`` as exact fixed-point integers
+            scale - Number of decimal digits kept by the fixed-point column.
+                Defaults to the scale of ``codec`` or KOKU_FIXED_POINT_SCALE
+            codec - ``hansei.codec.JSONCodec`` that decoded the line items
+        """
+        value_scale = None
+        if codec is not None and codec.numbers == 'fixed':
+            value_scale = codec.scale
+        if fixed_point:
+            scale = scale if scale is not None else (
+                value_scale if value_scale is not None else KOKU_FIXED_POINT_SCALE)
+        else:
+            scale = None
+
+        columns = cls(scale=scale)
+        codes = OrderedDict()
+        label_codes = {}
+        totals = []
+        counts = []
+        has_count = False
+
+        for group_path, line_item in line_items:
+            groups = dict(group_path or ())
+            groups.setdefault('date', line_item.get('date'))
+            groups['units'] = line_item.get('units')
+
+            for name, label in groups.items():
+                if name not in codes:
+                    # The line items seen so far had no label for this column
+                    label_codes[name] = {None: 0} if columns.size else {}
+                    codes[name] = [0] * columns.size
+                mapping = label_codes[name]
+                code = mapping.get(label)
+                if code is None:
+                    code = mapping[label] = len(mapping)
+                codes[name].append(code)
+
+            if len(groups) < len(codes):
+                for name in codes:
+                    if name not in groups:
+                        mapping = label_codes[name]
+                        codes[name].append(mapping.setdefault(None, len(mapping)))
+
+            total = line_item.get('total')
+            if scale is not None:
+                totals.append(to_fixed_point(total, scale, value_scale))
+            elif value_scale is not None:
+                totals.append(float(Decimal(total or 0).scaleb(-value_scale)))
+            else:
+                totals.append(float(total or 0))
+
+            count = line_item.get('count')
+            if count is not None:
+                has_count = True
+            counts.append(count or 0)
+            columns.size += 1
+
+        for name, column_codes in codes.items():
+            columns.columns[name] = _int_column(column_codes)
+            columns.labels[name] = list(label_codes[name])
+        columns.columns['total'] = (
+            _int_column(totals) if scale is not None else _float_column(totals))
+        if has_count:
+            columns.columns['count'] = _int_column(counts)
+        return columns
+
+    def __len__(self):
+        return self.size
+
+    def _number(self, column, value):
+        if column == 'total':
+            if self.scale is not None:
+                return Decimal(value).scaleb(-self.scale)
+            return Decimal(value)
+        return value
+
+    def sum(self, column='total'):
+        """Return the sum of a numeric column.
+
+        ``total`` is returned as a ``Decimal``, exact if the column is in
+        fixed-point notation.
+        """
+        values = self.columns[column]
+        if column == 'total' and self.scale is None:
+            value = float(values.sum()) if numpy is not None else sum(values)
+        else:
+            value = _exact_int_sum(values)
+        return self._number(column, value)
+
+    def group_sum(self, by, column='total'):
+        """Return the sums of a numeric column for each label of a categorical column.
+
+        Arguments:
+            by - Categorical column, e.g. ``date``, ``account``, ``service``
+            column - Numeric column summed
+
+        Returns: OrderedDict of label to sum, in order of first appearance
+        """
+        codes = self.columns[by]
+        labels = self.labels[by]
+        values = self.columns[column]
+
+        if numpy is not None:
+            if values.dtype == numpy.float64:
+                sums = numpy.bincount(codes, weights=values, minlength=len(labels)).tolist()
+            elif values.dtype == numpy.int64 and (
+                    not len(values) or
+                    int(numpy.abs(values).max()) * len(values) <= _INT64_MAX):
+                sums = numpy.zeros(len(labels), dtype=numpy.int64)
+                numpy.add.at(sums, codes, values)
+                sums = sums.tolist()
+            else:
+                sums = [0] * len(labels)
+                for code, value in zip(codes.tolist(), values.tolist()):
+                    sums[code] += int(value)
+        else:
+            sums = [0] * len(labels)
+            for code, value in zip(codes, values):
+                sums[code] += value
+
+        return OrderedDict(
+            (label, self._number(column, value)) for label, value in zip(labels, sums))
+
+    def daily_totals(self):
+        """Return the total of each date of the report."""
+        return self.group_sum('date')
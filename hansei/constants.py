@@ -32,3 +32,74 @@ KOKU_STORAGE_REPORTS_PATH = 'reports/inventory/storage/'
 
 # The path to the endpoint used for instance inventory reporting.
 KOKU_INSTANCE_REPORTS_PATH = 'reports/inventory/instance-type/'
+
+# Number of per-host connection pools kept by ``hansei.api.Client``.
+KOKU_POOL_CONNECTIONS = 10
+
+# Maximum number of connections kept alive in each connection pool.
+KOKU_POOL_MAXSIZE = 10
+
+# Connection level retries performed by the transport adapter.
+KOKU_POOL_MAX_RETRIES = 0
+
+# Seconds an idle pool is kept alive before its connections are dropped.
+KOKU_KEEP_ALIVE_TIMEOUT = 30
+
+# Total number of attempts made for a request that fails with a transient error.
+KOKU_RETRY_MAX_ATTEMPTS = 3
+
+# Base delay in seconds for the exponential backoff between attempts.
+KOKU_RETRY_BACKOFF_BASE = 0.5
+
+# Maximum delay in seconds between two attempts.
+KOKU_RETRY_BACKOFF_CAP = 10
+
+# Seconds an authorization token is reused from the on-disk token cache.
+KOKU_TOKEN_CACHE_TTL = 3600
+
+# Maximum size in bytes of the responses kept by the opt-in HTTP cache.
+KOKU_HTTP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Seconds after which a response is dropped from the HTTP cache.
+KOKU_HTTP_CACHE_TTL = 300
+
+# Seconds during which a cached response is served without revalidation.
+KOKU_HTTP_CACHE_MAX_AGE = 0
+
+# Maximum number of parsed reports kept by the opt-in report cache.
+KOKU_REPORT_CACHE_MAX_ENTRIES = 256
+
+# Seconds after which a report is dropped from the report cache.
+KOKU_REPORT_CACHE_TTL = 600
+
+# Number of derived reports compared with the server by ``ReportRollup.verify``.
+KOKU_ROLLUP_SAMPLE_SIZE = 3
+
+# Largest difference accepted between a server sum and the rollup of a report.
+KOKU_ROLLUP_TOLERANCE = 0.01
+
+# Largest difference accepted between the merged total of a sharded report
+# and the total reported by the server.
+KOKU_REPORT_SHARD_TOLERANCE = 0.01
+
+# Number of trailing days refetched by ``KokuBaseReport.refresh``.
+KOKU_REPORT_REFRESH_DAYS = 3
+
+# Number of decimal digits of the line item totals compared by ``hansei.report_diff``.
+KOKU_DIFF_PLACES = 6
+
+# Number of bytes read at once when streaming a report response.
+KOKU_REPORT_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Number of decimal digits kept when decoding numbers to fixed-point integers.
+KOKU_FIXED_POINT_SCALE = 9
+
+# Number of report queries fetched at once by ``hansei.query_matrix.QueryMatrix``.
+KOKU_QUERY_MATRIX_WORKERS = 8
+
+# Number of queries listed in the latency summary of a ``hansei.query_matrix.QueryMatrix``.
+KOKU_QUERY_MATRIX_SLOWEST = 10
+
+# Largest difference accepted between the line items of a query fetched in its
+# requested group order and in its canonical order.
+KOKU_QUERY_MATRIX_TOLERANCE = 0.01
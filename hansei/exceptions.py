@@ -24,3 +24,24 @@ class KokuBaseUrlNotFound(KokuException):
     """
 
 
+
+class CassetteError(KokuException):
+    """A cassette cannot be read, or holds no response for a request.
+
+    See :mod:`hansei.cassette` for more information on recording and
+    replaying requests.
+    """
+
+
+class ReportConsistencyError(KokuException):
+    """A report assembled from several responses disagrees with the server.
+
+    See :mod:`hansei.sharding` for more information on sharded reports.
+    """
+
+
+class SnapshotError(KokuException):
+    """A report cannot be written to, or read from, a snapshot file.
+
+    See :mod:`hansei.snapshot` for more information on report snapshots.
+    """
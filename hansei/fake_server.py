@@ -0,0 +1,694 @@
+# coding=utf-8
+"""An in-process stand-in for a Koku server.
+
+``FakeKoku`` implements the endpoints used by hansei (``token-auth/``,
+``status/``, ``customers/``, ``users/``, ``users/{uuid}/preferences/``,
+``providers/`` and the cost, storage and instance-type reports) on top of
+in-memory state. Reports are computed from a synthetic, deterministic data
+set (see ``hansei.synthetic``) whose volume is configurable, and latency can
+be injected in every response, so the client, the models and the report code
+can be benchmarked and load-tested without any external service.
+
+Every customer sees the same report data. ``filter[resolution]``,
+``filter[time_scope_value]``, ``filter[time_scope_units]``, ``group_by[*]``,
+``filter[*]``, ``order_by[*]``, ``start_date`` and ``end_date`` are
+honoured.
+
+Example::
+    >>> from hansei import api
+    >>> from hansei.fake_server import FakeKokuServer
+    >>> with FakeKokuServer(accounts=20, services=10, days=60) as server:
+    ...     client = api.Client(url=server.url, username='admin', password='pass')
+    ...     client.get('reports/costs/', params={'group_by[account]': '*'})
+
+The server can also be started from the command line and used by the test
+suite::
+
+    python -m hansei.fake_server --port 8000 --accounts 50 --days 90
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from hansei.constants import (
+    KOKU_API_VERSION,
+    KOKU_DEFAULT_PASSWORD,
+    KOKU_DEFAULT_USER,
+)
+from hansei.synthetic import REPORT_TYPES, ReportBuilder, SyntheticDataSet
+
+
+DEFAULT_PREFERENCES = (
+    ('currency', {'currency': 'USD'}, 'default preference'),
+    ('timezone', {'timezone': 'UTC'}, 'default preference'),
+    ('locale', {'locale': 'en_US.UTF-8'}, 'default preference'),
+)
+"""Preferences created along with every user, as Koku does."""
+
+
+class FakeKokuError(Exception):
+    """An error answered to the client with an HTTP status code."""
+
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.payload = detail if isinstance(detail, dict) else {'detail': detail}
+
+
+class FakeKoku(object):
+    """In-memory state and request handling of the fake Koku server."""
+
+    def __init__(self, accounts=3, services=5, days=62, instance_types=4, end_date=None,
+                 seed=0, latency=0.0, report_latency=None, page_size=10,
+                 username=KOKU_DEFAULT_USER, password=KOKU_DEFAULT_PASSWORD):
+        """
+        Arguments:
+            accounts, services, days, instance_types, end_date, seed - Volume
+                of the synthetic report data, see
+                ``hansei.synthetic.SyntheticDataSet``
+            latency - Seconds waited before answering any request
+            report_latency - Seconds waited before answering a report
+                request. Defaults to ``latency``
+            page_size - Default number of items in a page of results
+            username - Username of the service admin
+            password - Password of the service admin
+        """
+        self.data = SyntheticDataSet(
+            accounts=accounts, services=services, days=days,
+            instance_types=instance_types, end_date=end_date, seed=seed)
+        self.latency = latency
+        self.report_latency = latency if report_latency is None else report_latency
+        self.page_size = page_size
+        self.requests = 0
+
+        self.customers = OrderedDict()
+        self.users = OrderedDict()
+        self.providers = OrderedDict()
+        self.preferences = OrderedDict()
+        self.tokens = {}
+        self._lock = threading.RLock()
+
+        self._add_user(username, 'admin@example.com', password, customer=None, is_superuser=True)
+
+        self._routes = [
+            ('POST', r'token-auth/', self.login),
+            ('GET', r'status/', self.status),
+            ('GET', r'customers/', self.list_customers),
+            ('POST', r'customers/', self.create_customer),
+            ('GET', r'customers/(?P<uuid>[^/]+)/', self.read_customer),
+            ('DELETE', r'customers/(?P<uuid>[^/]+)/', self.delete_customer),
+            ('GET', r'users/', self.list_users),
+            ('POST', r'users/', self.create_user),
+            ('GET', r'users/current/', self.current_user),
+            ('GET', r'users/(?P<uuid>[^/]+)/', self.read_user),
+            ('DELETE', r'users/(?P<uuid>[^/]+)/', self.delete_user),
+            ('GET', r'users/(?P<user>[^/]+)/preferences/', self.list_preferences),
+            ('POST', r'users/(?P<user>[^/]+)/preferences/', self.create_preference),
+            ('GET', r'users/(?P<user>[^/]+)/preferences/(?P<uuid>[^/]+)/', self.read_preference),
+            ('PUT', r'users/(?P<user>[^/]+)/preferences/(?P<uuid>[^/]+)/',
+             self.update_preference),
+            ('DELETE', r'users/(?P<user>[^/]+)/preferences/(?P<uuid>[^/]+)/',
+             self.delete_preference),
+            ('GET', r'providers/', self.list_providers),
+            ('POST', r'providers/', self.create_provider),
+            ('GET', r'providers/(?P<uuid>[^/]+)/', self.read_provider),
+            ('DELETE', r'providers/(?P<uuid>[^/]+)/', self.delete_provider),
+        ] + [
+            ('GET', re.escape(path), self.report) for path in REPORT_TYPES
+        ]
+        self._routes = [
+            (method, re.compile(pattern + '$'), handler) for method, pattern, handler in self._routes]
+
+    def handle(self, method, path, query, body, headers, base_url=''):
+        """Answer a request.
+
+        Arguments:
+            method - HTTP method
+            path - Path of the request relative to the API root
+            query - List of ``(name, value)`` query parameters
+            body - Decoded JSON body, or None
+            headers - Request headers
+            base_url - API root URL, used to build pagination links
+
+        Returns: (status code, JSON payload or None) tuple
+        """
+        with self._lock:
+            self.requests += 1
+
+        delay = self.report_latency if path in REPORT_TYPES else self.latency
+        if delay:
+            time.sleep(delay)
+
+        path_matched = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            path_matched = True
+            if route_method != method:
+                continue
+
+            try:
+                user = None
+                if handler not in (self.login, self.status):
+                    user = self._authenticate(headers)
+                request = {
+                    'user': user, 'path': path, 'query': query, 'body': body or {},
+                    'url': base_url + path, 'args': match.groupdict()}
+                with self._lock:
+                    return handler(request)
+            except FakeKokuError as error:
+                return error.status, error.payload
+
+        if path_matched:
+            return 405, {'detail': 'Method "{}" not allowed.'.format(method)}
+        return 404, {'detail': 'Not found.'}
+
+    ##################################################
+    # Helpers
+    ##################################################
+    def _authenticate(self, headers):
+        authorization = headers.get('Authorization') or ''
+        scheme, _, token = authorization.partition(' ')
+        user = self.users.get(self.tokens.get(token)) if scheme == 'Token' else None
+        if not user:
+            raise FakeKokuError(401, 'Authentication credentials were not provided.')
+        return user
+
+    @staticmethod
+    def _require_admin(user):
+        if not user['is_superuser']:
+            raise FakeKokuError(403, 'You do not have permission to perform this action.')
+
+    def _paginate(self, request, items):
+        query = dict(request['query'])
+        try:
+            page_size = int(query.get('page_size') or self.page_size)
+            page = int(query.get('page') or 1)
+        except ValueError:
+            raise FakeKokuError(400, 'Invalid page.')
+        if page < 1 or (page > 1 and (page - 1) * page_size >= len(items)):
+            raise FakeKokuError(404, 'Invalid page.')
+
+        def link(number):
+            params = dict(query, page=number)
+            return '{}?{}'.format(request['url'], urlencode(sorted(params.items())))
+
+        return 200, {
+            'count': len(items),
+            'next': link(page + 1) if page * page_size < len(items) else None,
+            'previous': link(page - 1) if page > 1 else None,
+            'results': items[(page - 1) * page_size:page * page_size],
+        }
+
+    @staticmethod
+    def _user_summary(user):
+        return {'uuid': user['uuid'], 'username': user['username'], 'email': user['email']}
+
+    def _customer_payload(self, customer):
+        return {
+            'uuid': customer['uuid'],
+            'name': customer['name'],
+            'owner': self._user_summary(self.users[customer['owner']]),
+            'date_created': customer['date_created'],
+        }
+
+    def _provider_payload(self, provider):
+        return {
+            'uuid': provider['uuid'],
+            'name': provider['name'],
+            'type': provider['type'],
+            'authentication': provider['authentication'],
+            'billing_source': provider['billing_source'],
+            'customer': self._customer_payload(self.customers[provider['customer']]),
+            'created_by': self._user_summary(self.users[provider['created_by']]),
+        }
+
+    def _preference_payload(self, preference):
+        return {
+            'uuid': preference['uuid'],
+            'name': preference['name'],
+            'description': preference['description'],
+            'preference': preference['preference'],
+            'user': self._user_summary(self.users[preference['user']]),
+        }
+
+    def _validate_user(self, payload):
+        errors = {}
+        if not payload.get('username'):
+            errors['username'] = ['This field may not be blank.']
+        elif any(user['username'] == payload['username'] for user in self.users.values()):
+            errors['username'] = ['A user with that username already exists.']
+        email = payload.get('email') or ''
+        if not re.match(r'^[^@\s]+@[^@\s]+\.[^@\s]+$', email):
+            errors['email'] = ['Enter a valid email address.']
+        if errors:
+            raise FakeKokuError(400, errors)
+
+    def _add_user(self, username, email, password, customer, is_superuser=False):
+        user = {
+            'uuid': str(uuid.uuid4()),
+            'username': username,
+            'email': email,
+            'password': password,
+            'customer': customer,
+            'is_superuser': is_superuser,
+        }
+        self.users[user['uuid']] = user
+        for name, preference, description in DEFAULT_PREFERENCES:
+            self._add_preference(user['uuid'], name, dict(preference), description)
+        return user
+
+    def _add_preference(self, user_uuid, name, preference, description):
+        entry = {
+            'uuid': str(uuid.uuid4()),
+            'user': user_uuid,
+            'name': name,
+            'preference': preference,
+            'description': description,
+        }
+        self.preferences[entry['uuid']] = entry
+        return entry
+
+    def _visible_user(self, request, user_uuid):
+        user = request['user']
+        target = self.users.get(user_uuid)
+        if not target or not (
+                user['is_superuser'] or target['uuid'] == user['uuid'] or
+                (user['customer'] and target['customer'] == user['customer'])):
+            raise FakeKokuError(404, 'Not found.')
+        return target
+
+    def _visible_preference(self, request):
+        user = self._visible_user(request, request['args']['user'])
+        preference = self.preferences.get(request['args']['uuid'])
+        if not preference or preference['user'] != user['uuid']:
+            raise FakeKokuError(404, 'Not found.')
+        return preference
+
+    def _visible_provider(self, request):
+        provider = self.providers.get(request['args']['uuid'])
+        user = request['user']
+        if not provider or not (
+                user['is_superuser'] or provider['customer'] == user['customer']):
+            raise FakeKokuError(404, 'Not found.')
+        return provider
+
+    ##################################################
+    # Authentication and status
+    ##################################################
+    def login(self, request):
+        body = request['body']
+        for user in self.users.values():
+            if user['username'] == body.get('username') and user['password'] == body.get('password'):
+                token = uuid.uuid4().hex
+                self.tokens[token] = user['uuid']
+                return 200, {'token': token}
+        raise FakeKokuError(400, {
+            'non_field_errors': ['Unable to log in with provided credentials.']})
+
+    def status(self, request):
+        return 200, {
+            'api_version': 1,
+            'commit': 'fake',
+            'server_id': 'fake-koku',
+            'python_version': '3.6',
+            'platform_info': {'system': 'hansei.fake_server'},
+        }
+
+    ##################################################
+    # Customers
+    ##################################################
+    def list_customers(self, request):
+        self._require_admin(request['user'])
+        return self._paginate(
+            request, [self._customer_payload(customer) for customer in self.customers.values()])
+
+    def create_customer(self, request):
+        self._require_admin(request['user'])
+        body = request['body']
+        owner = body.get('owner') or {}
+        if not body.get('name'):
+            raise FakeKokuError(400, {'name': ['This field may not be blank.']})
+        if any(customer['name'] == body['name'] for customer in self.customers.values()):
+            raise FakeKokuError(400, {'name': ['customer with this name already exists.']})
+        self._validate_user(owner)
+
+        customer = {
+            'uuid': str(uuid.uuid4()),
+            'name': body['name'],
+            'date_created': datetime.datetime.utcnow().isoformat() + 'Z',
+        }
+        self.customers[customer['uuid']] = customer
+        customer['owner'] = self._add_user(
+            owner['username'], owner['email'], owner.get('password'), customer['uuid'])['uuid']
+        return 201, self._customer_payload(customer)
+
+    def read_customer(self, request):
+        self._require_admin(request['user'])
+        customer = self.customers.get(request['args']['uuid'])
+        if not customer:
+            raise FakeKokuError(404, 'Not found.')
+        return 200, self._customer_payload(customer)
+
+    def delete_customer(self, request):
+        self._require_admin(request['user'])
+        customer_uuid = request['args']['uuid']
+        if customer_uuid not in self.customers:
+            raise FakeKokuError(404, 'Not found.')
+
+        del self.customers[customer_uuid]
+        for provider in list(self.providers.values()):
+            if provider['customer'] == customer_uuid:
+                del self.providers[provider['uuid']]
+        for user in list(self.users.values()):
+            if user['customer'] == customer_uuid:
+                self._remove_user(user['uuid'])
+        return 204, None
+
+    ##################################################
+    # Users and preferences
+    ##################################################
+    def list_users(self, request):
+        user = request['user']
+        users = [
+            self._user_summary(target) for target in self.users.values()
+            if user['is_superuser'] or target['customer'] == user['customer']]
+        return self._paginate(request, users)
+
+    def create_user(self, request):
+        user = request['user']
+        if not user['customer']:
+            raise FakeKokuError(400, 'Users can only be created by a customer user.')
+        body = request['body']
+        self._validate_user(body)
+        new_user = self._add_user(
+            body['username'], body['email'], body.get('password'), user['customer'])
+        return 201, self._user_summary(new_user)
+
+    def current_user(self, request):
+        return 200, self._user_summary(request['user'])
+
+    def read_user(self, request):
+        return 200, self._user_summary(self._visible_user(request, request['args']['uuid']))
+
+    def delete_user(self, request):
+        target = self._visible_user(request, request['args']['uuid'])
+        self._remove_user(target['uuid'])
+        return 204, None
+
+    def _remove_user(self, user_uuid):
+        del self.users[user_uuid]
+        for preference in list(self.preferences.values()):
+            if preference['user'] == user_uuid:
+                del self.preferences[preference['uuid']]
+        for token, token_user in list(self.tokens.items()):
+            if token_user == user_uuid:
+                del self.tokens[token]
+
+    def list_preferences(self, request):
+        user = self._visible_user(request, request['args']['user'])
+        return self._paginate(request, [
+            self._preference_payload(preference) for preference in self.preferences.values()
+            if preference['user'] == user['uuid']])
+
+    def create_preference(self, request):
+        user = self._visible_user(request, request['args']['user'])
+        body = request['body']
+        errors = {}
+        if not body.get('name'):
+            errors['name'] = ['This field may not be blank.']
+        elif any(preference['user'] == user['uuid'] and preference['name'] == body['name']
+                 for preference in self.preferences.values()):
+            errors['name'] = ['This preference already exists for the user.']
+        if not isinstance(body.get('preference'), dict) or not body['preference']:
+            errors['preference'] = ['This field may not be null.']
+        if errors:
+            raise FakeKokuError(400, errors)
+
+        preference = self._add_preference(
+            user['uuid'], body['name'], body['preference'], body.get('description'))
+        return 201, self._preference_payload(preference)
+
+    def read_preference(self, request):
+        return 200, self._preference_payload(self._visible_preference(request))
+
+    def update_preference(self, request):
+        preference = self._visible_preference(request)
+        for key in ('name', 'description', 'preference'):
+            if key in request['body']:
+                preference[key] = request['body'][key]
+        return 200, self._preference_payload(preference)
+
+    def delete_preference(self, request):
+        del self.preferences[self._visible_preference(request)['uuid']]
+        return 204, None
+
+    ##################################################
+    # Providers
+    ##################################################
+    def list_providers(self, request):
+        user = request['user']
+        return self._paginate(request, [
+            self._provider_payload(provider) for provider in self.providers.values()
+            if user['is_superuser'] or provider['customer'] == user['customer']])
+
+    def create_provider(self, request):
+        user = request['user']
+        body = request['body']
+        if not user['customer']:
+            raise FakeKokuError(400, 'Providers can only be created by a customer user.')
+
+        errors = {}
+        if not body.get('name'):
+            errors['name'] = ['This field may not be blank.']
+        if body.get('type') not in ('AWS', 'OCP'):
+            errors['type'] = ['"{}" is not a valid choice.'.format(body.get('type'))]
+        if not (body.get('authentication') or {}).get('provider_resource_name'):
+            errors['authentication'] = ['A provider resource name is required.']
+        if not isinstance(body.get('billing_source'), dict):
+            errors['billing_source'] = ['This field may not be null.']
+        elif any(provider['authentication'] == body['authentication'] and
+                 provider['billing_source'] == body['billing_source']
+                 for provider in self.providers.values()):
+            errors['non_field_errors'] = [
+                'Cost management does not allow duplicate accounts. '
+                'A provider already exists with these details.']
+        if errors:
+            raise FakeKokuError(400, errors)
+
+        provider = {
+            'uuid': str(uuid.uuid4()),
+            'name': body['name'],
+            'type': body['type'],
+            'authentication': body['authentication'],
+            'billing_source': body['billing_source'],
+            'customer': user['customer'],
+            'created_by': user['uuid'],
+        }
+        self.providers[provider['uuid']] = provider
+        return 201, self._provider_payload(provider)
+
+    def read_provider(self, request):
+        return 200, self._provider_payload(self._visible_provider(request))
+
+    def delete_provider(self, request):
+        del self.providers[self._visible_provider(request)['uuid']]
+        return 204, None
+
+    ##################################################
+    # Reports
+    ##################################################
+    def report(self, request):
+        report_filter = {}
+        group_by = OrderedDict()
+        order_by = OrderedDict()
+        dates = {}
+        for name, value in request['query']:
+            if name in ('start_date', 'end_date'):
+                dates[name] = value
+                continue
+            match = re.match(r'^(filter|group_by|order_by)\[(\w+)\]$', name)
+            if not match:
+                continue
+            kind, key = match.groups()
+            if kind == 'filter':
+                report_filter[key] = value
+            elif kind == 'order_by':
+                order_by[key] = value
+            else:
+                group_by.setdefault(key, []).append(value)
+
+        date_range = None
+        if dates:
+            if len(dates) != 2:
+                raise FakeKokuError(400, 'start_date and end_date must be given together')
+            date_range = (dates['start_date'], dates['end_date'])
+
+        try:
+            builder = ReportBuilder(
+                self.data, request['path'], report_filter=report_filter, group_by=group_by,
+                order_by=order_by, date_range=date_range)
+        except ValueError as error:
+            raise FakeKokuError(400, str(error))
+        return 200, builder.report()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Translate HTTP requests to ``FakeKoku.handle`` calls."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        koku = self.server.koku
+        url = urlsplit(self.path)
+        root = '/' + KOKU_API_VERSION
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+
+        if not url.path.startswith(root):
+            status, payload = 404, {'detail': 'Not found.'}
+        else:
+            try:
+                body = json.loads(raw_body.decode('utf-8')) if raw_body else None
+            except ValueError:
+                status, payload = 400, {'detail': 'JSON parse error.'}
+            else:
+                base_url = 'http://{}{}'.format(self.headers.get('Host', ''), root)
+                status, payload = koku.handle(
+                    self.command, url.path[len(root):],
+                    parse_qsl(url.query, keep_blank_values=True), body, self.headers,
+                    base_url=base_url)
+
+        content = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        headers = {}
+        if self.command == 'GET' and status == 200:
+            etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                status, content = 304, b''
+
+        self.send_response(status)
+        if content:
+            self.send_header('Content-Type', 'application/json')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+
+class FakeKokuServer(object):
+    """Serve a ``FakeKoku`` over HTTP from a background thread."""
+
+    def __init__(self, koku=None, host='127.0.0.1', port=0, **kwargs):
+        """
+        Arguments:
+            koku - ``FakeKoku`` to serve. Built from ``kwargs`` if None
+            host - Address to listen on
+            port - Port to listen on. A free port is picked if 0
+            kwargs - Arguments of ``FakeKoku``
+        """
+        self.koku = koku or FakeKoku(**kwargs)
+        self.httpd = _ThreadingHTTPServer((host, port), _RequestHandler)
+        self.httpd.koku = self.koku
+        self._thread = None
+
+    @property
+    def hostname(self):
+        host = self.httpd.server_address[0]
+        return socket.gethostname() if host in ('', '0.0.0.0') else host
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    @property
+    def url(self):
+        """Base URL of the API, suitable for ``hansei.api.Client(url=...)``."""
+        return 'http://{}:{}/{}'.format(self.hostname, self.port, KOKU_API_VERSION)
+
+    def koku_config(self):
+        """Return a ``koku`` config section pointing at this server."""
+        admin = next(user for user in self.koku.users.values() if user['is_superuser'])
+        return {
+            'hostname': self.hostname,
+            'port': self.port,
+            'username': admin['username'],
+            'password': admin['password'],
+        }
+
+    def start(self):
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        if self._thread:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main(argv=None):
+    """Run a fake Koku server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--services', type=int, default=5)
+    parser.add_argument('--instance-types', type=int, default=4)
+    parser.add_argument('--days', type=int, default=62)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds waited before answering any request')
+    parser.add_argument('--report-latency', type=float, default=None,
+                        help='Seconds waited before answering a report request')
+    parser.add_argument('--username', default=KOKU_DEFAULT_USER)
+    parser.add_argument('--password', default=KOKU_DEFAULT_PASSWORD)
+    args = parser.parse_args(argv)
+
+    server = FakeKokuServer(
+        host=args.host, port=args.port, accounts=args.accounts, services=args.services,
+        instance_types=args.instance_types, days=args.days, seed=args.seed,
+        latency=args.latency, report_latency=args.report_latency,
+        username=args.username, password=args.password)
+    print('Serving a fake Koku API at {}'.format(server.url))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# coding=utf-8
+"""Run one report query for many customers concurrently.
+
+The report validation tests fetch the same report for every customer of the
+session, one customer after the other, so every new tenant adds the time of
+its requests to the test. ``fan_out`` sends the query of every customer at
+the same time, each with the authenticated client of the customer owner, and
+gathers the reports, their line item totals and the latency of each
+customer.
+
+Example::
+    >>> results = fan_out(KokuCostReport, session_customers,
+    ...                   report_filter={'resolution': 'daily'}, group_by=[['account', '*']])
+    >>> for key, result in results.items():
+    ...     assert result.report.total['value'] == result.total
+    >>> print(latency_report(results))
+"""
+import collections
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from hansei.report_query import ReportQuery
+
+
+FanOutResult = collections.namedtuple('FanOutResult', [
+    'key',      # Key of the customer in the customers given to fan_out
+    'report',   # KokuBaseReport holding the report of the customer
+    'total',    # Result of report.calculate_total()
+    'latency',  # Seconds taken to fetch and sum the report
+    'error',    # Exception raised while fetching the report, or None
+])
+"""The report of one customer fetched by ``fan_out``."""
+
+
+def _client(customer):
+    """Return the client a customer, a user or a client sends requests with."""
+    owner = getattr(customer, 'owner', None)
+    if owner is not None:
+        return owner.client
+    return getattr(customer, 'client', customer)
+
+
+def fetch_report(report_class, customer, query, key=None):
+    """Fetch the report of one customer, timing it and catching its errors.
+
+    Arguments:
+        report_class - ``hansei.koku_models.KokuBaseReport`` subclass
+        customer - ``hansei.koku_models.KokuCustomer``, user or
+            ``hansei.api.Client`` object
+        query - ``hansei.report_query.ReportQuery`` of the report
+        key - Key of the customer stored in the result
+
+    Returns: ``FanOutResult``
+    """
+    started = time.perf_counter()
+    report = report_class(_client(customer))
+    try:
+        report.get(query=query)
+        total = report.calculate_total()
+    except Exception as exc:
+        return FanOutResult(key, report, None, time.perf_counter() - started, exc)
+    return FanOutResult(key, report, total, time.perf_counter() - started, None)
+
+
+def fan_out(report_class, customers, report_filter=None, order_by=None, group_by=None,
+            query=None, max_workers=None, raise_errors=True):
+    """Fetch a report for every customer concurrently.
+
+    Arguments:
+        report_class - ``hansei.koku_models.KokuBaseReport`` subclass, e.g.
+            ``KokuCostReport``
+        customers - Dictionary or iterable of ``hansei.koku_models.KokuCustomer``
+            objects. Their owner client is used. Users and
+            ``hansei.api.Client`` objects can be given as well
+        report_filter, order_by, group_by, query - Query of the report, see
+            ``hansei.koku_models.KokuBaseReport.get``
+        max_workers - Number of customers served at once. Defaults to all
+        raise_errors - Raise the first error, in customer order, once every
+            report was fetched. Otherwise errors are left in the results
+
+    Returns: OrderedDict of customer key (the dictionary key, or the index of
+        the customer) to ``FanOutResult``, in customer order
+    """
+    query = ReportQuery.coerce(
+        query, report_filter=report_filter, order_by=order_by, group_by=group_by)
+    items = list(customers.items() if hasattr(customers, 'items') else enumerate(customers))
+    if not items:
+        return OrderedDict()
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(items)) as executor:
+        futures = [
+            executor.submit(fetch_report, report_class, customer, query, key)
+            for key, customer in items]
+        results = OrderedDict((future.result().key, future.result()) for future in futures)
+
+    if raise_errors:
+        for result in results.values():
+            if result.error is not None:
+                raise result.error
+    return results
+
+
+def latency_report(results):
+    """Return a table of the latency of each customer, slowest first."""
+    lines = ['{:<40} {:>9} {:>10} {}'.format('customer', 'latency', 'line items', 'error')]
+    for result in sorted(results.values(), key=lambda result: -result.latency):
+        line_items = len(result.report.report_line_items()) if result.report.data else 0
+        lines.append('{:<40} {:>8.3f}s {:>10} {}'.format(
+            str(result.key), result.latency, line_items,
+            type(result.error).__name__ if result.error else ''))
+    return '\n'.join(lines)
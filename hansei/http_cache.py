@@ -0,0 +1,255 @@
+# coding=utf-8
+"""In-memory cache of GET responses, revalidated with conditional requests.
+
+Report and list endpoints are fetched again and again with the same query
+during a test session. A ``ResponseCache`` keeps the responses of those
+requests and, instead of downloading the same body again, asks the server
+whether it changed by sending ``If-None-Match``/``If-Modified-Since``. A
+``304 Not Modified`` answer is served from the cache.
+
+Requests changing data on the server (POST, PUT, DELETE) invalidate the
+entries cached under the same path.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+from hansei.constants import (
+    KOKU_HTTP_CACHE_MAX_AGE,
+    KOKU_HTTP_CACHE_MAX_BYTES,
+    KOKU_HTTP_CACHE_TTL,
+)
+
+
+def normalize_params(params):
+    """Return ``params`` as a hashable tuple of ``(key, value)`` pairs.
+
+    Parameters are sorted by name so that the order they were supplied in does
+    not matter, except for ``group_by`` parameters: Koku nests the report data
+    in the order the groups are given, so their relative order is kept.
+
+    Arguments:
+        params - Dictionary, list of pairs or query string as accepted by
+            ``requests``. Dictionary values may be lists.
+    """
+    if not params:
+        return ()
+
+    if isinstance(params, (str, bytes)):
+        if isinstance(params, bytes):
+            params = params.decode('utf-8')
+        pairs = parse_qsl(params, keep_blank_values=True)
+    else:
+        items = params.items() if hasattr(params, 'items') else params
+        pairs = []
+        for key, value in items:
+            values = value if isinstance(value, (list, tuple)) else [value]
+            pairs.extend((str(key), str(val)) for val in values if val is not None)
+
+    group_pairs = tuple(pair for pair in pairs if pair[0].startswith('group_by'))
+    other_pairs = tuple(sorted(pair for pair in pairs if not pair[0].startswith('group_by')))
+    return other_pairs + group_pairs
+
+
+def split_url(url, params=None):
+    """Return the URL without its query string and the normalized parameters.
+
+    Parameters found in the query string of ``url`` are merged with
+    ``params``.
+    """
+    parts = urlsplit(url)
+    base_url = urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+    query = normalize_params(parts.query)
+    return base_url, normalize_params(list(query) + list(normalize_params(params)))
+
+
+def request_key(method, url, params=None, token=None):
+    """Return a hashable key identifying a request.
+
+    Arguments:
+        method - HTTP method of the request
+        url - Absolute URL of the request
+        params - Query parameters as accepted by ``requests``
+        token - Authorization token. Responses depend on the user identity,
+            so a digest of the token is part of the key
+    """
+    base_url, query = split_url(url, params)
+    identity = hashlib.sha256(token.encode('utf-8')).hexdigest() if token else None
+    return (method.upper(), base_url, query, identity)
+
+
+class CacheEntry(object):
+    """A cached response along with its validators."""
+
+    def __init__(self, response):
+        self.response = response
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        self.stored_at = time.monotonic()
+        self.size = len(response.content or b'') + sum(
+            len(key) + len(value) for key, value in response.headers.items())
+
+    @property
+    def age(self):
+        """Seconds since the entry was stored or last revalidated"""
+        return time.monotonic() - self.stored_at
+
+    def conditional_headers(self):
+        """Return the headers used to revalidate this entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """A thread safe LRU cache of responses bounded by size and age.
+
+    Only successful responses carrying an ``ETag`` or ``Last-Modified``
+    header are stored, since they are the only ones that can be revalidated.
+    """
+
+    def __init__(
+            self,
+            max_bytes=KOKU_HTTP_CACHE_MAX_BYTES,
+            ttl=KOKU_HTTP_CACHE_TTL,
+            max_age=KOKU_HTTP_CACHE_MAX_AGE):
+        """
+        Arguments:
+            max_bytes - Maximum size of all cached bodies and headers
+            ttl - Seconds after which an entry is dropped
+            max_age - Seconds during which an entry is served without being
+                revalidated. Defaults to 0: always revalidate
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_age = max_age
+        self.size = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Build a cache from the ``http-cache`` subsection of the koku config::
+
+            koku:
+                http-cache:
+                    enabled: true
+                    max-bytes: 67108864
+                    ttl: 300
+                    max-age: 0
+
+        Returns None if the cache is not enabled.
+        """
+        if not cfg.get('enabled', False):
+            return None
+
+        return cls(
+            max_bytes=cfg.get('max-bytes', KOKU_HTTP_CACHE_MAX_BYTES),
+            ttl=cfg.get('ttl', KOKU_HTTP_CACHE_TTL),
+            max_age=cfg.get('max-age', KOKU_HTTP_CACHE_MAX_AGE))
+
+    key = staticmethod(request_key)
+
+    def get(self, key):
+        """Return the entry stored under ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry.age > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry):
+        """Return True if ``entry`` can be served without revalidation."""
+        return entry.age <= self.max_age
+
+    def store(self, key, response):
+        """Cache ``response`` under ``key`` if it can be revalidated later."""
+        if response.status_code != 200:
+            return
+        entry = CacheEntry(response)
+        if not (entry.etag or entry.last_modified) or entry.size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def serve(self, entry, response=None):
+        """Return a copy of the cached response.
+
+        Arguments:
+            entry - ``CacheEntry`` to serve
+            response - The ``304 Not Modified`` response received when the
+                entry was revalidated, if any
+        """
+        with self._lock:
+            if response is None:
+                self.hits += 1
+            else:
+                self.revalidated += 1
+                entry.stored_at = time.monotonic()
+
+        cached = copy.copy(entry.response)
+        cached.headers = copy.copy(entry.response.headers)
+        if response is not None:
+            cached.request = response.request
+            cached.elapsed = response.elapsed
+            cached.attempts = getattr(response, 'attempts', 1)
+        cached.from_cache = True
+        return cached
+
+    def invalidate(self, url):
+        """Drop the entries cached under the path of ``url``.
+
+        Entries for ``url`` itself, for the paths below it and for the
+        collections above it are removed, so that e.g. deleting
+        ``customers/<uuid>/`` also drops the cached ``customers/`` list.
+        """
+        base_url = split_url(url)[0]
+        with self._lock:
+            for key in list(self._entries):
+                cached_url = key[1]
+                if cached_url.startswith(base_url) or base_url.startswith(cached_url):
+                    self._remove(key)
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Return the cache counters as a dictionary."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'revalidated': self.revalidated,
+                'misses': self.misses,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
@@ -1,13 +1,20 @@
 # coding: utf-8
 """Models for use with the Koku API."""
 
+import datetime
 from decimal import Decimal
+from itertools import chain
+from operator import itemgetter
 
 from pprint import pformat
 from urllib.parse import urljoin
 
 from hansei import api, config
-from hansei.exceptions import KokuException
+from hansei.columns import ReportColumns
+from hansei.report_query import ReportQuery, time_range
+from hansei.sharding import merge_reports, shard_query
+from hansei.streaming import stream_response
+from hansei.exceptions import KokuException, ReportConsistencyError
 from hansei.constants import (
     KOKU_DEFAULT_USER,
     KOKU_DEFAULT_PASSWORD,
@@ -16,7 +23,9 @@ from hansei.constants import (
     KOKU_PROVIDER_PATH,
     KOKU_COST_REPORTS_PATH,
     KOKU_STORAGE_REPORTS_PATH,
-    KOKU_INSTANCE_REPORTS_PATH
+    KOKU_INSTANCE_REPORTS_PATH,
+    KOKU_REPORT_REFRESH_DAYS,
+    KOKU_REPORT_SHARD_TOLERANCE
 )
 
 
@@ -101,9 +110,12 @@ class KokuObject(object):
         """Send GET request return the user assigned to the client authentication token"""
         return self.client.get_user()
 
-    def _create(self, client=None, **kwargs):
+    def _create(self, client=None, allow_retry=False, **kwargs):
         """Send POST request to the self.endpoint of this object.
 
+        :param allow_retry: If True, the POST request is retried according to
+            the client retry policy. POST requests are never retried otherwise
+            since the object may have been created by a failed attempt.
         :param ``**kwargs``: Additional arguments accepted by Requests's
             ``request.request()`` method.
 
@@ -118,6 +130,11 @@ class KokuObject(object):
         """
         client = client or self.client
 
+        if allow_retry and client.retry_policy:
+            kwargs.setdefault('retry_policy', client.retry_policy.allowing('POST'))
+        else:
+            kwargs['retry_policy'] = None
+
         response = client.post(self.endpoint, self.payload(), **kwargs)
         if response.status_code in range(200, 203):
             self.uuid = response.json().get('uuid')
@@ -776,48 +793,298 @@ class KokuBaseReport(object):
         self.client = client
         self.endpoint = None
         self.last_report = None
+        # ReportQuery of the report fetched by the last call to get()
+        self.last_query = None
 
         # Initialize all properties storing all cached report data
         self._clear_report_cache()
 
-    def get(self, report_filter=None, order_by=None, group_by=None):
+    def get(self, report_filter=None, order_by=None, group_by=None, use_cache=True, query=None,
+            shard_days=None, check_total=True):
         """
+        If the client has a ``hansei.report_cache.ReportCache``, a report
+        already fetched by the same user with the same query is served from
+        it, along with its line items once they were listed.
+
+        With ``shard_days``, the query is split into date shards fetched
+        concurrently and merged into a single report, see ``hansei.sharding``.
+
         Arguments:
             report_filter - Dictionary of filter queries key. Key:Value => Filter name:Filter Value
             order_by - tuple of the order by value.
                 Example: ['cost', 'asc']
             group_by - List of tuples for accounts, services,... to group by
                 Example: [['account', '*'], ['service', 'Compute Instance']]
+            use_cache - Set to False to always fetch the report from the server
+            query - ``hansei.report_query.ReportQuery`` sent instead of the
+                filter, order_by and group_by arguments
+            shard_days - Number of days of each shard the query is split into
+            check_total - When sharding, also fetch the ungrouped report of
+                the whole query and check that its total is the merged total
+
+        :raises: ``hansei.exceptions.ReportConsistencyError`` if a shard does
+            not cover its date range or if the merged total is not the total
+            reported by the server.
         """
 
-        query_params = {}
-        if order_by:
-            query_params['order_by[{}]'.format(order_by[0])] = order_by[1]
-
-        if group_by:
-            for group in group_by:
-                key, val = group
-                query_param_key = 'group_by[{}]'.format(key)
-                # The key for group_by params can be duplicated so we need to set the query param
-                # values to lists so that when we pass query_params and the payload to client.get
-                # reponse.get() will know that we need to pass the key multiple times but with
-                # different values
-                if query_param_key not in query_params:
-                    query_params[query_param_key] = []
-                query_params[query_param_key].append(val)
-
-        if report_filter:
-            for key, val in report_filter.items():
-                query_params['filter[{}]'.format(key)] = val
+        query = ReportQuery.coerce(
+            query, report_filter=report_filter, order_by=order_by, group_by=group_by)
 
         # Clear the cache of items from the last report
         self._clear_report_cache()
 
-        response = self.client.get(self.endpoint, params=query_params)
-        self.last_report = response.json()
+        report_cache = getattr(self.client, 'report_cache', None) if use_cache else None
+        if report_cache is not None:
+            cache_key = report_cache.key(self.client, self.endpoint, query)
+            entry = report_cache.get(cache_key)
+            if entry is not None:
+                self._cache_entry = entry
+                self._line_items = entry.line_items
+                self.last_report = entry.report
+                self.last_query = query
+                return self.last_report
+
+        if shard_days:
+            self.last_report = self._get_sharded(query, shard_days, check_total)
+        else:
+            response = self.client.get(
+                self.endpoint, params=query.params, response_handler=api.code_handler)
+            self.last_report = api.decode_json(response)
+        self.last_query = query
+
+        if report_cache is not None:
+            self._cache_entry = report_cache.store(cache_key, self.last_report)
+
+        return self.last_report
+
+    def refresh(self, days=KOKU_REPORT_REFRESH_DAYS, since=None, end_date=None):
+        """
+        Refetch the trailing days of the report fetched by the last call to
+        ``get`` and merge them into it.
+
+        Past days of cost data rarely change, so only the periods from
+        ``since``, or from the last ``days`` days, up to the end of the time
+        scope are fetched again. They replace the periods of the report with
+        the same dates, and periods having left the time scope since the
+        report was fetched are dropped. The total value is updated
+        incrementally: the line items of the replaced and dropped periods are
+        subtracted from it and the total of the refetched periods is added.
+        Counts do not add up across days, so the total count is only kept
+        when the whole time scope was refetched.
+
+        Monthly reports are refetched from the start of the month. The
+        trailing periods are fetched with ``start_date`` and ``end_date``, so
+        the server must support them: a response not covering exactly the
+        refetched periods raises a ``ReportConsistencyError``.
+
+        Arguments:
+            days - Number of trailing days fetched again
+            since - First day fetched again, as a date or a ``YYYY-MM-DD``
+                string, e.g. the last day known to be final. Overrides ``days``
+            end_date - Last day of the query time scope. Defaults to today
+
+        Returns: the refreshed report
 
+        :raises: ``hansei.exceptions.ReportConsistencyError`` if the server
+            ignored the date range.
+        """
+        if self.last_report is None or self.last_query is None:
+            raise KokuException('There is no report fetched by get() to refresh')
+
+        query = self.last_query
+        start, end, resolution = time_range(
+            end_date or datetime.date.today(), dict(query.filters), query.date_range)
+        if since is None:
+            since = end - datetime.timedelta(days=days - 1)
+        elif not isinstance(since, datetime.date):
+            since = datetime.datetime.strptime(since, '%Y-%m-%d').date()
+        period_format = '%Y-%m-%d' if resolution == 'daily' else '%Y-%m'
+        since = max(since, start)
+        if resolution == 'monthly':
+            since = max(since.replace(day=1), start)
+
+        refresh_query = query.filter(
+            time_scope_value=None, time_scope_units=None).between(since, end)
+        response = self.client.get(
+            self.endpoint, params=refresh_query.params, response_handler=api.code_handler)
+        refreshed = api.decode_json(response)
+
+        self._check_periods(refreshed, since, end, resolution)
+        first_period = start.strftime(period_format)
+        since_period = since.strftime(period_format)
+        kept = []
+        removed = []
+        for entry in self._data or []:
+            if first_period <= entry.get('date', '') < since_period:
+                kept.append(entry)
+            else:
+                removed.append(entry)
+
+        # Incremental update of the total value. Counts do not add up across
+        # days, so the count is only known when every period was refetched
+        total = dict(self.last_report.get('total') or {})
+        total.pop('count', None)
+        for key, value in (refreshed.get('total') or {}).items():
+            if key == 'count' and since > start:
+                continue
+            if key != 'value' or total.get(key) is None:
+                total[key] = value
+                continue
+            total[key] -= sum(
+                item.get('total') or 0
+                for _, values in self._iter_values(removed, group_paths=False)
+                for item in values)
+            total[key] += value or 0
+
+        report = dict(self.last_report)
+        report['data'] = kept + list(refreshed.get('data') or [])
+        report['total'] = total
+
+        self._clear_report_cache()
+        self.last_report = report
+        report_cache = getattr(self.client, 'report_cache', None)
+        if report_cache is not None:
+            self._cache_entry = report_cache.store(
+                report_cache.key(self.client, self.endpoint, query), report)
         return self.last_report
 
+    @staticmethod
+    def _check_periods(report, start, end, resolution):
+        """
+        Raise a ``ReportConsistencyError`` unless the data of a report fetched
+        with ``start_date`` and ``end_date`` covers exactly the periods from
+        ``start`` to ``end``.
+
+        Koku versions without start_date and end_date return their default
+        time scope instead, which must not be merged into another report.
+        """
+        period_format = '%Y-%m-%d' if resolution == 'daily' else '%Y-%m'
+        start_period = start.strftime(period_format)
+        end_period = end.strftime(period_format)
+        dates = [entry.get('date', '') for entry in report.get('data') or []]
+        if (start_period not in dates or end_period not in dates or
+                any(not start_period <= date <= end_period for date in dates)):
+            raise ReportConsistencyError(
+                'The server returned the periods {} to {} instead of {} to {}, it may not '
+                'support start_date and end_date'.format(
+                    min(dates, default=None), max(dates, default=None),
+                    start_period, end_period))
+
+    def _get_sharded(self, query, shard_days, check_total=True):
+        """Fetch the date shards of a query concurrently and merge them.
+
+        :raises: ``hansei.exceptions.ReportConsistencyError`` if a shard does
+            not cover its date range, or if ``check_total`` is True and the
+            merged total differs from the total of the whole query.
+        """
+        shards = shard_query(query, shard_days)
+        queries = shards + ([query.regroup().order()] if check_total else [])
+        results = self.client.map(
+            ('GET', self.endpoint, {'params': shard.params, 'response_handler': api.code_handler})
+            for shard in queries)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        reports = [api.decode_json(response) for response in results]
+
+        today = datetime.date.today()
+        for shard, report in zip(shards, reports):
+            self._check_periods(
+                report, *time_range(today, dict(shard.filters), shard.date_range))
+
+        if not check_total:
+            return merge_reports(reports, report_filter=dict(query.filters))
+
+        server_report = reports.pop()
+        merged = merge_reports(reports, report_filter=server_report.get('filter'))
+        merged_total = self._sum([merged['total'].get('value')])
+        server_total = self._sum([(server_report.get('total') or {}).get('value')])
+        if abs(merged_total - server_total) > Decimal(str(KOKU_REPORT_SHARD_TOLERANCE)):
+            raise ReportConsistencyError(
+                'Total {} of the {} merged shards differs from the server total {}'.format(
+                    merged_total, len(shards), server_total))
+        return merged
+
+    def stream(self, report_filter=None, order_by=None, group_by=None, query=None):
+        """Fetch a report and yield its line items while it is downloaded.
+
+        The response body is parsed incrementally so that only one line item
+        is held in memory at a time. Once the iteration is over,
+        ``self.last_report`` holds every member of the report but ``data``,
+        so ``self.total`` can be compared with the streamed line items.
+
+        Arguments:
+            report_filter - Dictionary of filter queries key. Key:Value => Filter name:Filter Value
+            order_by - tuple of the order by value.
+            group_by - List of tuples for accounts, services,... to group by
+            query - ``hansei.report_query.ReportQuery`` sent instead of the
+                filter, order_by and group_by arguments
+
+        Yields: (group_path, line_item) tuples. group_path is a tuple of the
+            (key, value) pairs of the groups enclosing the line item, e.g.
+            (('date', '2018-08-01'), ('account', '1234'))
+        """
+        query = ReportQuery.coerce(
+            query, report_filter=report_filter, order_by=order_by, group_by=group_by)
+
+        self._clear_report_cache()
+        self.last_report = None
+        self.last_query = None
+
+        response = self.client.get(
+            self.endpoint, params=query.params, stream=True,
+            response_handler=api.code_handler)
+        try:
+            report_stream = stream_response(response)
+            for group_path, line_item in report_stream:
+                yield group_path, self._amounts(line_item)
+            self.last_report = report_stream.meta
+        finally:
+            response.close()
+
+    def stream_total(self, report_filter=None, order_by=None, group_by=None, query=None):
+        """
+        Fetch a report and calculate the total cost/storage usage/VM uptime in
+        constant memory while the report is downloaded.
+
+        Returns None if the report has no line items, like ``calculate_total``.
+        """
+        line_items = self.stream(
+            report_filter=report_filter, order_by=order_by, group_by=group_by, query=query)
+        item_count = [0]
+
+        def totals():
+            for _, item in line_items:
+                item_count[0] += 1
+                yield item['total']
+
+        total_item = self._sum(totals())
+
+        # Koku will return a null total if there are no line item charges in the list
+        return total_item if item_count[0] else None
+
+    def _sum(self, values):
+        """Sum numbers decoded from the report as a ``Decimal``.
+
+        Null values count as zero. The client codec knows how numbers were
+        decoded (float, Decimal or fixed point), see ``hansei.codec``.
+        """
+        codec = getattr(self.client, 'codec', None)
+        if codec:
+            return codec.sum(values)
+        return sum((Decimal(value) for value in values if value), Decimal(0))
+
+    def _amounts(self, obj):
+        """
+        Return a line item, total or data of the report with the fixed point
+        amounts decoded by the client codec as ``Decimal``, see
+        ``hansei.codec.JSONCodec.amounts``
+        """
+        codec = getattr(self.client, 'codec', None)
+        if codec:
+            return codec.amounts(obj)
+        return obj
+
     @property
     def filter(self):
         """The filter params used in the last report query as returned by the Koku json response"""
@@ -835,39 +1102,99 @@ class KokuBaseReport(object):
 
     @property
     def data(self):
+        """The data of the last report, amounts as returned by ``_amounts``"""
+        return self._amounts(self._data)
+
+    @property
+    def _data(self):
+        """The data of the last report as decoded by the client codec"""
         return self.last_report.get('data') if self.last_report else None
 
     def _clear_report_cache(self):
         """ Clear all of the data that we cached during operations on the last report"""
 
         self._line_items = None
+        # ``hansei.report_cache.ReportCacheEntry`` of the last report, if cached
+        self._cache_entry = None
 
-    def _traverse_report_line_items(self, root_object):
+    def iter_line_items(self, data=None):
+        """
+        Yield the line items of the report data along with the groups enclosing
+        them, the way ``stream`` does for a report being downloaded.
+
+        The data is walked with an explicit stack, so no intermediate list is
+        built and deeply nested reports cannot exceed the recursion limit.
+
+        Arguments:
+            data (List OR dict)- data object as returned by a Koku report request.
+                Defaults to the data of the last report
+
+        Yields: (group_path, line_item) tuples. group_path is a tuple of the
+            (key, value) pairs of the string fields (date, account, service,
+            instance_type...) of the objects enclosing the line item that precede
+            it, from the outermost to the innermost. Amounts are returned as by
+            ``_amounts``
         """
-        Recursively traverses the report data to generate a list of the cost
-        or storage used per time_scope_unit
+        for group_path, values in self._iter_values(data):
+            for line_item in values:
+                yield group_path, self._amounts(line_item)
+
+    def _iter_values(self, data=None, group_paths=True):
         """
-        line_item_list = []
+        Yield (group_path, values) for each 'values' list of the report data, in
+        document order. group_path is None unless ``group_paths`` is True.
 
-        root_object_type = type(root_object)
-        if not root_object or (root_object_type not in [list, dict]):
-            return line_item_list
+        The group path of a value holds the string fields preceding it in the
+        objects enclosing it, which is all ``ReportStream`` knows of a report
+        being downloaded when it reaches that value.
+        """
+        data = self._data if data is None else data
 
-        if root_object_type is list:
-            for item in root_object:
-                if type(item) in [list, dict]:
-                    line_item_list.extend(self._traverse_report_line_items(item))
-        else:
-            if root_object_type is dict:
+        # Iterators over the (group_path, key, value) children of the
+        # containers being walked
+        stack = [iter(((() if group_paths else None, None, data),))]
+        while stack:
+            for group_path, key, node in stack[-1]:
                 # Once we hit 'values' key it will be a list that contains all
                 # of the costs or storage usage for 'time_scope_units'
-                if 'values' in root_object:
-                    return line_item_list + root_object['values']
+                if key == 'values' and isinstance(node, list):
+                    yield group_path, node
+                elif isinstance(node, (list, dict)):
+                    stack.append(self._children(group_path, node))
+                    break
+            else:
+                stack.pop()
+
+    @staticmethod
+    def _children(group_path, node):
+        """
+        Yield (group_path, key, value) for each item of a list, or for each list
+        or dict value of an object, the group path of the latter being extended
+        with the string fields preceding it. The key of list items is None.
+        """
+        if isinstance(node, list):
+            for item in node:
+                yield group_path, None, item
+            return
+
+        groups = ()
+        for key, value in node.items():
+            if isinstance(value, (list, dict)):
+                yield None if group_path is None else group_path + groups, key, value
+            elif group_path is not None and isinstance(value, str):
+                groups += ((key, value),)
 
-                for key, val in root_object.items():
-                    if type(val) in [list, dict]:
-                        line_item_list.extend(self._traverse_report_line_items(val))
+    def _traverse_report_line_items(self, root_object):
+        """
+        Generate a list of the cost or storage used per time_scope_unit from
+        the report data, see ``iter_line_items``.
+        """
+        line_item_list = []
+        if not root_object:
+            return line_item_list
 
+        for _, values in self._iter_values(root_object, group_paths=False):
+            line_item_list.extend(values)
         return line_item_list
 
     def report_line_items(self, data=None):
@@ -878,40 +1205,73 @@ class KokuBaseReport(object):
         Arguments:
             data (List OR dict)- data object as returned by a Koku report request
         """
-        data = data or self.data
+        data = data or self._data
 
-        if self._line_items:
-            return self._line_items
-
-        self._line_items = self._traverse_report_line_items(data)
+        if not self._line_items:
+            self._line_items = self._traverse_report_line_items(data)
+            if self._cache_entry is not None and data is self._data:
+                self._cache_entry.line_items = self._line_items
 
+        codec = getattr(self.client, 'codec', None)
+        if codec is not None and codec.numbers == 'fixed':
+            return [codec.amounts(line_item) for line_item in self._line_items]
         return self._line_items
 
+    def to_columns(self, fixed_point=False, scale=None, data=None):
+        """
+        Convert the line items of the report into columns, so that totals,
+        per-group subtotals and per-day sums are vectorized operations.
+
+        Arguments:
+            fixed_point - Store the totals as exact fixed-point integers
+            scale - Number of decimal digits kept by the fixed-point totals
+            data (List OR dict)- data object as returned by a Koku report request.
+                Defaults to the data of the last report
+
+        Returns: ``hansei.columns.ReportColumns`` object
+        """
+        # The columns read the amounts as decoded by the codec
+        line_items = (
+            (group_path, line_item)
+            for group_path, values in self._iter_values(data) for line_item in values)
+        return ReportColumns.from_line_items(
+            line_items, fixed_point=fixed_point, scale=scale,
+            codec=getattr(self.client, 'codec', None))
+
     def calculate_total(self):
         """
         Calculates the total cost/storage usage/VM uptime by adding all of the individual
         items reported in report data.
+
+        The line items are summed while the report data is walked, unless
+        they were already listed by ``report_line_items``.
         """
         # Check to see if we have a report saved
-        if not self.data:
+        if not self._data:
             return None
 
-        total_item = Decimal(0.0)
-        item_list = self.report_line_items(self.data)
-        for item in item_list:
-            total_item = total_item + (
-                Decimal(item['total']) if item['total'] else Decimal(0))
+        if self._line_items:
+            item_lists = [self._line_items]
+        else:
+            item_lists = (
+                values for _, values in self._iter_values(self._data, group_paths=False))
+        item_count = [0]
 
-        # Koku will return a null total if there are no line item charges in the list
-        if len(item_list) == 0:
-            total_item = None
+        def counted(item_lists):
+            for values in item_lists:
+                item_count[0] += len(values)
+                yield values
 
-        return total_item
+        total_item = self._sum(
+            map(itemgetter('total'), chain.from_iterable(counted(item_lists))))
+
+        # Koku will return a null total if there are no line item charges in the list
+        return total_item if item_count[0] else None
 
     @property
     def total(self):
-        """Returns the total json object of the report response"""
-        return self.last_report.get('total') if self.last_report else None
+        """Returns the total json object of the report response, see ``_amounts``"""
+        return self._amounts(self.last_report.get('total') if self.last_report else None)
 
 
 class KokuCostReport(KokuBaseReport):
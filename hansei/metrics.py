@@ -0,0 +1,184 @@
+# coding=utf-8
+"""Request lifecycle events and per-endpoint metrics.
+
+``hansei.api.Client`` emits a ``RequestEvent`` for every request it sends to
+the server and hands it to each of its event sinks. A sink is any callable
+accepting the event. ``MetricsAggregator`` is a sink that keeps per-endpoint
+counters and latency percentiles, so the endpoints dominating a test run can
+be found without guessing from pytest durations.
+
+Example::
+    >>> from hansei import api, metrics
+    >>> aggregator = metrics.MetricsAggregator()
+    >>> client = api.Client(event_sinks=[aggregator])
+    >>> client.get('customers/')
+    >>> print(aggregator.report())
+"""
+import collections
+import math
+import re
+import threading
+from urllib.parse import urlsplit
+
+
+RequestEvent = collections.namedtuple('RequestEvent', [
+    'method',
+    'path',
+    'url',
+    'status',
+    'request_bytes',
+    'response_bytes',
+    'latency',
+    'attempts',
+    'cache_hit',
+    'limiter_wait',
+    'error',
+])
+"""A request sent by ``hansei.api.Client``.
+
+Fields:
+    method - HTTP method
+    path - Templated path relative to the API root, e.g. ``customers/{uuid}/``
+    url - Requested URL, without its query string
+    status - Response status code, or None if no response was received
+    request_bytes - Size of the request body
+    response_bytes - Size of the response body, or None if it was streamed
+        and its size is unknown
+    latency - Seconds spent sending the request, retries included
+    attempts - Number of attempts made
+    cache_hit - True if the response was served from the HTTP cache
+    limiter_wait - Seconds spent waiting for the rate limiter
+    error - Name of the exception raised, if any
+"""
+
+
+_PATH_PARAMETERS = [
+    (re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$'),
+     '{uuid}'),
+    (re.compile(r'^\d+$'), '{id}'),
+]
+
+
+def template_path(url, base_url=None):
+    """Return the path of ``url`` with its identifiers replaced by placeholders.
+
+    Arguments:
+        url - Requested URL
+        base_url - Base URL of the API. The returned path is relative to it
+
+    Example::
+        >>> template_path('http://koku/api/v1/customers/0b6d9c2e-.../', 'http://koku/api/v1/')
+        'customers/{uuid}/'
+    """
+    path = urlsplit(url).path
+    if base_url:
+        base_path = urlsplit(base_url).path
+        if path.startswith(base_path):
+            path = path[len(base_path):]
+
+    segments = []
+    for segment in path.split('/'):
+        for pattern, placeholder in _PATH_PARAMETERS:
+            if pattern.match(segment):
+                segment = placeholder
+                break
+        segments.append(segment)
+    return '/'.join(segments)
+
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(int(math.ceil(fraction * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+class EndpointMetrics(object):
+    """Counters and latencies collected for one method and templated path."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.limiter_wait = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latencies = []
+
+    def add(self, event):
+        """Account for ``event``."""
+        self.count += 1
+        if event.error or event.status is None or event.status >= 400:
+            self.errors += 1
+        if event.cache_hit:
+            self.cache_hits += 1
+        self.retries += max((event.attempts or 1) - 1, 0)
+        self.limiter_wait += event.limiter_wait or 0.0
+        self.request_bytes += event.request_bytes or 0
+        self.response_bytes += event.response_bytes or 0
+        self.latencies.append(event.latency)
+
+    def summary(self):
+        """Return the metrics as a dictionary."""
+        latencies = sorted(self.latencies)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'error_rate': self.errors / self.count if self.count else 0.0,
+            'cache_hits': self.cache_hits,
+            'retries': self.retries,
+            'limiter_wait': self.limiter_wait,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'total_latency': sum(latencies),
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+        }
+
+
+class MetricsAggregator(object):
+    """An event sink aggregating metrics per method and templated path."""
+
+    def __init__(self):
+        self._endpoints = collections.defaultdict(EndpointMetrics)
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self._endpoints[(event.method, event.path)].add(event)
+
+    def clear(self):
+        """Forget every collected metric."""
+        with self._lock:
+            self._endpoints.clear()
+
+    def summary(self):
+        """Return the metrics of each endpoint.
+
+        Returns: Dictionary
+            Key: (method, templated path) tuple
+            Value: Dictionary of metrics, see ``EndpointMetrics.summary``
+        """
+        with self._lock:
+            return {key: endpoint.summary() for key, endpoint in self._endpoints.items()}
+
+    def report(self):
+        """Return a table of the endpoint metrics, slowest endpoints first."""
+        summary = self.summary()
+        lines = ['{:<7} {:<40} {:>6} {:>6} {:>8} {:>8} {:>8} {:>9} {:>9}'.format(
+            'method', 'path', 'count', 'errors', 'p50', 'p95', 'p99', 'total', 'throttled')]
+        for (method, path), metrics in sorted(
+                summary.items(), key=lambda item: -item[1]['total_latency']):
+            lines.append(
+                '{:<7} {:<40} {:>6} {:>5.0%} {:>7.3f}s {:>7.3f}s {:>7.3f}s {:>8.2f}s {:>8.2f}s'.format(
+                    method, path, metrics['count'], metrics['error_rate'],
+                    metrics['p50'], metrics['p95'], metrics['p99'],
+                    metrics['total_latency'], metrics['limiter_wait']))
+        return '\n'.join(lines)
+
+
+SESSION_METRICS = MetricsAggregator()
+"""Aggregator shared by every client when ``metrics`` is enabled in the config."""
@@ -0,0 +1,247 @@
+# coding=utf-8
+"""Fetch each distinct report query of a test matrix once per session.
+
+The report test modules parametrize their tests with near-identical query
+matrices, and every test fetches its report for every customer of the
+session. Many entries of a matrix ask for the same report: swapping the
+group_by order (``[['account', '*'], ['service', '*']]`` and
+``[['service', '*'], ['account', '*']]``) only changes how the same line
+items are nested, and the same query is sent by several tests.
+
+A ``QueryMatrix`` collects the queries of every test for every report type
+and customer, canonicalizes them with ``canonical_query``, fetches the
+distinct ones concurrently once, and serves the memoized results to the
+tests. A test hence receives the report of the canonical query: its line
+items and totals are the ones of the query it asked for, but they are nested
+in the canonical group order. ``QueryMatrix.check_group_order`` fetches a
+query in the group order it asks for and checks that assumption.
+
+The ``report_matrix`` session fixture fills a matrix from the collected tests
+marked with ``@pytest.mark.report_matrix(report_class=...)`` and
+parametrized with ``report_filter`` and ``group_by``; under pytest-xdist, where
+a worker cannot tell which of the collected tests it will run, it is filled
+lazily by ``QueryMatrix.results`` instead. With ``--koku-metrics``, the
+latencies of the slowest queries are printed at the end of the run, and
+with ``-v`` the latency of every fetched report.
+
+Example::
+    >>> matrix = QueryMatrix(session_customers)
+    >>> for report_filter, group_by in query_params:
+    ...     matrix.add(KokuCostReport, report_filter=report_filter, group_by=group_by)
+    >>> matrix.execute()
+    >>> for result in matrix.results(KokuCostReport, report_filter=report_filter,
+    ...                              group_by=group_by).values():
+    ...     assert result.report.total['value'] == result.total
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from hansei.constants import (
+    KOKU_QUERY_MATRIX_SLOWEST,
+    KOKU_QUERY_MATRIX_TOLERANCE,
+    KOKU_QUERY_MATRIX_WORKERS,
+)
+from hansei.fanout import fan_out, fetch_report, latency_report
+from hansei.metrics import percentile
+from hansei.report_query import ReportQuery
+
+
+def canonical_query(query):
+    """Return the query with its groups sorted by key.
+
+    Queries that only differ by their group_by order return the same
+    report, nested differently, and hence share their canonical query.
+    """
+    group_by = sorted(query.group_by)
+    if list(query.group_by) == group_by:
+        return query
+    return query.regroup([(key, value) for key, values in group_by for value in values])
+
+
+def _line_items_by_groups(report):
+    """Return the (total, count) of the line items of a report, keyed by their string fields."""
+    return {
+        tuple(sorted((key, value) for key, value in line_item.items() if isinstance(value, str))):
+            (line_item.get('total'), line_item.get('count'))
+        for line_item in report.report_line_items()}
+
+
+class QueryMatrix(object):
+    """The distinct report queries of many tests, fetched once for every customer."""
+
+    def __init__(self, customers, max_workers=KOKU_QUERY_MATRIX_WORKERS):
+        """
+        Arguments:
+            customers - Dictionary or iterable of ``hansei.koku_models.KokuCustomer``
+                objects, as given to ``hansei.fanout.fan_out``
+            max_workers - Number of reports fetched at once
+        """
+        self.customers = OrderedDict(
+            customers.items() if hasattr(customers, 'items') else enumerate(customers))
+        self.max_workers = max_workers
+        # (report class, canonical query) to OrderedDict of customer key to
+        # FanOutResult, empty until fetched
+        self.queries = OrderedDict()
+        self.added = 0
+        self.fetched = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.queries)
+
+    def add(self, report_class, report_filter=None, order_by=None, group_by=None, query=None):
+        """Add a query of a report type to the matrix.
+
+        Returns: The canonical ``ReportQuery`` the results are stored under
+        """
+        query = canonical_query(ReportQuery.coerce(
+            query, report_filter=report_filter, order_by=order_by, group_by=group_by))
+        with self._lock:
+            self.added += 1
+            self.queries.setdefault((report_class, query), OrderedDict())
+        return query
+
+    def execute(self):
+        """Fetch every query not fetched yet for every customer, concurrently.
+
+        Errors are stored in the results rather than raised.
+
+        Returns: Number of reports fetched
+        """
+        with self._lock:
+            tasks = [
+                (report_class, query, key, customer)
+                for (report_class, query), results in self.queries.items() if not results
+                for key, customer in self.customers.items()]
+            if not tasks:
+                return 0
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(fetch_report, report_class, customer, query, key)
+                    for report_class, query, key, customer in tasks]
+
+            for (report_class, query, _, _), future in zip(tasks, futures):
+                result = future.result()
+                self.queries[(report_class, query)][result.key] = result
+            self.fetched += len(tasks)
+            return len(tasks)
+
+    def results(self, report_class, report_filter=None, order_by=None, group_by=None,
+                query=None, raise_errors=True):
+        """Return the memoized results of a query, fetching them if needed.
+
+        Arguments:
+            report_class - ``hansei.koku_models.KokuBaseReport`` subclass
+            report_filter, order_by, group_by, query - Query of the report, see
+                ``hansei.koku_models.KokuBaseReport.get``
+            raise_errors - Raise the first error, in customer order
+
+        Returns: OrderedDict of customer key to ``hansei.fanout.FanOutResult``,
+            as returned by ``hansei.fanout.fan_out``
+        """
+        query = canonical_query(ReportQuery.coerce(
+            query, report_filter=report_filter, order_by=order_by, group_by=group_by))
+        if (report_class, query) not in self.queries:
+            self.add(report_class, query=query)
+        self.execute()
+        results = self.queries[(report_class, query)]
+
+        if raise_errors:
+            for result in results.values():
+                if result.error is not None:
+                    raise result.error
+        return results
+
+    def check_group_order(self, report_class, report_filter=None, order_by=None, group_by=None,
+                          query=None, tolerance=KOKU_QUERY_MATRIX_TOLERANCE):
+        """Fetch a query in its requested group order and compare it with the matrix report.
+
+        The matrix only sends canonical queries, so the group order asked for
+        by a test never reaches the server. The query is fetched as requested
+        for every customer, and its groups must be nested in the requested
+        order and its line items be the ones of the canonical report.
+
+        Arguments:
+            report_class - ``hansei.koku_models.KokuBaseReport`` subclass
+            report_filter, order_by, group_by, query - Query of the report, see
+                ``hansei.koku_models.KokuBaseReport.get``
+            tolerance - Largest difference accepted between two line item totals
+
+        Returns: List of messages describing the differences, empty if none
+        """
+        query = ReportQuery.coerce(
+            query, report_filter=report_filter, order_by=order_by, group_by=group_by)
+        results = self.results(report_class, query=query)
+        requested = fan_out(report_class, self.customers, query=query, max_workers=self.max_workers)
+        group_keys = list(query.group_keys)
+
+        differences = []
+        for key, result in requested.items():
+            for group_path, _ in result.report.iter_line_items():
+                groups = [group for group, _ in group_path if group != 'date']
+                if groups[:len(group_keys)] != group_keys:
+                    differences.append('{}: groups nested as {} instead of {}'.format(
+                        key, groups, group_keys))
+                    break
+
+            expected = _line_items_by_groups(results[key].report)
+            found = _line_items_by_groups(result.report)
+            for groups in sorted(set(expected) ^ set(found)):
+                differences.append('{}: line item {} only in the {} report'.format(
+                    key, dict(groups), 'canonical' if groups in expected else 'requested'))
+            for groups in sorted(set(expected) & set(found)):
+                (expected_total, expected_count), (total, count) = expected[groups], found[groups]
+                if (expected_count != count or
+                        abs(float(expected_total or 0) - float(total or 0)) > tolerance):
+                    differences.append('{}: line item {} is {}, {} in the canonical report'.format(
+                        key, dict(groups), (total, count), (expected_total, expected_count)))
+        return differences
+
+    def latency_report(self):
+        """Return the ``hansei.fanout.latency_report`` table of every fetched query."""
+        with self._lock:
+            return '\n\n'.join(
+                '{} {}\n{}'.format(report_class.__name__, query, latency_report(results))
+                for (report_class, query), results in self.queries.items() if results)
+
+    def latency_summary(self, slowest=KOKU_QUERY_MATRIX_SLOWEST):
+        """Return a table of the fetched queries with the slowest maximum latency.
+
+        Each row holds the median and maximum latency of a query over the
+        customers, the slowest customer and the number of errors.
+
+        Arguments:
+            slowest - Number of queries listed, slowest first
+        """
+        with self._lock:
+            rows = []
+            for (report_class, query), results in self.queries.items():
+                if not results:
+                    continue
+                latencies = sorted(result.latency for result in results.values())
+                slowest_result = max(results.values(), key=lambda result: result.latency)
+                errors = sum(1 for result in results.values() if result.error is not None)
+                rows.append((
+                    latencies[-1], percentile(latencies, 0.50), report_class.__name__,
+                    slowest_result.key, errors, query))
+
+        rows.sort(key=lambda row: -row[0])
+        lines = ['{:<20} {:>9} {:>9} {:<40} {:>6} {}'.format(
+            'report', 'p50', 'max', 'slowest customer', 'errors', 'query')]
+        for latency_max, latency_p50, name, key, errors, query in rows[:slowest]:
+            lines.append('{:<20} {:>8.3f}s {:>8.3f}s {:<40} {:>6} {}'.format(
+                name, latency_p50, latency_max, str(key), errors, query))
+        if len(rows) > slowest:
+            lines.append('... {} faster queries'.format(len(rows) - slowest))
+        return '\n'.join(lines)
+
+    def stats(self):
+        """Return the matrix counters as a dictionary."""
+        with self._lock:
+            return {
+                'added': self.added,
+                'queries': len(self.queries),
+                'fetched': self.fetched,
+            }
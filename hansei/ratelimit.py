@@ -0,0 +1,241 @@
+# coding=utf-8
+"""Throttle the requests sent to a Koku server.
+
+Once requests run in parallel, a small Koku development deployment is easily
+overloaded and answers with storms of 429/5xx. A ``RateLimiter`` caps the
+request rate with a token bucket and the number of requests in flight with a
+semaphore, both for the whole server and for endpoint prefixes such as
+``reports/``. Every client talking to the same server shares the same
+limiter, whether it is used from threads, ``Client.map`` or
+``AsyncClient``.
+
+The time spent waiting for the limiter is recorded, so it is possible to tell
+whether the limiter or the server is the bottleneck.
+"""
+import contextlib
+import threading
+import time
+import warnings
+from urllib.parse import urlsplit
+
+
+class TokenBucket(object):
+    """Allow ``rate`` acquisitions per second with bursts of ``burst``."""
+
+    def __init__(self, rate, burst=None):
+        """
+        Arguments:
+            rate - Number of tokens added to the bucket per second
+            burst - Capacity of the bucket. Defaults to one second worth of
+                tokens
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst or max(self.rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available.
+
+        Tokens are reserved in arrival order: a caller finding the bucket
+        empty takes a token from the future and sleeps until it is due.
+
+        Returns: Number of seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class Limit(object):
+    """A request rate and concurrency limit, along with its wait statistics."""
+
+    def __init__(self, name, requests_per_second=None, burst=None, max_in_flight=None):
+        """
+        Arguments:
+            name - Name of the limit, ``*`` or an endpoint prefix
+            requests_per_second - Maximum request rate. No limit if None
+            burst - Number of requests allowed at once above the rate
+            max_in_flight - Maximum number of concurrent requests. No limit
+                if None
+        """
+        self.name = name
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.semaphore = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        self.requests = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        """Wait until a request can be sent. Return the time waited."""
+        started = time.monotonic()
+        if self.semaphore:
+            self.semaphore.acquire()
+        if self.bucket:
+            self.bucket.acquire()
+        wait = time.monotonic() - started
+
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            # Ignore the few microseconds spent acquiring free slots
+            if wait > 0.001:
+                self.waited += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def exit(self):
+        """Release the slot taken by ``enter``."""
+        with self._lock:
+            self.in_flight -= 1
+        if self.semaphore:
+            self.semaphore.release()
+
+    def stats(self):
+        """Return the wait statistics as a dictionary."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'waited': self.waited,
+                'total_wait': self.total_wait,
+                'max_wait': self.max_wait,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+            }
+
+
+class RateLimiter(object):
+    """Limits applied to the requests sent to one Koku server.
+
+    A request is subject to the server wide limit and to the limit of the
+    longest endpoint prefix matching its path, if any.
+    """
+
+    def __init__(self, requests_per_second=None, burst=None, max_in_flight=None, prefixes=None):
+        """
+        Arguments:
+            requests_per_second - Maximum request rate for the whole server
+            burst - Number of requests allowed at once above the rate
+            max_in_flight - Maximum number of concurrent requests
+            prefixes - Dictionary of per endpoint prefix limits
+                Key: Endpoint prefix relative to the API root, e.g. 'reports/'
+                Value: Dictionary with requests-per-second, burst and
+                    max-in-flight keys
+        """
+        self.host_limit = Limit(
+            '*', requests_per_second=requests_per_second, burst=burst,
+            max_in_flight=max_in_flight)
+        self.prefix_limits = sorted([
+            Limit(
+                prefix,
+                requests_per_second=cfg.get('requests-per-second'),
+                burst=cfg.get('burst'),
+                max_in_flight=cfg.get('max-in-flight'))
+            for prefix, cfg in (prefixes or {}).items()
+        ], key=lambda limit: -len(limit.name))
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Build a limiter from the ``rate-limit`` subsection of the koku config::
+
+            koku:
+                rate-limit:
+                    requests-per-second: 20
+                    burst: 20
+                    max-in-flight: 8
+                    prefixes:
+                        reports/:
+                            requests-per-second: 5
+                            max-in-flight: 2
+
+        Returns None if no limit is configured.
+        """
+        if not cfg:
+            return None
+
+        return cls(
+            requests_per_second=cfg.get('requests-per-second'),
+            burst=cfg.get('burst'),
+            max_in_flight=cfg.get('max-in-flight'),
+            prefixes=cfg.get('prefixes'))
+
+    def limits_for(self, path):
+        """Return the limits applying to ``path``, most specific first."""
+        for limit in self.prefix_limits:
+            if path.startswith(limit.name):
+                return [limit, self.host_limit]
+        return [self.host_limit]
+
+    @contextlib.contextmanager
+    def acquire(self, path):
+        """Hold a slot for a request to ``path`` while the block runs.
+
+        Limits are always acquired from the most specific to the server wide
+        one, so concurrent callers cannot deadlock.
+
+        Arguments:
+            path - Path of the request relative to the API root
+
+        Yields: Number of seconds spent waiting for the limits
+        """
+        acquired = []
+        wait = 0.0
+        try:
+            for limit in self.limits_for(path):
+                wait += limit.enter()
+                acquired.append(limit)
+            yield wait
+        finally:
+            for limit in reversed(acquired):
+                limit.exit()
+
+    def stats(self):
+        """Return the wait statistics of each limit, keyed by limit name."""
+        return {limit.name: limit.stats() for limit in [self.host_limit] + self.prefix_limits}
+
+
+_SHARED_LIMITERS = {}
+_SHARED_LIMITERS_LOCK = threading.Lock()
+
+
+def shared_limiter(url, cfg):
+    """Return the limiter shared by every client of the server at ``url``.
+
+    The limiter is built from ``cfg`` by the first caller for a given server,
+    whatever the API root of its URL. The first configuration wins: a later
+    caller passing a different one gets the existing limiter and a warning.
+
+    Arguments:
+        url - Base URL of the Koku server
+        cfg - Dictionary with the ``rate-limit`` configuration
+
+    Returns: ``RateLimiter`` or None if no limit is configured
+    """
+    if not cfg:
+        return None
+
+    netloc = urlsplit(url).netloc
+    with _SHARED_LIMITERS_LOCK:
+        if netloc not in _SHARED_LIMITERS:
+            _SHARED_LIMITERS[netloc] = (cfg, RateLimiter.from_config(cfg))
+        shared_cfg, limiter = _SHARED_LIMITERS[netloc]
+
+    if cfg != shared_cfg:
+        warnings.warn(
+            'Ignoring the rate-limit configuration {} for {}, requests to this server '
+            'are already limited by {}'.format(cfg, netloc, shared_cfg))
+    return limiter
@@ -0,0 +1,172 @@
+# coding=utf-8
+"""In-memory cache of parsed report query results.
+
+The report validation tests send the same report queries again and again,
+for every customer and on every rerun. A ``ReportCache`` keeps the decoded
+report of each query, along with its line items once they were listed, so
+that ``KokuBaseReport.get`` neither downloads nor parses the report again.
+
+Entries are keyed by the server, the identity of the user sending the query,
+the report endpoint and the ``hansei.report_query.ReportQuery`` holding the
+canonical form of its filter, group_by and order_by parameters. They are
+dropped after ``ttl`` seconds or when more than ``max_entries`` reports are
+cached.
+
+Cached reports are shared by every ``KokuBaseReport`` getting them and must
+be treated as read-only.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from hansei.constants import KOKU_REPORT_CACHE_MAX_ENTRIES, KOKU_REPORT_CACHE_TTL
+from hansei.report_query import ReportQuery
+
+
+_SHARED_CACHE = None
+_SHARED_CACHE_LOCK = threading.Lock()
+
+
+def report_key(client, endpoint, query=None):
+    """Return a hashable key identifying a report query.
+
+    Arguments:
+        client - ``hansei.api.Client`` sending the query
+        endpoint - Report endpoint, e.g. ``reports/costs/``
+        query - ``hansei.report_query.ReportQuery``, or the query parameters
+            of the report request
+    """
+    if not isinstance(query, ReportQuery):
+        query = ReportQuery.from_params(query)
+    return (client.url, client.identity(), endpoint, query)
+
+
+class ReportCacheEntry(object):
+    """A cached report and its line items."""
+
+    __slots__ = ('report', 'line_items', 'stored_at')
+
+    def __init__(self, report):
+        self.report = report
+        # Set by ``KokuBaseReport.report_line_items`` once they are listed
+        self.line_items = None
+        self.stored_at = time.monotonic()
+
+    @property
+    def age(self):
+        """Seconds since the entry was stored"""
+        return time.monotonic() - self.stored_at
+
+
+class ReportCache(object):
+    """A thread safe LRU cache of parsed reports bounded by count and age."""
+
+    def __init__(
+            self,
+            max_entries=KOKU_REPORT_CACHE_MAX_ENTRIES,
+            ttl=KOKU_REPORT_CACHE_TTL):
+        """
+        Arguments:
+            max_entries - Maximum number of cached reports
+            ttl - Seconds after which an entry is dropped
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Build a cache from the ``report-cache`` subsection of the koku config::
+
+            koku:
+                report-cache:
+                    enabled: true
+                    max-entries: 256
+                    ttl: 600
+
+        Returns None if the cache is not enabled.
+        """
+        if not cfg or not cfg.get('enabled', False):
+            return None
+
+        return cls(
+            max_entries=cfg.get('max-entries', KOKU_REPORT_CACHE_MAX_ENTRIES),
+            ttl=cfg.get('ttl', KOKU_REPORT_CACHE_TTL))
+
+    key = staticmethod(report_key)
+
+    def get(self, key):
+        """Return the entry stored under ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.age > self.ttl:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def store(self, key, report):
+        """Cache ``report`` under ``key`` and return its ``ReportCacheEntry``."""
+        entry = ReportCacheEntry(report)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, client=None):
+        """Drop the reports cached for the server of ``client``, or every report."""
+        with self._lock:
+            if client is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if key[0] == client.url:
+                    del self._entries[key]
+
+    def clear(self):
+        """Drop every cached report."""
+        self.invalidate()
+
+    def stats(self):
+        """Return the cache counters as a dictionary."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def shared_report_cache(cfg):
+    """Return the report cache shared by every client of the process.
+
+    The cache is built from ``cfg`` by the first caller, so that reports are
+    reused across clients and customers.
+
+    Arguments:
+        cfg - Dictionary with the ``report-cache`` configuration
+
+    Returns: ``ReportCache`` or None if the cache is not enabled
+    """
+    global _SHARED_CACHE
+    if not cfg or not cfg.get('enabled', False):
+        return None
+
+    with _SHARED_CACHE_LOCK:
+        if _SHARED_CACHE is None:
+            _SHARED_CACHE = ReportCache.from_config(cfg)
+        return _SHARED_CACHE
@@ -0,0 +1,218 @@
+# coding=utf-8
+"""Find the line items that changed between two reports.
+
+When a new Koku build is deployed (see the ``commit`` of ``status/``), the
+reports it returns should be compared with the ones of the previous build.
+A ``ReportTree`` hashes the data of a report as a Merkle tree following its
+nesting, date → groups (account, service...) → line items:
+
+    leaves
+        hash of the units, total and count of a line item, numbers rounded
+        to ``places`` decimal digits
+    nodes
+        hash of the keys and hashes of their children
+
+Two subtrees with the same hash hold the same line items, so ``diff_reports``
+only descends into the subtrees whose hashes differ: once the trees are
+built, comparing two reports takes a time proportional to the number of
+differences rather than to their size. A tree is built once per report and
+can be compared with many others, e.g. the report of a baseline build with
+the reports of each new build.
+
+Reports can be given as ``hansei.koku_models.KokuBaseReport`` objects,
+``hansei.snapshot.Snapshot`` objects or ``ReportTree`` objects.
+
+Example::
+    >>> for change in diff_reports(Snapshot('baseline.snap'), report):
+    ...     print(change.change, dict(change.group_path), change.old_total, change.new_total)
+    changed {'date': '2018-08-01', 'account': '1234', 'service': 'AmazonEC2'} 12.5 13.25
+"""
+import collections
+import hashlib
+from collections import OrderedDict
+from decimal import Decimal
+
+from hansei.constants import KOKU_DIFF_PLACES
+
+
+ReportChange = collections.namedtuple('ReportChange', [
+    'change',      # 'added', 'removed' or 'changed'
+    'group_path',  # ((key, value), ...) of the groups enclosing the line item
+    'old_total',   # Decimal total of the line item in the old report, or None
+    'new_total',   # Decimal total of the line item in the new report, or None
+    'old_item',    # Line item of the old report, or None
+    'new_item',    # Line item of the new report, or None
+])
+"""A line item added, removed or changed between two reports."""
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class _Node(object):
+    __slots__ = ('hash', 'children', 'group_path', 'item', 'total')
+
+    def __init__(self, group_path=()):
+        self.hash = None
+        self.children = OrderedDict()
+        self.group_path = group_path
+        self.item = None
+        self.total = None
+
+
+class ReportTree(object):
+    """The line items of a report hashed as a Merkle tree."""
+
+    def __init__(self, line_items, number=None, places=KOKU_DIFF_PLACES):
+        """
+        Arguments:
+            line_items - Iterable of (group_path, line_item) pairs, as yielded
+                by ``KokuBaseReport.iter_line_items``
+            number - Function returning a decoded number as a ``Decimal``.
+                Defaults to converting floats from their representation
+            places - Number of decimal digits compared
+        """
+        self.places = places
+        self._quantum = Decimal(1).scaleb(-places)
+        self._number = number or self._decimal
+        self.root = _Node()
+        self.size = 0
+
+        for group_path, line_item in line_items:
+            node = self.root
+            for depth, group in enumerate(group_path):
+                child = node.children.get(group)
+                if child is None:
+                    child = node.children[group] = _Node(group_path[:depth + 1])
+                node = child
+
+            # Line items of a group are told apart by their units
+            key = ('units', line_item.get('units'), 0)
+            while key in node.children:
+                key = key[:2] + (key[2] + 1,)
+            leaf = node.children[key] = _Node(group_path)
+            leaf.item = line_item
+            leaf.total = self._round(line_item.get('total'))
+            # Counts are plain numbers, only amounts are decoded by the codec
+            count = line_item.get('count')
+            if count is not None:
+                count = self._decimal(count).quantize(self._quantum)
+            leaf.hash = _digest(repr((key, str(leaf.total), str(count))).encode('utf-8'))
+            self.size += 1
+
+        self._hash(self.root)
+
+    @classmethod
+    def from_report(cls, report, places=KOKU_DIFF_PLACES):
+        """Build the tree of a ``KokuBaseReport`` or ``hansei.snapshot.Snapshot``.
+
+        Numbers are read with the codec of the report client, if any.
+        """
+        codec = getattr(getattr(report, 'client', None), 'codec', None)
+        number = codec.number if codec is not None and codec.numbers == 'fixed' else None
+        return cls(report.iter_line_items(), number=number, places=places)
+
+    @staticmethod
+    def _decimal(value):
+        if isinstance(value, float):
+            return Decimal(repr(value))
+        return Decimal(value)
+
+    def _round(self, value):
+        if value is None:
+            return None
+        return self._number(value).quantize(self._quantum)
+
+    def _hash(self, node):
+        # Post-order walk with an explicit stack, reports can be deeply nested
+        stack = [(node, False)]
+        while stack:
+            node, visited = stack.pop()
+            if node.hash is not None:
+                continue
+            if not visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+                continue
+            node.hash = _digest(b''.join(
+                repr(key).encode('utf-8') + child.hash
+                for key, child in sorted(node.children.items(), key=lambda item: repr(item[0]))))
+
+    @property
+    def hash(self):
+        """Hexadecimal digest of the whole report"""
+        return self.root.hash.hex()
+
+    def leaves(self, node=None):
+        """Yield the leaf nodes below ``node``, in report order."""
+        stack = [iter([node or self.root])]
+        while stack:
+            for node in stack[-1]:
+                if node.children:
+                    stack.append(iter(node.children.values()))
+                    break
+                if node.item is not None:
+                    yield node
+            else:
+                stack.pop()
+
+
+def _tree(report, places):
+    if isinstance(report, ReportTree):
+        return report
+    return ReportTree.from_report(report, places=places)
+
+
+def diff_reports(old, new, places=KOKU_DIFF_PLACES):
+    """Return the line items that differ between two reports.
+
+    Arguments:
+        old, new - ``KokuBaseReport``, ``hansei.snapshot.Snapshot`` or
+            ``ReportTree`` objects
+        places - Number of decimal digits compared, when trees are built
+
+    Returns: List of ``ReportChange`` in report order, line items added
+        by the new report following the ones of their group in the old one
+    """
+    old_tree = _tree(old, places)
+    new_tree = _tree(new, places)
+
+    changes = []
+
+    def added(node):
+        changes.extend(
+            ReportChange('added', leaf.group_path, None, leaf.total, None, leaf.item)
+            for leaf in new_tree.leaves(node))
+
+    def removed(node):
+        changes.extend(
+            ReportChange('removed', leaf.group_path, leaf.total, None, leaf.item, None)
+            for leaf in old_tree.leaves(node))
+
+    stack = [(old_tree.root, new_tree.root)]
+    while stack:
+        old_node, new_node = stack.pop()
+        if new_node is None:
+            removed(old_node)
+            continue
+        if old_node is None:
+            added(new_node)
+            continue
+        if old_node.hash == new_node.hash:
+            continue
+        if old_node.item is not None and new_node.item is not None:
+            changes.append(ReportChange(
+                'changed', new_node.group_path, old_node.total, new_node.total,
+                old_node.item, new_node.item))
+            continue
+
+        pairs = [
+            (old_child, new_node.children.get(key))
+            for key, old_child in old_node.children.items()]
+        pairs.extend(
+            (None, new_child) for key, new_child in new_node.children.items()
+            if key not in old_node.children)
+        # Pushed in reverse so that changes are listed in report order
+        stack.extend(reversed(pairs))
+    return changes
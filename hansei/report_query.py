@@ -0,0 +1,323 @@
+# coding=utf-8
+"""Immutable description of a Koku report query.
+
+``KokuBaseReport.get`` takes its filter, group_by and order_by as loose
+dictionaries and lists. Two calls asking for the same report can hence build
+their query parameters in different orders or with values of different
+types (``-10`` and ``'-10'``). A ``ReportQuery`` holds the canonical form of
+a query:
+
+    filters
+        ``(name, value)`` pairs sorted by name, values as sent on the wire
+    group_by
+        ``(key, values)`` pairs in the order the groups were first given,
+        since Koku nests the report data in that order
+    order_by
+        ``(field, direction)`` or None
+    date_range
+        ``(start_date, end_date)`` as ``YYYY-MM-DD`` strings or None. Newer
+        Koku versions accept this explicit range instead of a time scope
+
+It compiles once to the query parameters sent to the server, is hashable
+and compares equal to every other query asking for the same report, so it
+can be used as a key by caches, dedupers and metrics. The same query can be
+sent to every report type.
+
+Example::
+    >>> query = ReportQuery(resolution='daily', time_scope_value=-10,
+    ...                     time_scope_units='day', group_by=[['account', '*']])
+    >>> query.params
+    (('filter[resolution]', 'daily'), ('filter[time_scope_units]', 'day'),
+     ('filter[time_scope_value]', '-10'), ('group_by[account]', '*'))
+    >>> KokuCostReport(client).get(query=query.group('service'))
+"""
+import datetime
+import re
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+
+
+_PARAM_RE = re.compile(r'^(filter|group_by|order_by)\[(\w+)\]$')
+
+_DATE_PARAMS = ('start_date', 'end_date')
+
+
+def _wire_value(value):
+    """Return a filter or group value the way it is sent on the wire."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (list, tuple)):
+        # Sent as a repeated parameter
+        return tuple(_wire_value(val) for val in value)
+    return str(value)
+
+
+def month_start(date, months_back=0):
+    """Return the first day of the month ``months_back`` months before ``date``."""
+    month = date.month - months_back
+    year = date.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return datetime.date(year, month, 1)
+
+
+def time_range(end_date, report_filter, date_range=None):
+    """Return the (start, end, resolution) of a report filter.
+
+    As Koku does, ``-N`` days covers the last N days and ``-N`` months
+    covers the current month and the N - 1 previous ones. An explicit
+    ``(start_date, end_date)`` range, as accepted by newer Koku versions,
+    overrides the time scope.
+
+    Arguments:
+        end_date - Last day of the time scope, usually today
+        report_filter - Dictionary of the filter of the report
+        date_range - ``(start_date, end_date)`` as dates or ``YYYY-MM-DD``
+            strings, or None
+
+    :raises: ValueError if the filter is invalid.
+    """
+    resolution = report_filter.get('resolution', 'daily')
+    if date_range:
+        if resolution not in ('daily', 'monthly'):
+            raise ValueError('Invalid resolution')
+        start, end = (
+            date if isinstance(date, datetime.date)
+            else datetime.datetime.strptime(date, '%Y-%m-%d').date()
+            for date in date_range)
+        if start > end:
+            raise ValueError('start_date is after end_date')
+        return start, end, resolution
+
+    units = report_filter.get('time_scope_units', 'month' if resolution == 'monthly' else 'day')
+    if resolution not in ('daily', 'monthly') or units not in ('day', 'month'):
+        raise ValueError('Invalid resolution or time_scope_units')
+
+    value = abs(int(report_filter.get('time_scope_value', -1 if units == 'month' else -10)))
+    if units == 'day':
+        start = end_date - datetime.timedelta(days=value - 1)
+    else:
+        start = month_start(end_date, value - 1)
+    return start, end_date, resolution
+
+
+class ReportQuery(object):
+    """An immutable and hashable report query."""
+
+    __slots__ = ('filters', 'group_by', 'order_by', 'date_range', '_params', '_hash')
+
+    def __init__(
+            self, report_filter=None, group_by=None, order_by=None,
+            resolution=None, time_scope_value=None, time_scope_units=None,
+            start_date=None, end_date=None):
+        """
+        Arguments:
+            report_filter - Dictionary of filter queries key. Key:Value => Filter name:Filter Value
+            group_by - List of tuples for accounts, services,... to group by
+                Example: [['account', '*'], ['service', 'Compute Instance']]
+            order_by - tuple of the order by value.
+                Example: ['cost', 'asc']
+            resolution - ``daily`` or ``monthly``, overrides the filter
+            time_scope_value - e.g. -10 or -1, overrides the filter
+            time_scope_units - ``day`` or ``month``, overrides the filter
+            start_date, end_date - First and last days of the report, as
+                dates or ``YYYY-MM-DD`` strings. Both or none must be given
+        """
+        filters = dict(report_filter or {})
+        for name, value in (
+                ('resolution', resolution),
+                ('time_scope_value', time_scope_value),
+                ('time_scope_units', time_scope_units)):
+            if value is not None:
+                filters[name] = value
+
+        groups = OrderedDict()
+        for key, value in group_by or ():
+            values = groups.setdefault(str(key), [])
+            value = _wire_value(value)
+            if value not in values:
+                values.append(value)
+
+        if order_by:
+            field, direction = order_by
+            order_by = (str(field), str(direction))
+
+        if (start_date is None) != (end_date is None):
+            raise ValueError('start_date and end_date must be given together')
+        date_range = None
+        if start_date is not None:
+            date_range = tuple(
+                date.isoformat() if isinstance(date, datetime.date) else str(date)
+                for date in (start_date, end_date))
+
+        object.__setattr__(self, 'filters', tuple(sorted(
+            (str(name), _wire_value(value))
+            for name, value in filters.items() if value is not None)))
+        object.__setattr__(self, 'group_by', tuple(
+            (key, tuple(values)) for key, values in groups.items()))
+        object.__setattr__(self, 'order_by', order_by or None)
+        object.__setattr__(self, 'date_range', date_range)
+        object.__setattr__(self, '_params', None)
+        object.__setattr__(self, '_hash', None)
+
+    @classmethod
+    def coerce(cls, query=None, report_filter=None, order_by=None, group_by=None):
+        """Return ``query`` if given, else a query built from the other arguments."""
+        if query is not None:
+            return query
+        return cls(report_filter=report_filter, order_by=order_by, group_by=group_by)
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a query from report request parameters.
+
+        Arguments:
+            params - Dictionary, list of pairs or query string as accepted by
+                ``requests``. Parameters other than filter[*], group_by[*]
+                and order_by[*] raise a ValueError
+        """
+        if isinstance(params, (str, bytes)):
+            if isinstance(params, bytes):
+                params = params.decode('utf-8')
+            params = parse_qsl(params, keep_blank_values=True)
+        items = params.items() if hasattr(params, 'items') else params or ()
+
+        report_filter = {}
+        group_by = []
+        order_by = None
+        dates = {}
+        for name, value in items:
+            if name in _DATE_PARAMS:
+                dates[name] = value
+                continue
+            match = _PARAM_RE.match(name)
+            if not match:
+                raise ValueError('Unexpected report query parameter {}'.format(name))
+            kind, key = match.groups()
+            values = value if isinstance(value, (list, tuple)) else [value]
+            if kind == 'filter':
+                report_filter[key] = value
+            elif kind == 'order_by':
+                order_by = (key, values[-1])
+            else:
+                group_by.extend((key, val) for val in values)
+
+        return cls(report_filter=report_filter, group_by=group_by, order_by=order_by, **dates)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    def _replace(self, **kwargs):
+        arguments = {
+            'report_filter': dict(self.filters),
+            'group_by': [(key, value) for key, values in self.group_by for value in values],
+            'order_by': self.order_by,
+        }
+        if self.date_range:
+            arguments['start_date'], arguments['end_date'] = self.date_range
+        arguments.update(kwargs)
+        return type(self)(**arguments)
+
+    def filter(self, **filters):
+        """Return a copy of the query with ``filters`` added or replaced.
+
+        A filter set to None is removed.
+        """
+        report_filter = dict(self.filters)
+        report_filter.update(filters)
+        return self._replace(report_filter=report_filter)
+
+    def group(self, key, value='*'):
+        """Return a copy of the query also grouped by ``key``."""
+        group_by = [(name, val) for name, values in self.group_by for val in values]
+        return self._replace(group_by=group_by + [(key, value)])
+
+    def regroup(self, group_by=None):
+        """Return a copy of the query grouped by ``group_by`` instead."""
+        return self._replace(group_by=group_by)
+
+    def order(self, field=None, direction='asc'):
+        """Return a copy of the query ordered by ``field``, or unordered."""
+        return self._replace(order_by=(field, direction) if field else None)
+
+    def between(self, start_date=None, end_date=None):
+        """Return a copy of the query covering the days between two dates included.
+
+        The range is removed if no date is given.
+        """
+        return self._replace(start_date=start_date, end_date=end_date)
+
+    def _filter_value(self, name):
+        return dict(self.filters).get(name)
+
+    @property
+    def resolution(self):
+        """The ``resolution`` filter: ``daily``, ``monthly`` or None"""
+        return self._filter_value('resolution')
+
+    @property
+    def time_scope_value(self):
+        """The ``time_scope_value`` filter as an integer, or None"""
+        value = self._filter_value('time_scope_value')
+        return int(value) if value is not None else None
+
+    @property
+    def time_scope_units(self):
+        """The ``time_scope_units`` filter: ``day``, ``month`` or None"""
+        return self._filter_value('time_scope_units')
+
+    @property
+    def group_keys(self):
+        """The keys the report is grouped by, outermost first"""
+        return tuple(key for key, _ in self.group_by)
+
+    @property
+    def params(self):
+        """The query parameters sent to the server, as a tuple of pairs.
+
+        Filters come first, then the date range, the group_by parameters in
+        their order and the order_by parameter.
+        """
+        if self._params is None:
+            params = tuple(
+                ('filter[{}]'.format(name), val) for name, value in self.filters
+                for val in (value if isinstance(value, tuple) else (value,)))
+            if self.date_range:
+                params += tuple(zip(_DATE_PARAMS, self.date_range))
+            params += tuple(
+                ('group_by[{}]'.format(key), value)
+                for key, values in self.group_by for value in values)
+            if self.order_by:
+                params += (('order_by[{}]'.format(self.order_by[0]), self.order_by[1]),)
+            object.__setattr__(self, '_params', params)
+        return self._params
+
+    @property
+    def key(self):
+        """A hashable tuple identifying the query"""
+        return (self.filters, self.group_by, self.order_by, self.date_range)
+
+    def __eq__(self, other):
+        if not isinstance(other, ReportQuery):
+            return NotImplemented
+        return self.key == other.key
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash(self.key))
+        return self._hash
+
+    def __repr__(self):
+        dates = ''
+        if self.date_range:
+            dates = ', start_date={!r}, end_date={!r}'.format(*self.date_range)
+        return '{}(report_filter={!r}, group_by={!r}, order_by={!r}{})'.format(
+            type(self).__name__, dict(self.filters),
+            [[key, value] for key, values in self.group_by for value in values],
+            list(self.order_by) if self.order_by else None, dates)
+
+    def __str__(self):
+        return urlencode(self.params, safe='[]*')
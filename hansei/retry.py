@@ -0,0 +1,155 @@
+# coding=utf-8
+"""Retry policies for requests sent to the Koku server.
+
+Koku is usually published behind OpenShift routes, where a redeploying pod or
+a busy router answers with a 502/503 or resets the connection. A
+``RetryPolicy`` decides whether such a failed attempt should be sent again and
+how long to wait before doing so.
+"""
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
+
+from hansei.constants import (
+    KOKU_RETRY_BACKOFF_BASE,
+    KOKU_RETRY_BACKOFF_CAP,
+    KOKU_RETRY_MAX_ATTEMPTS,
+)
+
+
+IDEMPOTENT_METHODS = frozenset(['DELETE', 'GET', 'HEAD', 'OPTIONS', 'PUT', 'TRACE'])
+"""HTTP methods that can safely be sent more than once."""
+
+RETRY_STATUS_CODES = frozenset([429, 502, 503, 504])
+"""Response status codes that indicate a transient server side failure."""
+
+RETRY_EXCEPTIONS = (ChunkedEncodingError, ConnectionError, Timeout)
+"""Exceptions raised by ``requests`` for transient network failures."""
+
+
+class RetryPolicy(object):
+    """Decide when and how often a failed request is sent again.
+
+    The delay between attempts follows an exponential backoff with full
+    jitter: before attempt ``n + 1`` the client sleeps a random amount of
+    time between 0 and ``min(backoff_cap, backoff_base * 2 ** (n - 1))``
+    seconds. When the server answers with a ``Retry-After`` header, that
+    delay is used instead, still capped to ``backoff_cap`` seconds.
+
+    Only idempotent methods are retried by default. Non idempotent methods
+    must be explicitly allowed, see ``RetryPolicy.allowing``.
+    """
+
+    def __init__(
+            self,
+            max_attempts=KOKU_RETRY_MAX_ATTEMPTS,
+            backoff_base=KOKU_RETRY_BACKOFF_BASE,
+            backoff_cap=KOKU_RETRY_BACKOFF_CAP,
+            status_codes=RETRY_STATUS_CODES,
+            exceptions=RETRY_EXCEPTIONS,
+            methods=IDEMPOTENT_METHODS,
+            respect_retry_after=True):
+        """
+        Arguments:
+            max_attempts - Total number of attempts, including the first one
+            backoff_base - Delay in seconds used to compute the backoff
+            backoff_cap - Maximum delay in seconds between two attempts
+            status_codes - Response status codes that should be retried
+            exceptions - Tuple of exception classes that should be retried
+            methods - HTTP methods that may be retried
+            respect_retry_after - If True, honor the ``Retry-After`` header
+        """
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.status_codes = frozenset(status_codes)
+        self.exceptions = tuple(exceptions)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.respect_retry_after = respect_retry_after
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Build a policy from the ``retry`` subsection of the koku config::
+
+            koku:
+                retry:
+                    max-attempts: 3
+                    backoff-base: 0.5
+                    backoff-cap: 10
+                    status-codes: [429, 502, 503, 504]
+
+        Arguments:
+            cfg - Dictionary with the ``retry`` configuration
+        """
+        return cls(
+            max_attempts=cfg.get('max-attempts', KOKU_RETRY_MAX_ATTEMPTS),
+            backoff_base=cfg.get('backoff-base', KOKU_RETRY_BACKOFF_BASE),
+            backoff_cap=cfg.get('backoff-cap', KOKU_RETRY_BACKOFF_CAP),
+            status_codes=cfg.get('status-codes', RETRY_STATUS_CODES),
+            respect_retry_after=cfg.get('respect-retry-after', True))
+
+    def allowing(self, *methods):
+        """Return a copy of this policy that may also retry ``methods``."""
+        return RetryPolicy(
+            max_attempts=self.max_attempts,
+            backoff_base=self.backoff_base,
+            backoff_cap=self.backoff_cap,
+            status_codes=self.status_codes,
+            exceptions=self.exceptions,
+            methods=self.methods.union(method.upper() for method in methods),
+            respect_retry_after=self.respect_retry_after)
+
+    def should_retry(self, method, attempt, response=None, exception=None):
+        """Return True if another attempt should be made.
+
+        Arguments:
+            method - HTTP method of the request
+            attempt - Number of attempts made so far
+            response - ``requests.Response`` received for the last attempt
+            exception - Exception raised by the last attempt
+        """
+        if attempt >= self.max_attempts or method.upper() not in self.methods:
+            return False
+
+        if exception is not None:
+            return isinstance(exception, self.exceptions)
+
+        return response is not None and response.status_code in self.status_codes
+
+    def backoff(self, attempt):
+        """Return a jittered delay in seconds to wait after ``attempt``."""
+        ceiling = min(self.backoff_cap, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def retry_after(self, response):
+        """Return the delay in seconds requested by the server, if any.
+
+        The ``Retry-After`` header holds either a number of seconds or an
+        HTTP date.
+        """
+        value = response.headers.get('Retry-After') if response is not None else None
+        if not value:
+            return None
+
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+
+        try:
+            retry_date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(retry_date.timestamp() - time.time(), 0)
+
+    def delay(self, attempt, response=None):
+        """Return how long to wait before the attempt following ``attempt``."""
+        if self.respect_retry_after:
+            retry_after = self.retry_after(response)
+            if retry_after is not None:
+                return min(retry_after, self.backoff_cap)
+
+        return self.backoff(attempt)
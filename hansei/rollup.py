@@ -0,0 +1,396 @@
+# coding=utf-8
+"""Derive coarse reports locally from fine-grained ones.
+
+The report validation tests send every combination of resolution, time
+scope and group_by ordering to the server: about 25 queries per report type
+and customer. Most of them can be computed from a daily report grouped by
+every key: monthly totals are sums of daily ones, a report grouped by
+account is the one grouped by account and service summed over the services,
+and swapping the group_by order only changes how the same sums are nested.
+
+``ReportRollup`` plans the queries added to it: each one is either derived
+from a *base* report (daily, grouped by every key used by the queries, over
+a time scope covering the query) or fetched as is when it cannot be. The
+bases are fetched once, and the derived reports are built locally in the
+shape of the Koku responses. ``verify`` then fetches a small sample of the
+derived queries from the server and compares them with the rollup.
+
+Example::
+    >>> rollup = ReportRollup(KokuCostReport, client)
+    >>> for report_filter, group_by in query_params:
+    ...     rollup.add(report_filter=report_filter, group_by=group_by)
+    >>> report = rollup.report(report_filter=report_filter, group_by=group_by)
+    >>> report.total
+    {'value': 1234.5678, 'units': 'USD'}
+    >>> rollup.verify()
+    []
+"""
+import collections
+import datetime
+import random
+from collections import OrderedDict
+from decimal import Decimal
+
+from hansei.constants import KOKU_ROLLUP_SAMPLE_SIZE, KOKU_ROLLUP_TOLERANCE
+from hansei.report_query import ReportQuery, time_range
+
+
+_TIME_FILTERS = ('resolution', 'time_scope_value', 'time_scope_units')
+
+
+RollupMismatch = collections.namedtuple('RollupMismatch', [
+    'query',     # ReportQuery sent to the server
+    'key',       # (period, group values...) or ('total',)
+    'member',    # Line item member compared, 'total' or 'count'
+    'expected',  # Decimal sum reported by the server, None if missing
+    'actual',    # Decimal sum computed by the rollup, None if missing
+])
+"""A difference between a server response and the rollup of a query."""
+
+
+def _time_scope(report_filter):
+    """Return the (time_scope_value, time_scope_units) of a report filter.
+
+    Missing values default as in ``hansei.report_query.time_range``.
+    """
+    resolution = report_filter.get('resolution', 'daily')
+    units = report_filter.get('time_scope_units', 'month' if resolution == 'monthly' else 'day')
+    value = report_filter.get('time_scope_value', -1 if units == 'month' else -10)
+    return value, units
+
+
+def _period(date, resolution):
+    return date.strftime('%Y-%m-%d' if resolution == 'daily' else '%Y-%m')
+
+
+def _periods(start, end, resolution):
+    """Return the periods between two dates included."""
+    periods = []
+    date = start
+    while date <= end:
+        period = _period(date, resolution)
+        if not periods or periods[-1] != period:
+            periods.append(period)
+        date += datetime.timedelta(days=1)
+    return periods
+
+
+def _label_order(label):
+    return (label is None, label or '')
+
+
+def line_item_sums(report, group_keys, member='total'):
+    """Sum the line items of a report by period and group.
+
+    Arguments:
+        report - ``hansei.koku_models.KokuBaseReport`` holding a report
+        group_keys - Group keys the sums are computed for
+        member - Line item member summed, ``total`` or ``count``. Line items
+            without it are left out
+
+    Returns: OrderedDict of (period, group values...) to the
+        ``Decimal`` sum of the member
+    """
+    values = OrderedDict()
+    for group_path, line_item in report.iter_line_items():
+        if line_item.get(member) is None:
+            continue
+        groups = dict(group_path)
+        key = (line_item.get('date'),) + tuple(
+            line_item.get(group_key, groups.get(group_key)) for group_key in group_keys)
+        values.setdefault(key, []).append(line_item[member])
+    if member == 'total':
+        return OrderedDict((key, report._sum(totals)) for key, totals in values.items())
+    return OrderedDict(
+        (key, sum((Decimal(value) for value in counts), Decimal(0)))
+        for key, counts in values.items())
+
+
+class ReportRollup(object):
+    """Reports of one type derived from a few fine-grained reports."""
+
+    def __init__(self, report_class, client, end_date=None,
+                 sample_size=KOKU_ROLLUP_SAMPLE_SIZE, tolerance=KOKU_ROLLUP_TOLERANCE,
+                 seed=0):
+        """
+        Arguments:
+            report_class - ``hansei.koku_models.KokuBaseReport`` subclass, e.g.
+                ``KokuCostReport``
+            client - authenticated ``hansei.api.Client`` object used to issue api calls
+            end_date - Last day of the report time scopes. Defaults to today
+            sample_size - Number of derived queries fetched by ``verify``
+            tolerance - Largest difference between a server sum and the
+                rollup accepted by ``verify``
+            seed - Seed of the choice of the queries fetched by ``verify``
+        """
+        self.report_class = report_class
+        self.client = client
+        self.end_date = end_date or datetime.date.today()
+        self.sample_size = sample_size
+        self.tolerance = Decimal(str(tolerance))
+        self.seed = seed
+        self.queries = []
+        # Base query to its report, None until fetched
+        self.bases = OrderedDict()
+        # Query to the base it is derived from, None if fetched as is
+        self.plan = {}
+        self._reports = {}
+
+    def add(self, report_filter=None, order_by=None, group_by=None, query=None):
+        """Add a query to the plan and return its ``ReportQuery``."""
+        query = ReportQuery.coerce(
+            query, report_filter=report_filter, order_by=order_by, group_by=group_by)
+        if query not in self.plan and query not in self.queries:
+            self.queries.append(query)
+        return query
+
+    def _range(self, query):
+        """Return the (start, end, resolution) of a query, None if invalid."""
+        try:
+            return time_range(self.end_date, dict(query.filters), query.date_range)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _other_filters(query):
+        return tuple(item for item in query.filters if item[0] not in _TIME_FILTERS)
+
+    def _derivable(self, query, base):
+        query_range = self._range(query)
+        base_range = self._range(base)
+        return (
+            self._other_filters(query) == self._other_filters(base) and
+            set(query.group_keys) <= set(base.group_keys) and
+            base_range[0] <= query_range[0] and query_range[1] <= base_range[1])
+
+    def _base_query(self, query):
+        """Return the base query a query would be derived from."""
+        group_keys = []
+        for added in self.queries:
+            group_keys.extend(key for key in added.group_keys if key not in group_keys)
+        time_scope_value, time_scope_units = _time_scope(dict(query.filters))
+        report_filter = dict(self._other_filters(query))
+        report_filter.update(
+            resolution='daily', time_scope_value=time_scope_value,
+            time_scope_units=time_scope_units)
+        start_date, end_date = query.date_range or (None, None)
+        return ReportQuery(
+            report_filter=report_filter, group_by=[(key, '*') for key in group_keys],
+            start_date=start_date, end_date=end_date)
+
+    def plan_queries(self):
+        """Assign every query added to a base, creating the bases needed.
+
+        Queries are planned from the widest time scope to the narrowest, so
+        that a base covers as many of them as possible.
+
+        Returns: ``self.plan``
+        """
+        pending = [query for query in self.queries if query not in self.plan]
+        far_future = (datetime.date.max,)
+        pending.sort(key=lambda query: self._range(query) or far_future)
+        for query in pending:
+            if self._range(query) is None:
+                self.plan[query] = None
+                continue
+            for base in self.bases:
+                if self._derivable(query, base):
+                    self.plan[query] = base
+                    break
+            else:
+                base = self._base_query(query)
+                self.bases.setdefault(base, None)
+                self.plan[query] = base
+        return self.plan
+
+    def fetch(self):
+        """Fetch the base reports not fetched yet.
+
+        Returns: Number of reports fetched
+        """
+        self.plan_queries()
+        fetched = 0
+        for base, report in self.bases.items():
+            if report is None:
+                self.bases[base] = self._get(base)
+                fetched += 1
+        return fetched
+
+    def _get(self, query):
+        report = self.report_class(self.client)
+        report.get(query=query)
+        return report
+
+    def report(self, report_filter=None, order_by=None, group_by=None, query=None):
+        """Return a report object holding the report of a query.
+
+        The report is derived from its base when it can be, fetched from the
+        server otherwise. Derived reports are not grouped by the implicit
+        groups of the server (e.g. instance types) the query does not name.
+        """
+        query = self.add(
+            report_filter=report_filter, order_by=order_by, group_by=group_by, query=query)
+        if query in self._reports:
+            return self._reports[query]
+
+        base = self.plan_queries()[query]
+        if base is None:
+            report = self._get(query)
+        else:
+            self.fetch()
+            report = self.report_class(self.client)
+            report.last_report = self.derive(query, self.bases[base])
+        self._reports[query] = report
+        return report
+
+    def derive(self, query, base_report):
+        """Build the report of ``query`` from the report of its base.
+
+        Arguments:
+            query - ``ReportQuery`` derivable from the base
+            base_report - ``KokuBaseReport`` holding the base report
+
+        Counts (e.g. of distinct instances) add up across the groups of a
+        day, but not across days: they are left out of monthly periods and
+        of the total of reports covering more than one day.
+
+        Returns: Report dictionary in the shape of the Koku responses
+        """
+        start, end, resolution = self._range(query)
+        period_counts = resolution == 'daily'
+        total_count = start == end
+        group_keys = query.group_keys
+        selected = []
+        for key, values in query.group_by:
+            labels = set(
+                label for value in values for label in value.split(',') if label and label != '*')
+            if labels:
+                selected.append((key, labels))
+
+        sums = OrderedDict()
+        units = None
+        has_count = False
+        for group_path, line_item in base_report.iter_line_items():
+            date = datetime.datetime.strptime(line_item['date'], '%Y-%m-%d').date()
+            if not start <= date <= end:
+                continue
+            groups = dict(group_path)
+            labels = tuple(line_item.get(key, groups.get(key)) for key in group_keys)
+            if selected and any(
+                    line_item.get(key, groups.get(key)) not in values for key, values in selected):
+                continue
+
+            units = units or line_item.get('units')
+            count = line_item.get('count')
+            has_count = has_count or count is not None
+            key = (_period(date, resolution),) + labels
+            total, item_count = sums.get(key, (0, 0))
+            sums[key] = (total + (line_item.get('total') or 0), item_count + (count or 0))
+
+        by_period = OrderedDict((period, []) for period in _periods(start, end, resolution))
+        for key in sums:
+            by_period[key[0]].append(key)
+
+        def line_item(key):
+            item = OrderedDict(date=key[0])
+            item.update(zip(group_keys, key[1:]))
+            item['units'] = units
+            item['total'] = sums[key][0]
+            if has_count and period_counts:
+                item['count'] = sums[key][1]
+            return item
+
+        descending = query.order_by is not None and query.order_by[1] == 'desc'
+
+        def nest(keys, depth):
+            if depth == len(group_keys):
+                return [line_item(key) for key in keys]
+            members = OrderedDict()
+            for key in keys:
+                members.setdefault(key[depth + 1], []).append(key)
+            if query.order_by:
+                ordered = sorted(
+                    members, key=lambda label: sum(sums[key][0] for key in members[label]),
+                    reverse=descending)
+            else:
+                ordered = sorted(members, key=_label_order)
+            children = group_keys[depth + 1] + 's' if depth + 1 < len(group_keys) else 'values'
+            return [
+                OrderedDict([(group_keys[depth], label), (children, nest(members[label], depth + 1))])
+                for label in ordered
+            ]
+
+        data = [
+            OrderedDict([
+                ('date', period),
+                (group_keys[0] + 's' if group_keys else 'values', nest(keys, 0)),
+            ])
+            for period, keys in by_period.items()
+        ]
+        total = OrderedDict([
+            ('value', sum(value for value, _ in sums.values())), ('units', units)])
+        if has_count and total_count:
+            total['count'] = sum(count for _, count in sums.values())
+
+        report = OrderedDict()
+        report['group_by'] = OrderedDict((key, list(values)) for key, values in query.group_by)
+        report['filter'] = dict(query.filters)
+        if query.order_by:
+            report['order_by'] = {query.order_by[0]: query.order_by[1]}
+        report['data'] = data
+        report['total'] = total
+        return report
+
+    def verify(self, sample_size=None):
+        """Compare a sample of the derived reports with the server responses.
+
+        Every period and group sum and the report total are compared, for
+        the line item totals and for the counts the rollup reports.
+
+        Arguments:
+            sample_size - Number of derived queries fetched from the server.
+                Defaults to ``self.sample_size``
+
+        Returns: List of ``RollupMismatch``, empty if the rollup is right
+        """
+        sample_size = self.sample_size if sample_size is None else sample_size
+        derived = [
+            query for query, base in self.plan_queries().items()
+            if base is not None and query != base]
+        sample = random.Random(self.seed).sample(derived, min(sample_size, len(derived)))
+
+        mismatches = []
+        for query in sample:
+            rollup = self.report(query=query)
+            server = self._get(query)
+            server_total = server.total or {}
+            for member, total_member in (('total', 'value'), ('count', 'count')):
+                expected = line_item_sums(server, query.group_keys, member)
+                actual = line_item_sums(rollup, query.group_keys, member)
+                if not actual:
+                    # Counts left out of rolled up periods are not compared
+                    expected = OrderedDict()
+                if total_member in rollup.total:
+                    expected[('total',)] = (
+                        server._sum([server_total.get(total_member)]) if member == 'total'
+                        else Decimal(server_total.get(total_member) or 0))
+                    actual[('total',)] = (
+                        rollup._sum([rollup.total[total_member]]) if member == 'total'
+                        else Decimal(rollup.total[total_member]))
+                mismatches.extend(self._compare(query, member, expected, actual))
+        return mismatches
+
+    def _compare(self, query, member, expected, actual):
+        """Return the ``RollupMismatch`` between two sets of sums."""
+        mismatches = []
+        for key in list(expected) + [key for key in actual if key not in expected]:
+            expected_sum = expected.get(key)
+            actual_sum = actual.get(key)
+            if expected_sum is None or actual_sum is None:
+                # Groups with nothing to report may be left out
+                if (expected_sum or actual_sum or 0) == 0:
+                    continue
+            elif abs(expected_sum - actual_sum) <= self.tolerance:
+                continue
+            mismatches.append(RollupMismatch(query, key, member, expected_sum, actual_sum))
+        return mismatches
@@ -0,0 +1,102 @@
+# coding=utf-8
+"""Split report queries into date shards and merge their responses.
+
+A report over a long time scope (``-2`` months at daily resolution, grouped
+by account and service) comes back as one large response that is slow for
+Koku to compute and for the client to parse. ``shard_query`` splits such a
+query into queries over consecutive date ranges, sent with the
+``start_date``/``end_date`` parameters of newer Koku versions, which can be
+fetched concurrently. ``merge_reports`` joins their ``data`` lists and sums
+their total values into the report the whole query would have returned.
+
+Monthly reports are split on month boundaries, so that no period is shared
+by two shards.
+
+Example::
+    >>> report = KokuCostReport(client)
+    >>> report.get(report_filter={'resolution': 'daily', 'time_scope_value': -2,
+    ...                           'time_scope_units': 'month'},
+    ...            group_by=[['account', '*'], ['service', '*']], shard_days=7)
+"""
+import datetime
+from collections import OrderedDict
+
+from hansei.report_query import time_range
+
+
+def _next_month(date):
+    return (date.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def shard_query(query, shard_days, end_date=None):
+    """Split a query into queries over consecutive date ranges.
+
+    Arguments:
+        query - ``hansei.report_query.ReportQuery`` to split
+        shard_days - Number of days covered by each shard. Monthly reports
+            are split in whole months, at least one per shard
+        end_date - Last day of the query time scope. Defaults to today
+
+    Returns: List of ``ReportQuery``, in chronological order
+
+    :raises: ValueError if the query time scope is invalid.
+    """
+    if shard_days < 1:
+        raise ValueError('shard_days must be positive')
+
+    start, end, resolution = time_range(
+        end_date or datetime.date.today(), dict(query.filters), query.date_range)
+    # The date range replaces the time scope
+    query = query.filter(time_scope_value=None, time_scope_units=None)
+
+    shards = []
+    shard_start = start
+    while shard_start <= end:
+        if resolution == 'monthly':
+            shard_end = _next_month(shard_start)
+            while (_next_month(shard_end) - shard_start).days <= shard_days:
+                shard_end = _next_month(shard_end)
+            shard_end -= datetime.timedelta(days=1)
+        else:
+            shard_end = shard_start + datetime.timedelta(days=shard_days - 1)
+        shard_end = min(shard_end, end)
+        shards.append(query.between(shard_start, shard_end))
+        shard_start = shard_end + datetime.timedelta(days=1)
+    return shards
+
+
+def merge_reports(reports, report_filter=None):
+    """Merge the reports of consecutive shards into a single report.
+
+    The ``value`` of the merged total is the sum of the shard values. As in
+    the reports derived by ``hansei.rollup``, counts do not add up across
+    days, so the ``count`` of the total is only kept for a single shard.
+
+    Arguments:
+        reports - Report dictionaries of the shards, in chronological order
+        report_filter - ``filter`` member of the merged report. Defaults to
+            the one of the first shard
+
+    Returns: Report dictionary. Its ``data`` list joins the ones of the
+        shards and the value of its ``total`` is the sum of theirs
+    """
+    merged = OrderedDict()
+    for key, value in reports[0].items():
+        if key not in ('data', 'total'):
+            merged[key] = value
+    if report_filter is not None:
+        merged['filter'] = report_filter
+
+    merged['data'] = [entry for report in reports for entry in report.get('data') or []]
+
+    total = OrderedDict()
+    for report in reports:
+        for key, value in (report.get('total') or {}).items():
+            if key not in total or total[key] is None:
+                total[key] = value
+            elif key == 'value' and value is not None:
+                total[key] += value
+    if len(reports) > 1:
+        total.pop('count', None)
+    merged['total'] = total
+    return merged
@@ -0,0 +1,73 @@
+# coding=utf-8
+"""Coalesce concurrent identical calls into a single one.
+
+When several threads ask for the same report at the same moment, only the
+first one needs to reach the server. ``SingleFlight`` lets the other callers
+wait for that call to finish and hands them its result.
+"""
+import threading
+
+
+class _Call(object):
+    """A call in flight and the callers waiting for its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight(object):
+    """Run at most one call per key at a time and share its outcome."""
+
+    def __init__(self):
+        self.executed = 0
+        self.collapsed = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """Call ``func(*args, **kwargs)`` unless a call for ``key`` is in flight.
+
+        If another thread is already running a call for ``key``, wait for it
+        and return its result, or raise the exception it raised.
+
+        Arguments:
+            key - Hashable identifying equivalent calls
+            func - Callable to run
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as exc:
+            call.exception = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def stats(self):
+        """Return the number of executed and collapsed calls."""
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'collapsed': self.collapsed,
+                'in_flight': len(self._calls),
+            }
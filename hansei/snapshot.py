@@ -0,0 +1,358 @@
+# coding=utf-8
+"""Compact binary snapshots of reports, loaded with ``mmap``.
+
+A snapshot stores the line items of a report as the columns of
+``hansei.columns.ReportColumns``, so that the reports of many nightly runs
+can be kept on disk and compared without fetching them again, and without
+parsing JSON nor holding them all in memory. A snapshot file holds::
+
+    header (32 bytes)
+        magic, format version, offset and length of the index
+    columns (8-byte aligned)
+        categorical columns (date, units, account, service...) as
+        ``uint32`` codes, ``total`` as ``int64`` fixed-point numbers or
+        ``float64``, ``count`` as ``int64``
+    string tables
+        for each categorical column, the ``uint32`` offsets of its labels
+        followed by the labels encoded in UTF-8
+    index
+        small JSON document: endpoint and query of the report, its members
+        other than data, free metadata (server commit...), and the type,
+        offset and length of every column and string table
+
+``Snapshot`` maps the file in memory and exposes the columns as zero-copy
+``memoryview`` objects (NumPy arrays when NumPy is installed), so opening a
+snapshot only reads its index.
+
+Example::
+    >>> report = KokuCostReport(client)
+    >>> report.get(report_filter=..., group_by=[['account', '*'], ['service', '*']])
+    >>> write_snapshot('costs.snap', report, metadata={'commit': status['commit']})
+    >>> with Snapshot('costs.snap') as snapshot:
+    ...     snapshot.to_columns().group_sum('account')
+"""
+import array
+import datetime
+import json
+import mmap
+import struct
+import sys
+from collections import OrderedDict
+from decimal import Decimal
+
+from hansei.codec import FIXED_POINT_MEMBERS
+from hansei.columns import ReportColumns
+from hansei.exceptions import SnapshotError
+from hansei.report_query import ReportQuery
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+SNAPSHOT_MAGIC = b'HANSEISN'
+"""First bytes of every snapshot file."""
+
+SNAPSHOT_VERSION = 1
+"""Version of the snapshot format written by ``write_snapshot``."""
+
+_HEADER = struct.Struct('<8sHHIQQ')
+
+_ALIGNMENT = 8
+
+_NUMPY_TYPES = {'I': 'uint32', 'q': 'int64', 'd': 'float64'}
+
+
+def _write_aligned(snapshot_file, data):
+    """Write ``data`` at the next aligned offset and return that offset."""
+    padding = -snapshot_file.tell() % _ALIGNMENT
+    snapshot_file.write(b'\0' * padding)
+    offset = snapshot_file.tell()
+    snapshot_file.write(data)
+    return offset
+
+
+def _column_array(typecode, values):
+    if hasattr(values, 'tolist'):
+        values = values.tolist()
+    try:
+        return array.array(typecode, values)
+    except (OverflowError, TypeError):
+        raise SnapshotError(
+            'Column values do not fit in 64 bits, use a smaller fixed-point scale')
+
+
+def _text_total(total, codec):
+    """Return the numbers of a report total as strings of their exact value."""
+    text_total = OrderedDict()
+    for key, value in (total or {}).items():
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            value = str(
+                codec.number(value) if codec and key in FIXED_POINT_MEMBERS else Decimal(value))
+        text_total[key] = value
+    return text_total
+
+
+def write_snapshot(output, report, fixed_point=True, scale=None, metadata=None):
+    """Write the last report of a ``KokuBaseReport`` to a snapshot file.
+
+    Arguments:
+        output - Path of the snapshot file
+        report - ``hansei.koku_models.KokuBaseReport`` holding a report
+        fixed_point - Store the totals as exact fixed-point integers
+        scale - Number of decimal digits kept by the fixed-point totals
+        metadata - JSON serializable dictionary stored along with the report,
+            e.g. the server commit
+
+    Returns: Number of line items written
+
+    :raises: ``hansei.exceptions.SnapshotError`` if the report cannot be
+        stored.
+    """
+    if report.last_report is None:
+        raise SnapshotError('There is no report to snapshot')
+
+    codec = getattr(report.client, 'codec', None)
+    columns = report.to_columns(fixed_point=fixed_point, scale=scale)
+    members = OrderedDict(
+        (key, value) for key, value in report.last_report.items()
+        if key not in ('data', 'total'))
+    members['total'] = _text_total(report.last_report.get('total'), codec)
+    query = getattr(report, 'last_query', None)
+
+    with open(output, 'wb') as snapshot_file:
+        snapshot_file.write(b'\0' * _HEADER.size)
+        index_columns = []
+        for name, values in columns.columns.items():
+            if name in columns.labels:
+                typecode = 'I'
+            elif name == 'total' and columns.scale is None:
+                typecode = 'd'
+            else:
+                typecode = 'q'
+            column = _column_array(typecode, values)
+            entry = OrderedDict([
+                ('name', name),
+                ('type', typecode),
+                ('offset', _write_aligned(snapshot_file, column.tobytes())),
+                ('length', len(column)),
+            ])
+
+            if name in columns.labels:
+                labels = columns.labels[name]
+                encoded = [(label or '').encode('utf-8') for label in labels]
+                offsets = array.array('I', [0])
+                for label in encoded:
+                    offsets.append(offsets[-1] + len(label))
+                entry['labels'] = OrderedDict([
+                    ('offset', _write_aligned(snapshot_file, offsets.tobytes())),
+                    ('length', len(labels)),
+                    ('none', labels.index(None) if None in labels else None),
+                ])
+                snapshot_file.write(b''.join(encoded))
+            index_columns.append(entry)
+
+        index = OrderedDict([
+            ('endpoint', report.endpoint),
+            ('query', [list(pair) for pair in query.params] if query else None),
+            ('created', datetime.datetime.utcnow().isoformat()),
+            ('byteorder', sys.byteorder),
+            ('rows', columns.size),
+            ('scale', columns.scale),
+            ('report', members),
+            ('metadata', metadata or {}),
+            ('columns', index_columns),
+        ])
+        index_data = json.dumps(index, default=str).encode('utf-8')
+        index_offset = _write_aligned(snapshot_file, index_data)
+        snapshot_file.seek(0)
+        snapshot_file.write(_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, 0, index_offset, len(index_data)))
+    return columns.size
+
+
+class Snapshot(object):
+    """A report snapshot mapped in memory."""
+
+    def __init__(self, path):
+        """
+        Arguments:
+            path - Path of a file written by ``write_snapshot``
+
+        :raises: ``hansei.exceptions.SnapshotError`` if the file is not a
+            snapshot this version can read.
+        """
+        self.path = path
+        with open(path, 'rb') as snapshot_file:
+            try:
+                self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                raise SnapshotError('{} is not a report snapshot'.format(path))
+        self._buffer = memoryview(self._mmap)
+        self._views = []
+
+        try:
+            magic, version, _, _, index_offset, index_length = _HEADER.unpack_from(self._mmap)
+        except struct.error:
+            magic, version = None, None
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise SnapshotError('{} is not a report snapshot'.format(path))
+        if version > SNAPSHOT_VERSION:
+            self.close()
+            raise SnapshotError('{} has the unsupported snapshot version {}'.format(path, version))
+
+        self.index = json.loads(
+            bytes(self._buffer[index_offset:index_offset + index_length]).decode('utf-8'),
+            object_pairs_hook=OrderedDict)
+        self._columns = OrderedDict((entry['name'], entry) for entry in self.index['columns'])
+        self._labels = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Release the columns and unmap the file.
+
+        NumPy arrays returned by ``column`` keep the file mapped until they
+        are garbage collected.
+        """
+        for view in self._views:
+            view.release()
+        self._views = []
+        try:
+            self._buffer.release()
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __len__(self):
+        return self.index['rows']
+
+    @property
+    def endpoint(self):
+        """The endpoint of the report"""
+        return self.index['endpoint']
+
+    @property
+    def query(self):
+        """The ``hansei.report_query.ReportQuery`` of the report, or None"""
+        params = self.index['query']
+        return ReportQuery.from_params(params) if params is not None else None
+
+    @property
+    def created(self):
+        """The UTC date and time the snapshot was written, as a string"""
+        return self.index['created']
+
+    @property
+    def metadata(self):
+        return self.index['metadata']
+
+    @property
+    def scale(self):
+        """The number of decimal digits of the fixed-point totals, or None"""
+        return self.index['scale']
+
+    @property
+    def report(self):
+        """The members of the report but data, e.g. filter, group_by and total"""
+        return self.index['report']
+
+    @property
+    def total(self):
+        """The total of the report, its numbers as ``Decimal``"""
+        return OrderedDict(
+            (key, Decimal(value) if key in ('value', 'count') and value is not None else value)
+            for key, value in self.index['report'].get('total', {}).items())
+
+    @property
+    def column_names(self):
+        return list(self._columns)
+
+    def _view(self, offset, typecode, length):
+        itemsize = array.array(typecode).itemsize
+        data = self._buffer[offset:offset + itemsize * length]
+        if self.index['byteorder'] != sys.byteorder:
+            swapped = array.array(typecode, bytes(data))
+            swapped.byteswap()
+            return swapped
+        if numpy is not None:
+            return numpy.frombuffer(data, dtype=_NUMPY_TYPES[typecode])
+        view = data.cast(typecode)
+        self._views.append(view)
+        return view
+
+    def column(self, name):
+        """Return a column without copying it.
+
+        Categorical columns hold the codes of their ``labels``.
+        """
+        entry = self._columns[name]
+        return self._view(entry['offset'], entry['type'], entry['length'])
+
+    def labels(self, name):
+        """Return the labels of a categorical column, None for missing values."""
+        if name not in self._labels:
+            entry = self._columns[name]['labels']
+            offsets = self._view(entry['offset'], 'I', entry['length'] + 1)
+            start = entry['offset'] + offsets.itemsize * (entry['length'] + 1)
+            offsets = [int(offset) for offset in offsets]
+            blob = bytes(self._buffer[start:start + offsets[-1]])
+            labels = [
+                blob[offsets[index]:offsets[index + 1]].decode('utf-8')
+                for index in range(entry['length'])]
+            if entry['none'] is not None:
+                labels[entry['none']] = None
+            self._labels[name] = labels
+        return self._labels[name]
+
+    def to_columns(self):
+        """Return the columns as a ``hansei.columns.ReportColumns`` object.
+
+        The columns are not copied.
+        """
+        columns = ReportColumns(scale=self.scale)
+        columns.size = len(self)
+        for name, entry in self._columns.items():
+            columns.columns[name] = self.column(name)
+            if 'labels' in entry:
+                columns.labels[name] = self.labels(name)
+        return columns
+
+    def calculate_total(self):
+        """Return the sum of the line item totals, as ``Decimal``, or None if there are none."""
+        if not len(self):
+            return None
+        return self.to_columns().sum()
+
+    def iter_line_items(self):
+        """Yield the line items of the snapshot as ``KokuBaseReport.iter_line_items`` does.
+
+        The group path holds the categorical columns but units, and the
+        totals are ``Decimal`` in fixed-point snapshots, floats otherwise.
+        """
+        names = [name for name in self._columns if 'labels' in self._columns[name]]
+        group_names = [name for name in names if name != 'units']
+        labels = {name: self.labels(name) for name in names}
+        codes = {name: self.column(name) for name in names}
+        totals = self.column('total')
+        counts = self.column('count') if 'count' in self._columns else None
+        scale = self.scale
+
+        for row in range(len(self)):
+            group_path = tuple(
+                (name, labels[name][codes[name][row]]) for name in group_names)
+            line_item = OrderedDict(group_path)
+            line_item['units'] = labels['units'][codes['units'][row]] if 'units' in codes else None
+            total = totals[row]
+            line_item['total'] = (
+                Decimal(int(total)).scaleb(-scale) if scale is not None else float(total))
+            if counts is not None:
+                line_item['count'] = int(counts[row])
+            yield group_path, line_item
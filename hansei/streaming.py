@@ -0,0 +1,216 @@
+# coding=utf-8
+"""Incremental parsing of Koku report responses.
+
+A multi-month daily report grouped by account and service can weigh hundreds
+of MB once decoded into Python objects. ``ReportStream`` parses the response
+body while it is being downloaded and yields each entry of the ``values``
+lists as soon as it is complete, together with the group keys (date, account,
+service, instance_type...) of the objects enclosing it. Only one line item is
+held in memory at a time.
+
+Example::
+    >>> response = client.get('reports/costs/', stream=True)
+    >>> stream = ReportStream(response.iter_content(chunk_size=65536))
+    >>> for group_path, line_item in stream:
+    ...     print(dict(group_path)['date'], line_item['total'])
+    >>> stream.meta['total']
+"""
+import codecs
+import json
+import re
+
+from hansei.constants import KOKU_REPORT_STREAM_CHUNK_SIZE
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class ReportStream(object):
+    """Iterate over the line items of a report JSON document as it arrives.
+
+    Iterating yields ``(group_path, line_item)`` tuples. ``group_path`` is a
+    tuple of ``(key, value)`` pairs holding the string fields of every object
+    enclosing the ``values`` list, from the outermost to the innermost, e.g.
+    ``(('date', '2018-08-01'), ('account', '1234'))``. Only the fields
+    preceding the list in each object are known when its line items are
+    yielded, ``KokuBaseReport.iter_line_items`` follows the same rule.
+
+    The top level members of the report other than ``data`` (``total``,
+    ``filter``, ``group_by``, ``order_by``...) are decoded whole and stored in
+    ``self.meta`` as they are encountered; all of them are available once the
+    iteration is over.
+    """
+
+    def __init__(self, chunks, decoder=None, data_key='data', values_key='values'):
+        """
+        Arguments:
+            chunks - Iterable of ``bytes`` or ``str`` chunks of the document,
+                e.g. ``requests.Response.iter_content()``
+            decoder - ``json.JSONDecoder`` used to decode the line items and
+                the other leaf values
+            data_key - Top level key of the report data
+            values_key - Key of the lists holding the line items
+        """
+        self.meta = {}
+        self.items = 0
+        self.data_key = data_key
+        self.values_key = values_key
+        self._chunks = iter(chunks)
+        self._decoder = decoder or json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        if self._peek() != '{':
+            self._error('Expecting a report object')
+        self._pos += 1
+
+        for key in self._object_keys():
+            if key == self.data_key:
+                yield from self._walk(())
+            else:
+                self.meta[key] = self._decode_value()
+
+        if self._peek() is not None:
+            self._error('Extra data after the report object')
+
+    def _error(self, message):
+        raise json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def _fill(self):
+        """Append the next chunk of text to the buffer.
+
+        Returns False once the end of the document was reached.
+        """
+        if self._eof:
+            return False
+
+        # Drop what was already consumed so the buffer stays small
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        for chunk in self._chunks:
+            text = self._text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self._buffer += text
+                return True
+
+        self._buffer += self._text_decoder.decode(b'', final=True)
+        self._eof = True
+        return False
+
+    def _peek(self):
+        """Skip whitespace and return the next character, or None at the end."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def _decode_value(self):
+        """Decode the complete JSON value starting at the current position."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+
+            # A number may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+
+            self._pos = end
+            return value
+
+    def _consume(self, expected):
+        """Consume the next character, which must be one of ``expected``."""
+        char = self._peek()
+        if char is None or char not in expected:
+            self._error('Expecting one of {!r}'.format(expected))
+        self._pos += 1
+        return char
+
+    def _object_keys(self):
+        """Yield the keys of the object whose ``{`` was just consumed.
+
+        The caller must consume the value of each key before asking for the
+        next one.
+        """
+        if self._peek() == '}':
+            self._pos += 1
+            return
+
+        while True:
+            if self._peek() != '"':
+                self._error('Expecting a property name')
+            key = self._decode_value()
+            self._consume(':')
+            yield key
+            if self._consume(',}') == '}':
+                return
+
+    def _array_items(self):
+        """Yield once per item of the array whose ``[`` was just consumed.
+
+        The caller must consume each item before asking for the next one.
+        """
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            yield
+            if self._consume(',]') == ']':
+                return
+
+    def _walk(self, path):
+        """Yield the line items found in the value at the current position."""
+        char = self._peek()
+        if char == '[':
+            self._pos += 1
+            for _ in self._array_items():
+                yield from self._walk(path)
+        elif char == '{':
+            self._pos += 1
+            groups = []
+            for key in self._object_keys():
+                char = self._peek()
+                if key == self.values_key and char == '[':
+                    self._pos += 1
+                    group_path = path + tuple(groups)
+                    for _ in self._array_items():
+                        line_item = self._decode_value()
+                        self.items += 1
+                        yield group_path, line_item
+                elif char in ('[', '{'):
+                    yield from self._walk(path + tuple(groups))
+                else:
+                    value = self._decode_value()
+                    if isinstance(value, str):
+                        groups.append((key, value))
+        elif char is None:
+            self._error('Unexpected end of the report')
+        else:
+            self._decode_value()
+
+
+def stream_response(response, decoder=None, chunk_size=KOKU_REPORT_STREAM_CHUNK_SIZE):
+    """Return a ``ReportStream`` reading the body of ``response``.
+
+    Arguments:
+        response - ``requests.Response`` obtained with ``stream=True``
+        decoder - ``json.JSONDecoder`` used to decode the leaf values.
+            Defaults to the decoder of the codec of the client that received
+            the response
+        chunk_size - Number of bytes read from the connection at once
+    """
+    if decoder is None and getattr(response, 'codec', None) is not None:
+        decoder = response.codec.json_decoder
+    return ReportStream(response.iter_content(chunk_size=chunk_size), decoder=decoder)
@@ -0,0 +1,436 @@
+# coding=utf-8
+"""Synthetic Koku report data, from a thousand to tens of millions of line items.
+
+``SyntheticDataSet`` describes the daily usage of N accounts × M services ×
+D days (and of instance types per account). Rows are derived from the seed
+and the day alone, so the same data set can be regenerated anywhere and
+read lazily one day at a time.
+
+``ReportBuilder`` aggregates a data set into a cost, storage or
+instance-type report in the documented shapes (date → accounts / services /
+instance_types → values), applying the same resolution, time scope,
+group_by, filter and order_by parameters as the Koku report endpoints. It
+builds one period at a time, so a report can be streamed to disk while
+holding only one period in memory.
+
+It seeds ``hansei.fake_server`` and can be used directly by
+microbenchmarks::
+
+    >>> from hansei import synthetic
+    >>> report = synthetic.generate_report('costs', accounts=10, services=10, days=30)
+    >>> synthetic.write_report('/tmp/costs.json.gz', 'costs', accounts=1000, services=100, days=100)
+    10000000
+"""
+import datetime
+import gzip
+import json
+import random
+from collections import OrderedDict
+
+from hansei.report_query import month_start, time_range
+
+
+INSTANCE_TYPES = (
+    't2.micro', 't2.small', 't2.medium', 'm5.large', 'm5.xlarge', 'c5.large',
+    'c5.2xlarge', 'r4.large', 'r4.xlarge', 'p3.2xlarge')
+"""Instance types used by the synthetic data set, suffixed when more are needed."""
+
+SERVICES = (
+    'AmazonEC2', 'AmazonS3', 'AmazonRDS', 'AmazonCloudFront', 'AWSLambda',
+    'AmazonDynamoDB', 'AmazonSNS', 'AmazonSQS', 'AmazonEBS', 'AmazonVPC')
+"""Service names used by the synthetic data set, suffixed when more are needed."""
+
+INSTANCE_SERVICE = 'AmazonEC2'
+"""Service the instances of the synthetic data set are billed under."""
+
+
+class ReportType(object):
+    """How a report endpoint aggregates the synthetic data set."""
+
+    def __init__(self, name, rows, metric, units, groups, implicit_group=None):
+        """
+        Arguments:
+            name - Short name of the report
+            rows - Name of the data set rows the report is computed from
+            metric - Name of the row field summed into ``total``
+            units - Units of ``total``
+            groups - Row fields the report can be grouped by
+            implicit_group - Field the report is always grouped by last
+        """
+        self.name = name
+        self.rows = rows
+        self.metric = metric
+        self.units = units
+        self.groups = groups
+        self.implicit_group = implicit_group
+
+
+REPORT_TYPES = OrderedDict([
+    ('reports/costs/', ReportType(
+        'costs', 'usage', 'cost', 'USD', ('account', 'service'))),
+    ('reports/inventory/storage/', ReportType(
+        'storage', 'usage', 'storage', 'GB-Mo', ('account', 'service'))),
+    ('reports/inventory/instance-type/', ReportType(
+        'instance-type', 'instances', 'hours', 'Hrs', ('account', 'service', 'instance_type'),
+        implicit_group='instance_type')),
+])
+"""Report types by endpoint, relative to the API root."""
+
+
+def get_report_type(report):
+    """Return the ``ReportType`` of a report name or endpoint.
+
+    Arguments:
+        report - ``costs``, ``storage``, ``instance-type`` or the endpoint of
+            one of them, e.g. ``reports/costs/``
+    """
+    if report in REPORT_TYPES:
+        return REPORT_TYPES[report]
+    for report_type in REPORT_TYPES.values():
+        if report_type.name == report:
+            return report_type
+    raise ValueError('Unknown report {!r}, expecting one of {}'.format(
+        report, ', '.join(report_type.name for report_type in REPORT_TYPES.values())))
+
+
+def _names(base_names, count, separator=''):
+    return [
+        base_names[index % len(base_names)] +
+        ('' if index < len(base_names) else '{}{}'.format(separator, index))
+        for index in range(count)]
+
+
+class SyntheticDataSet(object):
+    """Deterministic daily usage of N accounts, M services and instance types."""
+
+    def __init__(self, accounts=3, services=5, days=62, instance_types=4, end_date=None,
+                 seed=0, cache=True):
+        """
+        Arguments:
+            accounts - Number of accounts
+            services - Number of services used by every account
+            days - Number of days of data, ending at ``end_date``
+            instance_types - Number of instance types run by every account
+            end_date - Last day of data. Defaults to today
+            seed - Seed of the random number generator
+            cache - Keep the generated rows in memory. Disable it to read
+                data sets larger than the memory
+        """
+        self.end_date = end_date or datetime.date.today()
+        self.start_date = self.end_date - datetime.timedelta(days=days - 1)
+        self.days = days
+        self.seed = seed
+        self.accounts = ['{:012d}'.format(10 ** 11 + index) for index in range(accounts)]
+        self.services = _names(SERVICES, services)
+        self.instance_types = _names(INSTANCE_TYPES, instance_types, separator='.')
+        self._cache = {} if cache else None
+
+    def day_rows(self, name, date):
+        """Return the rows of ``name`` (``usage`` or ``instances``) for one day.
+
+        Usage rows hold account, service, cost and storage fields, instance
+        rows hold account, service (always ``INSTANCE_SERVICE``),
+        instance_type, hours and count fields.
+        """
+        if not self.start_date <= date <= self.end_date:
+            return []
+        if self._cache is not None and (name, date) in self._cache:
+            return self._cache[(name, date)]
+
+        # Seeded by the day so any day can be generated on its own
+        rng = random.Random('{}-{}-{}'.format(self.seed, name, date.toordinal()))
+        uniform = rng.uniform
+        if name == 'usage':
+            rows = [
+                {
+                    'account': account,
+                    'service': service,
+                    'cost': round(uniform(0, 100), 4),
+                    'storage': round(uniform(0, 500), 3),
+                }
+                for account in self.accounts for service in self.services
+            ]
+        elif name == 'instances':
+            rows = []
+            for account in self.accounts:
+                for instance_type in self.instance_types:
+                    count = rng.randint(0, 4)
+                    rows.append({
+                        'account': account,
+                        'service': INSTANCE_SERVICE,
+                        'instance_type': instance_type,
+                        'hours': float(24 * count),
+                        'count': count,
+                    })
+        else:
+            raise ValueError('Unknown rows {!r}'.format(name))
+
+        if self._cache is not None:
+            self._cache[(name, date)] = rows
+        return rows
+
+    def rows(self, name, start, end):
+        """Yield ``(date, row)`` for the rows of ``name`` between two dates included."""
+        date = start
+        while date <= end:
+            for row in self.day_rows(name, date):
+                yield date, row
+            date += datetime.timedelta(days=1)
+
+    def full_filter(self, resolution='daily'):
+        """Return the report filter covering the whole data set."""
+        if resolution == 'monthly':
+            months = (
+                (self.end_date.year - self.start_date.year) * 12 +
+                self.end_date.month - self.start_date.month + 1)
+            return {'resolution': 'monthly', 'time_scope_value': -months,
+                    'time_scope_units': 'month'}
+        return {'resolution': 'daily', 'time_scope_value': -self.days,
+                'time_scope_units': 'day'}
+
+
+def _period(date, resolution):
+    return date.strftime('%Y-%m-%d' if resolution == 'daily' else '%Y-%m')
+
+
+class ReportBuilder(object):
+    """Aggregate a ``SyntheticDataSet`` into a Koku report, one period at a time.
+
+    Instance counts follow the rules of ``hansei.rollup``: they add up across
+    the groups of a day but not across days, so monthly line items hold no
+    count and the total only holds one for a report covering a single day.
+    """
+
+    def __init__(self, data, report, report_filter=None, group_by=None, order_by=None,
+                 date_range=None):
+        """
+        Arguments:
+            data - ``SyntheticDataSet``
+            report - Report name or endpoint, see ``get_report_type``
+            report_filter - Dictionary of ``filter[...]`` query parameters
+            group_by - Ordered dictionary of group key to the list of
+                requested values, ``*`` standing for every value. A list of
+                group keys stands for every value of each key
+            order_by - Ordered dictionary of ``order_by[...]`` query parameters
+            date_range - ``(start_date, end_date)`` query parameters, as
+                dates or ``YYYY-MM-DD`` strings, overriding the time scope
+
+        :raises: ValueError if the parameters are invalid.
+        """
+        self.data = data
+        self.report_type = get_report_type(report)
+        self.report_filter = dict(report_filter or {})
+        if group_by and not isinstance(group_by, dict):
+            group_by = [(key, ['*']) for key in group_by]
+        self.group_by = OrderedDict(group_by or {})
+        self.order_by = OrderedDict(order_by or {})
+        self.start, self.end, self.resolution = time_range(
+            data.end_date, self.report_filter, date_range)
+
+        for key in self.group_by:
+            if key not in self.report_type.groups:
+                raise ValueError('Unsupported group_by parameter {!r}'.format(key))
+
+        self.groups = list(self.group_by)
+        implicit_group = self.report_type.implicit_group
+        if implicit_group and implicit_group not in self.groups:
+            self.groups.append(implicit_group)
+
+        # Values selected by group_by[...] and filter[...]
+        self.selected = {}
+        for key in self.report_type.groups:
+            values = set()
+            for value in self.group_by.get(key, []) + (
+                    [self.report_filter[key]] if key in self.report_filter else []):
+                values.update(part for part in value.split(',') if part and part != '*')
+            if values:
+                self.selected[key] = values
+
+        self.total = 0.0
+        self.count = 0
+        self.line_items = 0
+
+    def _line_item(self, period, group_values, total, count):
+        item = {'date': period}
+        for group, value in zip(self.groups, group_values):
+            item[group] = value
+        item['units'] = self.report_type.units
+        item['total'] = total
+        if self.report_type.metric == 'hours' and self.resolution == 'daily':
+            item['count'] = count
+        return item
+
+    def _nest(self, period, sums, counts, keys, depth):
+        """Return the entries of the group at ``depth`` holding ``keys``."""
+        if depth == len(self.groups):
+            self.line_items += len(keys)
+            return [self._line_item(period, key, sums[key], counts[key]) for key in keys]
+
+        members = OrderedDict()
+        for key in keys:
+            members.setdefault(key[depth], []).append(key)
+        if self.order_by:
+            descending = any(direction == 'desc' for direction in self.order_by.values())
+            ordered = sorted(
+                members, key=lambda value: sum(sums[key] for key in members[value]),
+                reverse=descending)
+        else:
+            ordered = sorted(members)
+
+        groups = self.groups
+        children = groups[depth + 1] + 's' if depth + 1 < len(groups) else 'values'
+        return [
+            {
+                groups[depth]: value,
+                children: self._nest(period, sums, counts, members[value], depth + 1),
+            }
+            for value in ordered
+        ]
+
+    def _periods(self):
+        """Yield ``(period, first day, last day)`` of the report periods."""
+        date = self.start
+        while date <= self.end:
+            period = _period(date, self.resolution)
+            if self.resolution == 'daily':
+                last = date
+            else:
+                last = min(month_start(date, -1) - datetime.timedelta(days=1), self.end)
+            yield period, date, last
+            date = last + datetime.timedelta(days=1)
+
+    def entries(self):
+        """Yield the entries of the report ``data`` list, one per period.
+
+        ``self.total``, ``self.count`` and ``self.line_items`` are up to date
+        once the iteration is over.
+        """
+        self.total = 0.0
+        self.count = 0
+        self.line_items = 0
+        report_type = self.report_type
+        metric = report_type.metric
+        groups = self.groups
+        selected = list(self.selected.items())
+
+        for period, first, last in self._periods():
+            sums = {}
+            counts = {}
+            for _, row in self.data.rows(report_type.rows, first, last):
+                if selected and any(row[key] not in values for key, values in selected):
+                    continue
+                key = tuple(row[group] for group in groups)
+                sums[key] = sums.get(key, 0.0) + row[metric]
+                counts[key] = counts.get(key, 0) + row.get('count', 0)
+
+            self.total += sum(sums.values())
+            self.count += sum(counts.values())
+            yield {
+                'date': period,
+                groups[0] + 's' if groups else 'values':
+                    self._nest(period, sums, counts, list(sums), 0),
+            }
+
+    def _total(self):
+        total = OrderedDict([('value', self.total), ('units', self.report_type.units)])
+        if self.report_type.metric == 'hours' and self.start == self.end:
+            total['count'] = self.count
+        return total
+
+    def _header(self):
+        header = OrderedDict()
+        header['group_by'] = self.group_by
+        header['filter'] = self.report_filter
+        if self.order_by:
+            header['order_by'] = self.order_by
+        return header
+
+    def report(self):
+        """Return the whole report as a dictionary."""
+        report = self._header()
+        report['data'] = list(self.entries())
+        report['total'] = self._total()
+        return report
+
+    def iter_json(self):
+        """Yield the report JSON document in ``str`` chunks.
+
+        Only one period of the report is held in memory at a time. Each
+        period is encoded at once, which is much faster than
+        ``JSONEncoder.iterencode``.
+        """
+        encoder = json.JSONEncoder()
+        header = encoder.encode(self._header())
+        yield header[:-1] + (', ' if len(header) > 2 else '') + '"data": ['
+        for index, entry in enumerate(self.entries()):
+            if index:
+                yield ', '
+            yield encoder.encode(entry)
+        yield '], "total": ' + encoder.encode(self._total()) + '}'
+
+    def write(self, output):
+        """Write the report JSON document to ``output``.
+
+        Arguments:
+            output - Path of the file to write, compressed with gzip if it
+                ends with ``.gz``, or a file object open in text mode
+
+        Returns: Number of line items written
+        """
+        if not isinstance(output, str):
+            output.writelines(self.iter_json())
+            return self.line_items
+
+        if output.endswith('.gz'):
+            report_file = gzip.open(output, 'wt', encoding='utf-8', compresslevel=6)
+        else:
+            report_file = open(output, 'w', encoding='utf-8')
+        with report_file:
+            report_file.writelines(self.iter_json())
+        return self.line_items
+
+
+def _builder(report, accounts, services, days, instance_types, group_by, resolution,
+             seed, end_date):
+    data = SyntheticDataSet(
+        accounts=accounts, services=services, days=days, instance_types=instance_types,
+        end_date=end_date, seed=seed, cache=False)
+    return ReportBuilder(
+        data, report, report_filter=data.full_filter(resolution), group_by=group_by)
+
+
+def generate_report(report='costs', accounts=10, services=10, days=30, instance_types=4,
+                    group_by=('account', 'service'), resolution='daily', seed=0,
+                    end_date=None):
+    """Return a report covering a whole synthetic data set, as a dictionary.
+
+    Arguments:
+        report - Report name or endpoint, see ``get_report_type``
+        accounts, services, days, instance_types, seed, end_date - Volume
+            of the data set, see ``SyntheticDataSet``
+        group_by - Group keys of the report, outermost first. The
+            instance-type report is always grouped by instance type, and
+            cannot be grouped by service
+        resolution - ``daily`` or ``monthly``
+
+    A daily cost report grouped by account and service holds
+    ``accounts * services * days`` line items.
+    """
+    return _builder(
+        report, accounts, services, days, instance_types, group_by, resolution, seed,
+        end_date).report()
+
+
+def write_report(output, report='costs', accounts=10, services=10, days=30, instance_types=4,
+                 group_by=('account', 'service'), resolution='daily', seed=0, end_date=None):
+    """Stream a report covering a whole synthetic data set to ``output``.
+
+    Arguments:
+        output - Path or text file object, see ``ReportBuilder.write``
+        Others - See ``generate_report``
+
+    Returns: Number of line items written
+    """
+    return _builder(
+        report, accounts, services, days, instance_types, group_by, resolution, seed,
+        end_date).write(output)
@@ -4,8 +4,11 @@ import pytest
 
 from requests.exceptions import HTTPError
 
-from hansei import config
+from hansei import api, config
+from hansei.constants import KOKU_DEFAULT_PASSWORD, KOKU_DEFAULT_USER
+from hansei.fake_server import FakeKokuServer
 from hansei.koku_models import KokuServiceAdmin
+from hansei.query_matrix import QueryMatrix
 
 
 @pytest.fixture(scope='session')
@@ -90,6 +93,76 @@ def session_customers(customer_config, service_admin):
 
     return customer_dict
 
+
+@pytest.fixture(scope='session')
+def report_matrix(request, session_customers):
+    """
+    Fetch the reports of every selected test marked with
+    ``@pytest.mark.report_matrix(report_class=...)`` for every session
+    customer. Queries are canonicalized so that each distinct one is fetched
+    once, all of them concurrently, before the first test using the fixture
+    runs.
+
+    Under pytest-xdist every worker collects every test but only runs the ones
+    it is handed, so the matrix is instead filled lazily by the queries of the
+    tests the worker runs.
+
+    Returns:
+        ``hansei.query_matrix.QueryMatrix`` serving the memoized results
+    """
+    matrix = QueryMatrix(session_customers)
+    # Printed by pytest_terminal_summary with --koku-metrics
+    request.config.koku_report_matrix = matrix
+    if hasattr(request.config, 'workerinput'):
+        return matrix
+
+    for item in request.session.items:
+        marker = item.get_closest_marker('report_matrix')
+        callspec = getattr(item, 'callspec', None)
+        if marker is None or callspec is None:
+            continue
+        matrix.add(
+            marker.kwargs['report_class'],
+            report_filter=callspec.params.get('report_filter'),
+            group_by=callspec.params.get('group_by'))
+    matrix.execute()
+    return matrix
+
+
+@pytest.fixture
+def fake_koku_server(request):
+    """
+    Run a ``hansei.fake_server.FakeKokuServer`` for the duration of the test.
+    The volume of its data set is given with
+    ``@pytest.mark.fake_koku(accounts=..., services=..., days=...)``
+    """
+    marker = request.node.get_closest_marker('fake_koku')
+    with FakeKokuServer(**(marker.kwargs if marker else {})) as server:
+        yield server
+
+
+@pytest.fixture
+def fake_koku_login(fake_koku_server):
+    """
+    Return a function creating ``hansei.api.Client`` objects logged in to the
+    fake Koku server as its service admin. Its keyword arguments are passed
+    to the client
+    """
+    def login(**kwargs):
+        kwargs.setdefault('token_cache', False)
+        client = api.Client(url=fake_koku_server.url, authenticate=False, **kwargs)
+        client.login(KOKU_DEFAULT_USER, KOKU_DEFAULT_PASSWORD)
+        return client
+
+    return login
+
+
+@pytest.fixture
+def fake_koku_client(fake_koku_login):
+    """Client logged in to the fake Koku server as its service admin"""
+    return fake_koku_login()
+
+
 class HanseiBaseTestAPI(object):
     @pytest.fixture(scope='class')
     def config_crud_customer(self, customer_config):
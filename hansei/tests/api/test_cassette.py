@@ -0,0 +1,48 @@
+import zlib
+
+import pytest
+import requests
+
+from hansei import api, exceptions
+from hansei.cassette import Cassette
+
+
+def test_cassette_replay(tmpdir):
+    path = str(tmpdir.join('koku.cassette.gz'))
+    base_url = 'http://koku.example.com/api/v1/'
+
+    recorder = Cassette(path, mode='record', base_url=base_url)
+    for method, endpoint, params, body in [
+            ('POST', 'token-auth/', None, {'username': 'user', 'password': 'secret'}),
+            ('GET', 'reports/costs/', {'group_by[account]': '*', 'delta': 'total'}, None)]:
+        request = requests.Request(
+            method, base_url + endpoint, params=params, json=body).prepare()
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers['Content-Type'] = 'application/json'
+        response._content = (
+            b'{"token": "t0ps3cr3t"}' if body else b'{"data": [], "total": {"value": 1.5}}')
+        recorder.record(request, response)
+    recorder.close()
+
+    with open(path, 'rb') as cassette_file:
+        raw = cassette_file.read()
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    text = decompressor.decompress(raw)
+    assert not decompressor.unused_data, 'Cassette is not a single gzip stream'
+    assert b'secret' not in text and b't0ps3cr3t' not in text, 'Secrets were recorded'
+    with pytest.raises(exceptions.CassetteError):
+        recorder.record(request, response)
+
+    client = api.Client(
+        url='http://elsewhere:8000/api/v1/', authenticate=False,
+        cassette=Cassette(path, mode='replay', base_url='http://elsewhere:8000/api/v1/'))
+    client.login('user', 'another password')
+    assert client.token, 'Login was not replayed'
+
+    response = client.get('reports/costs/', params={'delta': 'total', 'group_by[account]': '*'})
+    assert response.json()['total']['value'] == 1.5, 'Unexpected replayed response'
+
+    with pytest.raises(exceptions.CassetteError):
+        client.get('reports/storage/')
@@ -1,5 +1,12 @@
+import asyncio
+import time
+import uuid
+
+from requests.exceptions import HTTPError
+
 from hansei import api, config
 
+
 def test_api_client():
     koku_cfg = config.get_config().get('koku', {})
 
@@ -13,3 +20,82 @@ def test_api_client():
 
     response = client.server_status()
     assert len(response.json()) > 0, 'Server status is unavailable'
+
+
+def test_api_client_connection_reuse():
+    koku_cfg = config.get_config().get('koku', {})
+
+    client = api.Client(
+        username=koku_cfg.get('username'), password=koku_cfg.get('password'), token_cache=False)
+    for _ in range(3):
+        client.server_status()
+
+    stats = client.connection_stats()
+    assert stats['requests'] == 4, 'Unexpected number of requests sent by the client'
+    assert stats['reused'] >= 3, 'Client did not reuse its kept-alive connection'
+
+
+
+def test_api_client_map():
+    koku_cfg = config.get_config().get('koku', {})
+
+    client = api.Client(
+        response_handler=api.json_handler,
+        username=koku_cfg.get('username'), password=koku_cfg.get('password'))
+
+    with client.batch() as batch:
+        user_index = batch.get('users/current/')
+        batch.get('customers/{}/'.format(uuid.uuid1()))
+        status_index = batch.get('status/')
+
+    assert batch.results[user_index]['username'] == koku_cfg['username'], (
+        'Current user does not match expected \'admin\' user')
+    assert isinstance(batch.results[1], HTTPError), (
+        'Failed request did not return its exception in place of the result')
+    assert len(batch.results[status_index]) > 0, 'Server status is unavailable'
+
+
+def test_async_api_client():
+    koku_cfg = config.get_config().get('koku', {})
+
+    client = api.AsyncClient(
+        response_handler=api.json_handler,
+        username=koku_cfg.get('username'), password=koku_cfg.get('password'))
+    assert client.token, 'No token provided after logging in'
+
+    async def get_user_and_status():
+        return await asyncio.gather(client.get_user(), client.server_status())
+
+    try:
+        user, status = asyncio.run(get_user_and_status())
+    finally:
+        client.close()
+
+    assert user['username'] == koku_cfg['username'], (
+        'Current user does not match expected \'admin\' user')
+    assert len(status) > 0, 'Server status is unavailable'
+
+
+def test_async_api_client_close(fake_koku_login):
+    client = fake_koku_login(response_handler=api.json_handler)
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def get_status_and_close():
+        ticker = asyncio.ensure_future(tick())
+        async with api.AsyncClient(client=client) as async_client:
+            status = await async_client.server_status()
+            # A request still running on the worker threads when the client closes
+            asyncio.ensure_future(async_client._run(time.sleep, 0.2))
+            await asyncio.sleep(0)
+            closing = len(ticks)
+        ticker.cancel()
+        return status, len(ticks) - closing
+
+    status, ticks_while_closing = asyncio.run(get_status_and_close())
+    assert len(status) > 0, 'Server status is unavailable'
+    assert ticks_while_closing > 1, 'Closing the client blocked the event loop'
@@ -0,0 +1,75 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from hansei.codec import NUMBER_MODES, get_codec
+from hansei.koku_models import KokuCostReport, KokuInstanceReport
+from hansei.query_matrix import QueryMatrix
+from hansei.rollup import ReportRollup
+
+
+def test_json_codec_fixed_point():
+    codec = get_codec('stdlib', numbers='fixed', scale=4)
+    report = codec.decode(json.dumps({
+        'meta': {'count': 2},
+        'filter': {'time_scope_value': -10, 'time_scope_units': 'day'},
+        'data': [{'date': '2018-08-01', 'values': [
+            {'total': 1.25, 'units': 'USD', 'count': 2},
+            {'total': 3, 'units': 'USD', 'count': 1}]}],
+        'total': {'value': 4.25, 'units': 'USD', 'count': 3},
+    }))
+    assert report['meta']['count'] == 2, 'Pagination count decoded as fixed point'
+    assert report['filter']['time_scope_value'] == -10, 'Filter value decoded as fixed point'
+    values = report['data'][0]['values']
+    assert [item['total'] for item in values] == [12500, 30000], 'Unexpected fixed-point amounts'
+    assert [item['count'] for item in values] == [2, 1], 'Line item counts decoded as fixed point'
+    assert report['total']['value'] == 42500 and report['total']['count'] == 3, (
+        'Unexpected report total')
+    assert codec.sum(item['total'] for item in values) == codec.number(report['total']['value']), (
+        'Sum of the amounts is not equal to the total')
+
+    # Amounts computed locally are not fixed point
+    assert codec.sum([12500, Decimal('1.5'), 0.25]) == Decimal('3'), 'Unexpected mixed sum'
+    assert codec.amounts(report['total']) == {
+        'value': Decimal('4.25'), 'units': 'USD', 'count': 3}, 'Unexpected decoded amounts'
+    decimal_codec = get_codec('stdlib', numbers='decimal')
+    assert decimal_codec.sum([Decimal('1.5'), 0.25, 1]) == Decimal('2.75'), (
+        'Amounts not decoded by the codec are not summed')
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=40)
+@pytest.mark.parametrize('numbers', NUMBER_MODES)
+def test_report_validation_numeric_modes(fake_koku_login, numbers):
+    """The report validation tests pass whatever numeric mode decodes the reports."""
+    client = fake_koku_login(codec=get_codec('stdlib', numbers=numbers))
+    daily = {'resolution': 'daily', 'time_scope_value': -10, 'time_scope_units': 'day'}
+    monthly = {'resolution': 'monthly', 'time_scope_value': -1, 'time_scope_units': 'month'}
+    group_by = [['account', '*'], ['service', '*']]
+
+    matrix = QueryMatrix([client])
+    for report_class in (KokuCostReport, KokuInstanceReport):
+        for report_filter in (daily, monthly):
+            for result in matrix.results(
+                    report_class, report_filter=report_filter, group_by=group_by).values():
+                report = result.report
+                assert report.total['value'] - 1 <= result.total <= report.total['value'] + 1, (
+                    'Report total is not equal to the sum of its line items')
+                if numbers == 'fixed':
+                    line_items = report.report_line_items()
+                    assert all(isinstance(item['total'], Decimal) for item in line_items), (
+                        'Fixed-point amounts returned by the report')
+
+        report = report_class(client)
+        streamed_sum = report.stream_total(report_filter=daily, group_by=group_by)
+        streamed_total = report.total
+        report.get(report_filter=daily, group_by=group_by)
+        assert streamed_sum == report.calculate_total(), (
+            'Streamed sum is not equal to the sum of the line items')
+        assert streamed_total == report.total, (
+            'Streamed report total is not equal to the report total')
+
+        rollup = ReportRollup(report_class, client)
+        for report_filter in (daily, monthly):
+            rollup.add(report_filter=report_filter, group_by=group_by)
+        assert rollup.verify(sample_size=2) == [], 'Derived reports differ from the server reports'
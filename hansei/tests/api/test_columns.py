@@ -0,0 +1,29 @@
+import json
+from decimal import Decimal
+
+from hansei import api, synthetic
+from hansei.codec import get_codec
+from hansei.koku_models import KokuCostReport
+
+
+def test_report_columns():
+    codec = get_codec('stdlib', numbers='decimal')
+    report = KokuCostReport(client=api.Client(authenticate=False, token_cache=False, codec=codec))
+    report.last_report = codec.decode(json.dumps(synthetic.generate_report(
+        'costs', accounts=3, services=4, days=5, group_by=['account', 'service'])))
+
+    columns = report.to_columns(fixed_point=True, scale=4)
+    assert len(columns) == 3 * 4 * 5, 'Unexpected number of rows'
+    assert columns.sum() == report.calculate_total(), (
+        'Fixed-point column total is not equal to the sum of the line items')
+
+    by_account = columns.group_sum('account')
+    assert len(by_account) == 3 and sum(by_account.values()) == columns.sum(), (
+        'Account subtotals do not add up to the total')
+    for date, total in columns.daily_totals().items():
+        assert total == sum(
+            (item['total'] for item in report.report_line_items() if item['date'] == date),
+            Decimal(0)), 'Unexpected total for {}'.format(date)
+
+    assert abs(report.to_columns().sum() - columns.sum()) < Decimal('0.0001'), (
+        'Float column total differs from the fixed-point total')
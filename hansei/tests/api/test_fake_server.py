@@ -0,0 +1,34 @@
+import pytest
+
+from hansei.koku_models import KokuCostReport, KokuInstanceReport
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=40)
+def test_fake_koku_server(fake_koku_client):
+    client = fake_koku_client
+    assert client.token, 'No token assigned after login to the fake server'
+    assert client.server_status().json()['api_version'], 'No api version in the status'
+
+    client.post('customers/', {
+        'name': 'Fake customer',
+        'owner': {'username': 'owner', 'email': 'owner@example.com', 'password': 'pass'}})
+    client.login('owner', 'pass')
+
+    report = KokuCostReport(client)
+    report.get(
+        report_filter={'resolution': 'daily', 'time_scope_value': -30, 'time_scope_units': 'day'},
+        group_by=[['account', '*'], ['service', '*']])
+    assert len(report.data) == 30, 'Unexpected number of days in the report'
+    assert len(report.report_line_items()) == 30 * 2 * 3, 'Unexpected number of line items'
+    assert abs(report.total['value'] - float(report.calculate_total())) < 0.01, (
+        'Report total is not equal to the sum of daily costs')
+
+    # Instance types are grouped by service as the other reports are
+    report = KokuInstanceReport(client)
+    report.get(
+        report_filter={'resolution': 'daily', 'time_scope_value': -10, 'time_scope_units': 'day'},
+        group_by=[['service', '*'], ['account', '*']])
+    assert set(item['service'] for item in report.report_line_items()) == {'AmazonEC2'}, (
+        'Unexpected instance services')
+    assert abs(report.total['value'] - float(report.calculate_total())) < 0.01, (
+        'Report total is not equal to the sum of instance hours')
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+import pytest
+from requests.exceptions import HTTPError
+
+from hansei import api
+from hansei.fanout import fan_out, latency_report
+from hansei.koku_models import KokuCostReport
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=20)
+def test_fan_out(fake_koku_server, fake_koku_login):
+    report_filter = {'resolution': 'daily', 'time_scope_value': -10, 'time_scope_units': 'day'}
+    group_by = [['account', '*']]
+    clients = OrderedDict((name, fake_koku_login()) for name in ('first', 'second', 'third'))
+
+    requests_before = fake_koku_server.koku.requests
+    results = fan_out(KokuCostReport, clients, report_filter=report_filter, group_by=group_by)
+    assert list(results) == list(clients), 'Results are not in customer order'
+    assert fake_koku_server.koku.requests - requests_before == 3, (
+        'Unexpected number of report requests')
+    for result in results.values():
+        assert result.error is None, 'Unexpected error'
+        assert result.latency > 0, 'Latency not measured'
+        assert abs(float(result.total) - result.report.total['value']) < 1e-6, (
+            'Report total is not equal to the sum of its line items')
+
+    # A client that is not logged in fails
+    clients['second'] = api.Client(url=fake_koku_server.url, authenticate=False, token_cache=False)
+    results = fan_out(
+        KokuCostReport, list(clients.values()), report_filter=report_filter,
+        group_by=group_by, raise_errors=False)
+    assert [result.error is not None for result in results.values()] == [False, True, False], (
+        'Unexpected errors')
+    table = latency_report(results).splitlines()
+    assert len(table) == 4 and 'HTTPError' in latency_report(results), (
+        'Unexpected latency report')
+
+    with pytest.raises(HTTPError):
+        fan_out(KokuCostReport, clients, report_filter=report_filter, group_by=group_by)
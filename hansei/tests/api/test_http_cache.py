@@ -0,0 +1,17 @@
+from hansei.http_cache import ResponseCache
+
+
+def test_http_cache_key():
+    url = 'http://koku/api/v1/reports/costs/'
+    key = ResponseCache.key('GET', url, {'filter[resolution]': 'daily', 'group_by[account]': ['*']}, 'token')
+
+    assert key == ResponseCache.key(
+        'get', url + '?group_by[account]=*', {'filter[resolution]': 'daily'}, 'token'), (
+            'Equivalent requests do not share the same cache key')
+    assert key != ResponseCache.key(
+        'GET', url, {'filter[resolution]': 'daily', 'group_by[account]': ['*']}, 'other'), (
+            'Requests from different users share the same cache key')
+    assert ResponseCache.key(
+        'GET', url, [('group_by[account]', '*'), ('group_by[service]', '*')]) != ResponseCache.key(
+        'GET', url, [('group_by[service]', '*'), ('group_by[account]', '*')]), (
+            'Requests with different group_by nesting share the same cache key')
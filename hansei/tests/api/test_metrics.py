@@ -0,0 +1,23 @@
+import uuid
+
+from hansei import metrics
+
+
+def test_request_metrics():
+    base_url = 'http://koku/api/v1/'
+    path = metrics.template_path(
+        base_url + 'users/{}/preferences/42/'.format(uuid.uuid4()), base_url)
+    assert path == 'users/{uuid}/preferences/{id}/', 'Path identifiers were not templated'
+
+    aggregator = metrics.MetricsAggregator()
+    for latency in range(1, 101):
+        aggregator(metrics.RequestEvent(
+            method='GET', path=path, url=base_url, status=500 if latency > 90 else 200,
+            request_bytes=0, response_bytes=10, latency=latency, attempts=1,
+            cache_hit=False, limiter_wait=0.0, error=None))
+
+    summary = aggregator.summary()[('GET', path)]
+    assert summary['count'] == 100 and summary['error_rate'] == 0.1, (
+        'Unexpected request count or error rate')
+    assert (summary['p50'], summary['p95'], summary['p99']) == (50, 95, 99), (
+        'Unexpected latency percentiles')
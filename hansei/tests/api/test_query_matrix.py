@@ -0,0 +1,61 @@
+import pytest
+
+from hansei.koku_models import KokuCostReport
+from hansei.query_matrix import QueryMatrix
+from hansei.report_cache import ReportCache
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=40)
+def test_query_matrix(fake_koku_server, fake_koku_login):
+    daily = {'resolution': 'daily', 'time_scope_value': -10, 'time_scope_units': 'day'}
+    monthly = {'resolution': 'monthly', 'time_scope_value': -1, 'time_scope_units': 'month'}
+    query_params = [
+        (None, None),
+        (daily, [['account', '*']]),
+        (daily, [['account', '*'], ['service', '*']]),
+        (daily, [['service', '*'], ['account', '*']]),
+        (monthly, [['account', '*'], ['service', '*']]),
+        (monthly, [['service', '*'], ['account', '*']]),
+    ]
+    clients = [fake_koku_login(report_cache=ReportCache()) for _ in range(2)]
+
+    matrix = QueryMatrix(clients)
+    for report_filter, group_by in query_params:
+        matrix.add(KokuCostReport, report_filter=report_filter, group_by=group_by)
+        matrix.add(KokuCostReport, report_filter=report_filter, group_by=group_by)
+    assert len(matrix) == 4, 'Swapped group_by orders not deduplicated'
+
+    requests_before = fake_koku_server.koku.requests
+    assert matrix.execute() == 4 * 2, 'Unexpected number of reports fetched'
+    assert matrix.execute() == 0, 'Reports fetched twice'
+
+    swapped = matrix.results(KokuCostReport, report_filter=daily, group_by=query_params[3][1])
+    results = matrix.results(KokuCostReport, report_filter=daily, group_by=query_params[2][1])
+    assert swapped is results, 'Equivalent queries do not share their results'
+    assert list(results) == [0, 1], 'Results are not in customer order'
+    for result in results.values():
+        assert abs(float(result.total) - result.report.total['value']) < 1e-6, (
+            'Report total is not equal to the sum of its line items')
+
+    # Queries missing from the matrix are fetched when first asked for
+    matrix.results(KokuCostReport, report_filter=monthly)
+    assert fake_koku_server.koku.requests - requests_before == 5 * 2, (
+        'Unexpected number of report requests')
+    assert matrix.stats() == {'added': 13, 'queries': 5, 'fetched': 10}, (
+        'Unexpected matrix counters')
+    table = matrix.latency_report()
+    assert table.count('KokuCostReport') == 5 and len(table.splitlines()) == 5 * 5 - 1, (
+        'Unexpected latency report')
+    summary = matrix.latency_summary(slowest=3).splitlines()
+    assert len(summary) == 1 + 3 + 1 and summary[-1] == '... 2 faster queries', (
+        'Unexpected latency summary')
+
+    # The non-canonical group order is only fetched by check_group_order
+    assert matrix.check_group_order(
+        KokuCostReport, report_filter=daily, group_by=query_params[3][1]) == [], (
+        'Report in the requested group order differs from the canonical report')
+    data = fake_koku_server.koku.data
+    data.day_rows('usage', data.end_date)[0]['cost'] += 100
+    assert len(matrix.check_group_order(
+        KokuCostReport, report_filter=monthly, group_by=query_params[5][1])) == 2, (
+        'Changed line item not reported for every customer')
@@ -0,0 +1,37 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hansei.ratelimit import RateLimiter, shared_limiter
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(
+        requests_per_second=1000, max_in_flight=4,
+        prefixes={'reports/': {'max-in-flight': 2}})
+
+    def send(path):
+        with limiter.acquire(path):
+            time.sleep(0.05)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(send, ['reports/costs/'] * 6 + ['status/'] * 6))
+
+    stats = limiter.stats()
+    assert stats['reports/']['peak_in_flight'] <= 2, 'Report requests exceeded their limit'
+    assert stats['*']['peak_in_flight'] <= 4, 'Requests exceeded the server limit'
+    assert stats['*']['requests'] == 12 and stats['reports/']['requests'] == 6, (
+        'Unexpected number of limited requests')
+    assert stats['reports/']['total_wait'] > 0, 'No wait time recorded for throttled requests'
+
+
+def test_shared_limiter():
+    cfg = {'requests-per-second': 10}
+    limiter = shared_limiter('http://shared-limiter:8000/api/v1/', cfg)
+    assert shared_limiter('http://shared-limiter:8000/api/v2/', dict(cfg)) is limiter, (
+        'Limiter not shared by the clients of the same server')
+
+    with pytest.warns(UserWarning, match='rate-limit'):
+        other = shared_limiter('http://shared-limiter:8000/api/v1/', {'requests-per-second': 1})
+    assert other is limiter, 'Limiter not shared after a different configuration'
@@ -0,0 +1,37 @@
+import pytest
+
+from hansei.koku_models import KokuCostReport
+from hansei.report_cache import ReportCache
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=20)
+def test_report_cache(fake_koku_server, fake_koku_login):
+    report_cache = ReportCache(max_entries=2)
+    report_filter = {'resolution': 'daily', 'time_scope_value': -10, 'time_scope_units': 'day'}
+    client = fake_koku_login(report_cache=report_cache)
+
+    report = KokuCostReport(client)
+    report.get(report_filter=report_filter, group_by=[['account', '*']])
+    line_items = report.report_line_items()
+    requests_sent = fake_koku_server.koku.requests
+
+    # Same query with the filter values given in another form
+    cached_report = KokuCostReport(client)
+    cached_report.get(
+        report_filter={'time_scope_units': 'day', 'time_scope_value': '-10', 'resolution': 'daily'},
+        group_by=[['account', '*']])
+    assert fake_koku_server.koku.requests == requests_sent, 'Cached report fetched again'
+    assert cached_report.last_report is report.last_report, 'Cached report not served'
+    assert cached_report.report_line_items() is line_items, 'Cached line items not served'
+
+    cached_report.get(report_filter=report_filter, group_by=[['account', '*']], use_cache=False)
+    assert fake_koku_server.koku.requests == requests_sent + 1, (
+        'Report not fetched with use_cache=False')
+
+    # The least recently used report is evicted by the third one
+    report.get(report_filter=report_filter, group_by=[['service', '*']])
+    report.get(report_filter=dict(report_filter, time_scope_value=-5))
+    report.get(report_filter=report_filter, group_by=[['account', '*']])
+    assert fake_koku_server.koku.requests == requests_sent + 4, 'Evicted report not fetched again'
+    assert report_cache.stats() == {'entries': 2, 'hits': 1, 'misses': 4, 'evictions': 2}, (
+        'Unexpected report cache counters')
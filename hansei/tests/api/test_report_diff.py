@@ -0,0 +1,38 @@
+import pytest
+
+from hansei.koku_models import KokuCostReport
+from hansei.report_diff import ReportTree, diff_reports
+from hansei.snapshot import Snapshot, write_snapshot
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=20)
+def test_report_diff(tmpdir, fake_koku_server, fake_koku_client):
+    def get_report(time_scope_value):
+        report = KokuCostReport(fake_koku_client)
+        report.get(
+            report_filter={'resolution': 'daily', 'time_scope_value': time_scope_value,
+                           'time_scope_units': 'day'},
+            group_by=[['account', '*'], ['service', '*']])
+        return report
+
+    old_report = get_report(-10)
+    longer_report = get_report(-11)
+    data = fake_koku_server.koku.data
+    data.day_rows('usage', data.end_date)[4]['cost'] += 1
+    new_report = get_report(-10)
+
+    path = str(tmpdir.join('costs.snap'))
+    write_snapshot(path, old_report)
+    with Snapshot(path) as snapshot:
+        assert ReportTree.from_report(snapshot).hash == ReportTree.from_report(old_report).hash, (
+            'Snapshot and report hashes differ')
+        changes = diff_reports(snapshot, new_report)
+
+    assert [change.change for change in changes] == ['changed'], 'Unexpected changes'
+    change = changes[0]
+    assert dict(change.group_path)['date'] == new_report.data[-1]['date'], 'Unexpected change date'
+    assert change.new_total - change.old_total == 1, 'Unexpected change totals'
+
+    changes = diff_reports(old_report, longer_report)
+    assert [change.change for change in changes] == ['added'] * 2 * 3, 'Unexpected changes'
+    assert not diff_reports(old_report, old_report), 'Changes found in the same report'
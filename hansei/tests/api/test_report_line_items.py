@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from hansei import api, synthetic
+from hansei.koku_models import KokuCostReport
+from hansei.streaming import ReportStream
+
+
+def test_report_line_items():
+    report = KokuCostReport(client=api.Client(authenticate=False, token_cache=False))
+    report.last_report = synthetic.generate_report(
+        'costs', accounts=3, services=4, days=5, group_by=['account', 'service'])
+
+    line_items = list(report.iter_line_items())
+    assert len(line_items) == 3 * 4 * 5, 'Unexpected number of line items'
+    for group_path, line_item in line_items:
+        assert [key for key, _ in group_path] == ['date', 'account', 'service'], (
+            'Unexpected group path {}'.format(group_path))
+        assert dict(group_path)['service'] == line_item['service'], (
+            'Group path does not match the line item')
+
+    assert report.report_line_items() == [line_item for _, line_item in line_items], (
+        'Listed line items differ from the iterated line items')
+    assert abs(report.calculate_total() - report._sum(
+        line_item['total'] for _, line_item in line_items)) == 0, (
+        'Total differs from the sum of the iterated line items')
+
+    # Deeply nested data must not exceed the recursion limit
+    deep_data = {'values': [{'total': 1}]}
+    for _ in range(5000):
+        deep_data = [deep_data]
+    report.last_report = {'data': deep_data}
+    report._clear_report_cache()
+    assert report.calculate_total() == 1, 'Unexpected total of deeply nested data'
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=5)
+def test_report_line_items_stream(fake_koku_client):
+    report = KokuCostReport(fake_koku_client)
+    report_filter = {'resolution': 'daily', 'time_scope_value': -5, 'time_scope_units': 'day'}
+    group_by = [['account', '*'], ['service', '*']]
+    streamed = list(report.stream(report_filter=report_filter, group_by=group_by))
+    report.get(report_filter=report_filter, group_by=group_by)
+    assert streamed == list(report.iter_line_items()), (
+        'Streamed line items differ from the iterated line items')
+
+    # Fields following the line items are not part of their group path
+    document = json.dumps({'data': [{
+        'account': '1234',
+        'services': [{'service': 'AmazonEC2', 'values': [{'total': 1}], 'units': 'USD'}],
+        'date': '2018-08-01'}]})
+    report.last_report = json.loads(document)
+    report._clear_report_cache()
+    expected = [((('account', '1234'), ('service', 'AmazonEC2')), {'total': 1})]
+    assert list(ReportStream([document[:40], document[40:]])) == expected, (
+        'Unexpected streamed group path')
+    assert list(report.iter_line_items()) == expected, 'Unexpected iterated group path'
@@ -0,0 +1,29 @@
+import pytest
+
+from hansei.report_query import ReportQuery
+
+
+def test_report_query():
+    query = ReportQuery(
+        report_filter={'time_scope_value': -10, 'time_scope_units': 'day', 'resolution': 'daily'},
+        group_by=[['account', '*'], ['service', '*']], order_by=['cost', 'desc'])
+    same_query = ReportQuery(
+        resolution='daily', time_scope_units='day', time_scope_value='-10',
+        group_by=[('account', '*'), ('service', '*')]).order('cost', 'desc')
+    assert query == same_query and hash(query) == hash(same_query), (
+        'Equivalent queries are not equal')
+    assert query != query.regroup([['service', '*'], ['account', '*']]), (
+        'Queries grouped in another order are equal')
+
+    assert query.params == (
+        ('filter[resolution]', 'daily'), ('filter[time_scope_units]', 'day'),
+        ('filter[time_scope_value]', '-10'), ('group_by[account]', '*'),
+        ('group_by[service]', '*'), ('order_by[cost]', 'desc')), 'Unexpected query params'
+    assert ReportQuery.from_params(query.params) == query, 'Query not rebuilt from its params'
+    assert ReportQuery.from_params(str(query)) == query, 'Query not rebuilt from its query string'
+    assert query.time_scope_value == -10 and query.group_keys == ('account', 'service'), (
+        'Unexpected query properties')
+    assert query.filter(time_scope_value=None).time_scope_value is None, 'Filter not removed'
+
+    with pytest.raises(AttributeError):
+        query.order_by = None
@@ -0,0 +1,62 @@
+import pytest
+
+from hansei import exceptions
+from hansei.koku_models import KokuCostReport, KokuInstanceReport
+
+
+REPORT_FILTER = {'resolution': 'daily', 'time_scope_value': -30, 'time_scope_units': 'day'}
+
+GROUP_BY = [['account', '*'], ['service', '*']]
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=40)
+def test_report_refresh(fake_koku_server, fake_koku_client):
+    report = KokuCostReport(fake_koku_client)
+    report.get(report_filter=REPORT_FILTER, group_by=GROUP_BY)
+    first_day = report.data[0]
+    data = fake_koku_server.koku.data
+    data.day_rows('usage', data.end_date)[0]['cost'] += 100
+
+    requests_sent = fake_koku_server.koku.requests
+    report.refresh(days=2)
+    assert fake_koku_server.koku.requests == requests_sent + 1, 'Unexpected number of requests'
+    assert report.data[0] is first_day, 'Past days were not kept'
+
+    expected = KokuCostReport(fake_koku_client)
+    expected.get(report_filter=REPORT_FILTER, group_by=GROUP_BY)
+    assert report.data == expected.data, 'Refreshed data differs from the report data'
+    assert abs(report.total['value'] - expected.total['value']) < 1e-6, (
+        'Refreshed total differs from the report total')
+
+    # Counts do not add up across days
+    report = KokuInstanceReport(fake_koku_client)
+    report.get(report_filter=REPORT_FILTER, group_by=GROUP_BY)
+    report.refresh(days=2)
+    assert 'count' not in report.total, 'Count of several days updated incrementally'
+    report.refresh(days=30)
+    expected = KokuInstanceReport(fake_koku_client)
+    expected.get(report_filter=REPORT_FILTER, group_by=GROUP_BY)
+    assert report.total.get('count') == expected.total.get('count'), (
+        'Count of a fully refreshed report differs from the report count')
+    assert abs(report.total['value'] - expected.total['value']) < 1e-6, (
+        'Refreshed total differs from the report total')
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=40)
+def test_report_refresh_without_date_range(fake_koku_client):
+    client = fake_koku_client
+    report = KokuCostReport(client)
+    report.get(report_filter=REPORT_FILTER, group_by=GROUP_BY)
+
+    # A server ignoring the date range answers with its default time scope
+    get = client.get
+
+    def get_without_dates(endpoint, params=None, **kwargs):
+        params = [(name, value) for name, value in params if name not in ('start_date', 'end_date')]
+        return get(endpoint, params=params, **kwargs)
+
+    client.get = get_without_dates
+    total = report.total
+    with pytest.raises(exceptions.ReportConsistencyError):
+        report.refresh(days=2)
+    assert report.total is total, 'Report updated with the default time scope'
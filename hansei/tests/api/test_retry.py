@@ -0,0 +1,27 @@
+from requests import Response
+from requests.exceptions import ConnectionError
+
+from hansei.retry import RetryPolicy
+
+
+def test_retry_policy():
+    policy = RetryPolicy(max_attempts=3, backoff_base=1, backoff_cap=4)
+
+    assert policy.should_retry('GET', 1, exception=ConnectionError()), (
+        'Connection errors on idempotent requests should be retried')
+    assert not policy.should_retry('POST', 1, exception=ConnectionError()), (
+        'POST requests should not be retried unless explicitly allowed')
+    assert policy.allowing('POST').should_retry('POST', 1, exception=ConnectionError()), (
+        'POST requests should be retried when explicitly allowed')
+    assert not policy.should_retry('GET', 3, exception=ConnectionError()), (
+        'Requests should not be retried after the maximum number of attempts')
+
+    for attempt in range(1, 6):
+        assert 0 <= policy.backoff(attempt) <= min(4, 2 ** (attempt - 1)), (
+            'Backoff delay is outside of the jitter window')
+
+    response = Response()
+    response.headers['Retry-After'] = '2'
+    assert policy.delay(1, response) == 2, 'Retry-After delay is not honored'
+    response.headers['Retry-After'] = '3600'
+    assert policy.delay(1, response) == 4, 'Retry-After delay is not capped'
@@ -0,0 +1,52 @@
+import pytest
+
+from hansei.koku_models import KokuCostReport, KokuInstanceReport
+from hansei.rollup import ReportRollup
+
+
+@pytest.mark.fake_koku(accounts=3, services=4, days=70)
+def test_report_rollup(fake_koku_server, fake_koku_client):
+    rollup = ReportRollup(KokuCostReport, fake_koku_client)
+    for time_scope_value, time_scope_units in ((-10, 'day'), (-1, 'month'), (-2, 'month')):
+        for resolution in ('daily', 'monthly'):
+            for group_by in ([['account', '*']], [['service', '*'], ['account', '*']]):
+                rollup.add(
+                    report_filter={'resolution': resolution, 'time_scope_value': time_scope_value,
+                                   'time_scope_units': time_scope_units},
+                    group_by=group_by)
+    requests_sent = fake_koku_server.koku.requests
+    assert rollup.fetch() == 1, 'Unexpected number of base reports'
+
+    report = rollup.report(
+        report_filter={'resolution': 'monthly', 'time_scope_value': -2, 'time_scope_units': 'month'},
+        group_by=[['service', '*'], ['account', '*']])
+    assert [len(entry['services']) for entry in report.data] == [4, 4], (
+        'Unexpected number of services per month')
+    assert fake_koku_server.koku.requests == requests_sent + 1, (
+        'Derived report fetched from the server')
+    assert rollup.verify(sample_size=len(rollup.queries)) == [], (
+        'Derived reports differ from the server reports')
+
+
+@pytest.mark.fake_koku(accounts=3, services=4, days=70)
+def test_instance_report_rollup(fake_koku_client):
+    # Instance counts do not add up across days
+    daily = {'resolution': 'daily', 'time_scope_value': -10, 'time_scope_units': 'day'}
+    monthly = {'resolution': 'monthly', 'time_scope_value': -1, 'time_scope_units': 'month'}
+    rollup = ReportRollup(KokuInstanceReport, fake_koku_client)
+    for report_filter in (daily, monthly):
+        rollup.add(report_filter=report_filter, group_by=[['account', '*']])
+    monthly_report = rollup.report(report_filter=monthly, group_by=[['account', '*']])
+    assert 'count' not in monthly_report.total and not any(
+        'count' in item for item in monthly_report.report_line_items()), (
+        'Counts summed across days')
+    assert rollup.verify(sample_size=2) == [], 'Derived reports differ from the server reports'
+
+    rollup = ReportRollup(KokuInstanceReport, fake_koku_client)
+    rollup.add(report_filter=daily, group_by=[['account', '*']])
+    rollup.add(report_filter=dict(daily, time_scope_value=-5), group_by=[['account', '*']])
+    rollup.fetch()
+    base_report = list(rollup.bases.values())[0]
+    list(base_report.iter_line_items())[-1][1]['count'] += 1
+    assert set(mismatch.member for mismatch in rollup.verify(sample_size=2)) == {'count'}, (
+        'Wrong derived counts not reported')
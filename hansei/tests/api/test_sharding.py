@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+
+from hansei import exceptions
+from hansei.koku_models import KokuCostReport, KokuInstanceReport
+from hansei.report_query import ReportQuery
+from hansei.sharding import merge_reports, shard_query
+
+
+def test_shard_query():
+    report_filter = {'resolution': 'monthly', 'time_scope_value': -2, 'time_scope_units': 'month'}
+    shards = shard_query(ReportQuery(report_filter), 40, end_date=datetime.date(2018, 3, 10))
+    assert [shard.date_range for shard in shards] == [
+        ('2018-02-01', '2018-02-28'), ('2018-03-01', '2018-03-10')], 'Unexpected monthly shards'
+
+
+def test_merge_reports():
+    reports = [
+        {'data': [{'date': '2018-08-01'}], 'total': {'value': 2, 'units': 'Hrs', 'count': 3}},
+        {'data': [{'date': '2018-08-02'}], 'total': {'value': 5, 'units': 'Hrs', 'count': 4}},
+    ]
+    assert merge_reports(reports[:1])['total'] == reports[0]['total'], (
+        'Unexpected total of a single shard')
+    assert merge_reports(reports)['total'] == {'value': 7, 'units': 'Hrs'}, (
+        'Counts of several days were summed')
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=70)
+def test_sharded_report(fake_koku_server, fake_koku_client):
+    report_filter = {'resolution': 'daily', 'time_scope_value': -2, 'time_scope_units': 'month'}
+    group_by = [['account', '*'], ['service', '*']]
+
+    report = KokuCostReport(fake_koku_client)
+    report.get(report_filter=report_filter, group_by=group_by)
+    sharded_report = KokuCostReport(fake_koku_client)
+    requests_sent = fake_koku_server.koku.requests
+    sharded_report.get(report_filter=report_filter, group_by=group_by, shard_days=10)
+
+    days = len(report.data)
+    assert fake_koku_server.koku.requests == requests_sent + (days + 9) // 10 + 1, (
+        'Unexpected number of shards fetched')
+    assert sharded_report.data == report.data, 'Merged data differs from the report data'
+    assert sharded_report.filter == report.filter, 'Merged filter differs from the report filter'
+    assert abs(sharded_report.total['value'] - report.total['value']) < 1e-6, (
+        'Merged total differs from the report total')
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=40)
+def test_sharded_report_without_date_range(fake_koku_client):
+    client = fake_koku_client
+
+    # A server ignoring the date range answers with its default time scope
+    request = client.request
+
+    def request_without_dates(method, url, params=None, **kwargs):
+        params = [(name, value) for name, value in params if name not in ('start_date', 'end_date')]
+        return request(method, url, params=params, **kwargs)
+
+    client.request = request_without_dates
+    report = KokuInstanceReport(client)
+    with pytest.raises(exceptions.ReportConsistencyError):
+        report.get(
+            report_filter={'resolution': 'daily', 'time_scope_value': -30,
+                           'time_scope_units': 'day'},
+            shard_days=10, check_total=False)
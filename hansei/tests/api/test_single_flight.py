@@ -0,0 +1,51 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hansei.single_flight import SingleFlight
+
+
+def test_single_flight():
+    single_flight = SingleFlight()
+    started = threading.Event()
+
+    def fetch():
+        started.set()
+        time.sleep(0.2)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(single_flight.do, 'report', fetch)
+        started.wait()
+        waiters = [executor.submit(single_flight.do, 'report', fetch) for _ in range(3)]
+        results = [leader.result()] + [waiter.result() for waiter in waiters]
+
+    assert all(result is results[0] for result in results), (
+        'Coalesced callers did not receive the same result')
+    assert single_flight.stats() == {'executed': 1, 'collapsed': 3, 'in_flight': 0}, (
+        'Unexpected number of executed and collapsed calls')
+
+
+@pytest.mark.fake_koku(latency=0.2)
+def test_client_single_flight(fake_koku_login):
+    client = fake_koku_login()
+
+    def send_concurrently(*calls):
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            futures = []
+            for kwargs in calls:
+                futures.append(executor.submit(client.get, 'status/', **kwargs))
+                time.sleep(0.05)
+            return [future.result() for future in futures]
+
+    executed = client.single_flight.stats()['executed']
+    send_concurrently({}, {})
+    assert client.single_flight.stats()['executed'] == executed + 1, (
+        'Identical requests were not coalesced')
+
+    stats = client.single_flight.stats()
+    send_concurrently({'timeout': 5}, {'timeout': 10}, {'params': {'limit': 1}}, {})
+    assert client.single_flight.stats()['collapsed'] == stats['collapsed'], (
+        'Requests differing by their arguments were coalesced')
@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+import pytest
+
+from hansei import exceptions
+from hansei.koku_models import KokuCostReport
+from hansei.snapshot import Snapshot, write_snapshot
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=20)
+def test_report_snapshot(tmpdir, fake_koku_client):
+    report = KokuCostReport(fake_koku_client)
+    report.get(
+        report_filter={'resolution': 'daily', 'time_scope_value': -10, 'time_scope_units': 'day'},
+        group_by=[['account', '*'], ['service', '*']])
+
+    path = str(tmpdir.join('costs.snap'))
+    assert write_snapshot(path, report, metadata={'commit': 'abc'}) == 10 * 2 * 3, (
+        'Unexpected number of line items written')
+
+    columns = report.to_columns(fixed_point=True)
+    with Snapshot(path) as snapshot:
+        assert snapshot.query == report.last_query, 'Unexpected snapshot query'
+        assert snapshot.metadata == {'commit': 'abc'}, 'Unexpected snapshot metadata'
+        assert snapshot.calculate_total() == columns.sum(), 'Unexpected snapshot total'
+        assert snapshot.to_columns().group_sum('service') == columns.group_sum('service'), (
+            'Unexpected snapshot subtotals')
+        assert abs(snapshot.total['value'] - Decimal(report.total['value'])) < Decimal('1e-6'), (
+            'Unexpected snapshot report total')
+
+        line_items = list(snapshot.iter_line_items())
+        assert [path for path, _ in line_items] == [path for path, _ in report.iter_line_items()], (
+            'Unexpected snapshot group paths')
+        first_item = next(report.iter_line_items())[1]
+        assert line_items[0][1]['total'] == Decimal(str(first_item['total'])), (
+            'Unexpected snapshot line item total')
+
+    with pytest.raises(exceptions.SnapshotError):
+        Snapshot(__file__)
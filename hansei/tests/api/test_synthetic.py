@@ -0,0 +1,56 @@
+import io
+import json
+
+import pytest
+
+from hansei import synthetic
+from hansei.koku_models import KokuInstanceReport
+from hansei.rollup import ReportRollup
+from hansei.streaming import ReportStream
+
+
+def test_synthetic_report():
+    report = synthetic.generate_report(
+        'costs', accounts=3, services=4, days=5, group_by=['service', 'account'])
+    assert [len(entry['services']) for entry in report['data']] == [4] * 5, (
+        'Unexpected number of services per day')
+
+    output = io.StringIO()
+    line_items = synthetic.write_report(
+        output, 'costs', accounts=3, services=4, days=5, group_by=['service', 'account'])
+    assert line_items == 3 * 4 * 5, 'Unexpected number of line items written'
+    assert json.loads(output.getvalue()) == json.loads(json.dumps(report)), (
+        'Streamed report differs from the generated report')
+
+    stream = ReportStream([output.getvalue()])
+    assert abs(sum(item['total'] for _, item in stream) - report['total']['value']) < 1e-6, (
+        'Report total is not equal to the sum of its line items')
+
+
+@pytest.mark.fake_koku(accounts=2, services=3, days=40)
+def test_synthetic_instance_counts(fake_koku_client):
+    group_by = [['account', '*'], ['instance_type', '*']]
+    rollup = ReportRollup(KokuInstanceReport, fake_koku_client)
+    for report_filter in (
+            {'resolution': 'daily', 'time_scope_value': -1, 'time_scope_units': 'day'},
+            {'resolution': 'daily', 'time_scope_value': -10, 'time_scope_units': 'day'},
+            {'resolution': 'monthly', 'time_scope_value': -1, 'time_scope_units': 'month'}):
+        report = KokuInstanceReport(fake_koku_client)
+        report.get(report_filter=report_filter, group_by=group_by)
+        sharded_report = KokuInstanceReport(fake_koku_client)
+        sharded_report.get(report_filter=report_filter, group_by=group_by, shard_days=3)
+
+        single_day = len(report.data) == 1 and report_filter['resolution'] == 'daily'
+        assert ('count' in report.total) == single_day, (
+            'Unexpected total count for {}'.format(report_filter))
+        assert sharded_report.total.get('count') == report.total.get('count'), (
+            'Sharded total count differs for {}'.format(report_filter))
+        assert abs(sharded_report.total['value'] - report.total['value']) < 1e-6, (
+            'Sharded total differs for {}'.format(report_filter))
+        assert all(
+            ('count' in item) == (report_filter['resolution'] == 'daily')
+            for item in report.report_line_items()), (
+            'Unexpected line item counts for {}'.format(report_filter))
+        rollup.add(report_filter=report_filter, group_by=group_by)
+
+    assert rollup.verify(sample_size=3) == [], 'Derived counts differ from the server counts'
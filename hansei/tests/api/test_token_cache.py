@@ -0,0 +1,43 @@
+import hashlib
+import json
+
+from hansei.constants import KOKU_DEFAULT_USER
+from hansei.token_cache import TokenCache
+
+
+def test_token_cache_password_digest(tmpdir):
+    token_cache = TokenCache(path=str(tmpdir.join('tokens')))
+    token_cache.set('http://koku', 'admin', 'pass', 'token')
+    assert token_cache.get('http://koku', 'admin', 'pass') == 'token', 'Cached token not served'
+    assert token_cache.get('http://koku', 'admin', 'other') is None, (
+        'Cached token served for another password')
+
+    entry = tmpdir.join('tokens', '{}.json'.format(TokenCache.key('http://koku', 'admin')))
+    unsalted = hashlib.sha256('{}\n{}'.format(
+        TokenCache.key('http://koku', 'admin'), 'pass').encode('utf-8')).hexdigest()
+    assert json.loads(entry.read())['password'] != unsalted, 'Password digest is not keyed'
+
+    # Another cache has another secret and cannot check the password
+    other_cache = TokenCache(path=str(tmpdir.join('other')))
+    entry.copy(tmpdir.join('other', entry.basename))
+    assert other_cache.get('http://koku', 'admin', 'pass') is None, (
+        'Password digest checked without the cache secret')
+    assert TokenCache(path=str(tmpdir.join('tokens'))).get('http://koku', 'admin', 'pass') == (
+        'token'), 'Cached token not served by another cache on the same directory'
+
+
+def test_client_token_cache(fake_koku_server, fake_koku_login, tmpdir):
+    token_cache = TokenCache(path=str(tmpdir))
+    client = fake_koku_login(token_cache=token_cache)
+    cached_client = fake_koku_login(token_cache=token_cache)
+    assert cached_client.token == client.token, 'Cached token was not reused'
+    assert len(fake_koku_server.koku.tokens) == 1, 'Second client logged in again'
+
+    # The server revoked the token
+    fake_koku_server.koku.tokens.clear()
+    response = cached_client.get_user()
+    assert response.json()['username'] == KOKU_DEFAULT_USER, (
+        'Client did not login again after receiving a 401')
+    assert len(fake_koku_server.koku.tokens) == 1, 'Client did not login again'
+    assert fake_koku_login(token_cache=token_cache).token == cached_client.token, (
+        'Token obtained by the new login was not cached')
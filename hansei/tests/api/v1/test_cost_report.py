@@ -6,6 +6,7 @@ Koku default 'test_customer' customer by running 'make oc-create-test-db-file'.
 """
 import pytest
 from hansei.koku_models import KokuCostReport, KokuCustomer
+from hansei.rollup import ReportRollup
 
 # Allowed deviation between the reported total cost and the summed up daily
 # costs.
@@ -39,20 +40,22 @@ pytest_param_all_query_param = [
     pytest.param({'resolution': 'daily', 'time_scope_value': -2, 'time_scope_units': 'month'}, [['service', '*'], ['account', '*']], id='service_account_two_months_ago-daily'),
 ]
 
+@pytest.mark.report_matrix(report_class=KokuCostReport)
 @pytest.mark.parametrize("report_filter,group_by", pytest_param_all_query_param)
-def test_validate_totalcost(session_customers, report_filter, group_by):
+def test_validate_totalcost(report_matrix, report_filter, group_by):
     """
     Test to validate the total cost across daily and monthly query parameters.
     The total cost should be equal to the sum of all the daily costs
     """
 
-    # Login as test_customer
-    for customer in session_customers.values():
-        report = KokuCostReport(customer.owner.client)
-        report.get(report_filter=report_filter, group_by=group_by)
+    # Reports fetched once per distinct query for the whole session
+    results = report_matrix.results(
+        KokuCostReport, report_filter=report_filter, group_by=group_by)
+    for result in results.values():
+        report = result.report
 
-        # Calculate sum of daily costs
-        cost_sum = report.calculate_total()
+        # Sum of daily costs
+        cost_sum = result.total
 
         if cost_sum is None:
             assert len(report.report_line_items()) == 0, (
@@ -62,3 +65,62 @@ def test_validate_totalcost(session_customers, report_filter, group_by):
                 report.total['value'] + DEVIATION, (
                 'Report total is not equal to the sum of daily costs')
 
+
+@pytest.mark.parametrize("report_filter,group_by", [
+    param for param in pytest_param_all_query_param
+    if param.id == 'service_account_two_months_ago'])
+def test_validate_totalcost_group_order(report_matrix, report_filter, group_by):
+    """
+    The report matrix only fetches the canonical group order of a query. Test
+    that the report fetched in the requested group order has the same line
+    items.
+    """
+    assert report_matrix.check_group_order(
+        KokuCostReport, report_filter=report_filter, group_by=group_by) == [], (
+        'Report in the requested group order differs from the canonical report')
+
+
+
+@pytest.mark.parametrize("report_filter,group_by", [
+    param for param in pytest_param_all_query_param
+    if param.id in ('default', 'account_service_two_months_ago-daily')])
+def test_validate_streamed_totalcost(session_customers, report_filter, group_by):
+    """
+    Test that the total cost calculated while streaming the report is equal to
+    the total cost calculated from the fully downloaded report.
+    """
+    for customer in session_customers.values():
+        report = KokuCostReport(customer.owner.client)
+        streamed_sum = report.stream_total(report_filter=report_filter, group_by=group_by)
+        streamed_total = report.total
+
+        report.get(report_filter=report_filter, group_by=group_by)
+
+        assert streamed_sum == report.calculate_total(), (
+            'Streamed sum of daily costs is not equal to the sum of daily costs')
+        assert streamed_total == report.total, (
+            'Streamed report total is not equal to the report total')
+
+
+def test_validate_rollup_totalcost(session_customers):
+    """
+    Test that the reports of every query parameter, derived locally from a few
+    daily reports, are equal to the reports returned by the server on a sample
+    of the queries. The total cost of the daily reports should be equal to the
+    sum of their daily costs.
+    """
+    for customer in session_customers.values():
+        rollup = ReportRollup(KokuCostReport, customer.owner.client)
+        for param in pytest_param_all_query_param:
+            report_filter, group_by = param.values
+            rollup.add(report_filter=report_filter, group_by=group_by)
+        rollup.fetch()
+
+        for report in rollup.bases.values():
+            cost_sum = report.calculate_total()
+            if cost_sum is not None:
+                assert report.total['value'] - DEVIATION <= cost_sum <= \
+                    report.total['value'] + DEVIATION, (
+                    'Report total is not equal to the sum of daily costs')
+
+        assert rollup.verify() == [], 'Derived reports differ from the server reports'
@@ -60,19 +60,22 @@ pytest_param_all_query_param = [
 ]
 
 
+@pytest.mark.report_matrix(report_class=KokuInstanceReport)
 @pytest.mark.parametrize("report_filter,group_by", pytest_param_all_query_param)
-def test_validate_instance_uptime(session_customers, report_filter, group_by):
+def test_validate_instance_uptime(report_matrix, report_filter, group_by):
     """Test to validate the total instance uptime across daily and monthly query
     parameters. The total instance uptime should be equal to the sum of instance
     uptime from the individual line items.
     """
 
-    for customer in session_customers.values():
-        report = KokuInstanceReport(customer.owner.client)
-        report.get(report_filter=report_filter, group_by=group_by)
+    # Reports fetched once per distinct query for the whole session
+    results = report_matrix.results(
+        KokuInstanceReport, report_filter=report_filter, group_by=group_by)
+    for result in results.values():
+        report = result.report
 
-        # Get total VM uptime of all instances by adding individual items in the report
-        vm_uptime = report.calculate_total()
+        # Total VM uptime of all instances, adding individual items in the report
+        vm_uptime = result.total
 
         if vm_uptime is None:
             assert len(report.report_line_items()) == 0, (
@@ -81,3 +84,17 @@ def test_validate_instance_uptime(session_customers, report_filter, group_by):
             assert report.total['value'] == vm_uptime, (
                 'Report total is not equal to the sum of VM uptime from \
                 individual items')
+
+
+@pytest.mark.parametrize("report_filter,group_by", [
+    param for param in pytest_param_all_query_param
+    if param.id == 'service_account_two_months_ago'])
+def test_validate_instance_uptime_group_order(report_matrix, report_filter, group_by):
+    """
+    The report matrix only fetches the canonical group order of a query. Test
+    that the report fetched in the requested group order has the same line
+    items.
+    """
+    assert report_matrix.check_group_order(
+        KokuInstanceReport, report_filter=report_filter, group_by=group_by) == [], (
+        'Report in the requested group order differs from the canonical report')
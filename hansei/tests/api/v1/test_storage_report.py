@@ -44,19 +44,22 @@ pytest_param_all_query_param = [
 ]
 
 
+@pytest.mark.report_matrix(report_class=KokuStorageReport)
 @pytest.mark.parametrize("report_filter,group_by", pytest_param_all_query_param)
-def test_validate_storage(session_customers, report_filter, group_by):
+def test_validate_storage(report_matrix, report_filter, group_by):
     """Test to validate the total storage usage across daily and monthly query
     parameters. The total storage usage should be equal to the sum of storage
     usage from the individual line items.
     """
 
-    for customer in session_customers.values():
-        report = KokuStorageReport(customer.owner.client)
-        report.get(report_filter=report_filter, group_by=group_by)
+    # Reports fetched once per distinct query for the whole session
+    results = report_matrix.results(
+        KokuStorageReport, report_filter=report_filter, group_by=group_by)
+    for result in results.values():
+        report = result.report
 
-        # Calculate sum of storage used from individual line items
-        storage_used = report.calculate_total()
+        # Sum of storage used from individual line items
+        storage_used = result.total
 
         if storage_used is None:
             assert len(report.report_line_items()) == 0, (
@@ -66,3 +69,17 @@ def test_validate_storage(session_customers, report_filter, group_by):
                 report.total['value'] + DEVIATION, (
                 'Report total is not equal to the sum of storage used from \
                 individual items')
+
+
+@pytest.mark.parametrize("report_filter,group_by", [
+    param for param in pytest_param_all_query_param
+    if param.id == 'service_account_two_months_ago'])
+def test_validate_storage_group_order(report_matrix, report_filter, group_by):
+    """
+    The report matrix only fetches the canonical group order of a query. Test
+    that the report fetched in the requested group order has the same line
+    items.
+    """
+    assert report_matrix.check_group_order(
+        KokuStorageReport, report_filter=report_filter, group_by=group_by) == [], (
+        'Report in the requested group order differs from the canonical report')
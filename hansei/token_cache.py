@@ -0,0 +1,162 @@
+# coding=utf-8
+"""On-disk cache of Koku authorization tokens.
+
+Every pytest process, xdist worker and report header hook builds its own
+``hansei.api.Client`` and logs in again. The tokens handed out by
+``token-auth/`` stay valid across processes, so they are cached under the
+XDG cache directory and shared by every client logging in to the same server
+with the same credentials.
+
+Entries are stored one file per base URL + username and are protected by a
+file lock, so concurrent processes logging in as the same user wait for the
+first one to obtain a token instead of all hitting ``token-auth/``.
+
+Passwords are never written to disk. An entry only holds an HMAC of the
+password keyed with a random secret of the cache, so that a token is only
+reused by a client supplying the same credentials, and the digest cannot be
+checked against guessed passwords without the secret.
+"""
+import contextlib
+import fcntl
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+from xdg import BaseDirectory
+
+from hansei.constants import KOKU_TOKEN_CACHE_TTL
+
+
+class TokenCache(object):
+    """Cache authorization tokens on disk, keyed by base URL and username."""
+
+    def __init__(self, path=None, ttl=KOKU_TOKEN_CACHE_TTL):
+        """
+        Arguments:
+            path - Directory holding the cache entries. Defaults to
+                ``$XDG_CACHE_HOME/hansei/tokens``
+            ttl - Number of seconds a cached token is considered valid
+        """
+        self.path = path or os.path.join(BaseDirectory.save_cache_path('hansei'), 'tokens')
+        self.ttl = ttl
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        self._secret = self._load_secret()
+
+    def _load_secret(self):
+        """Return the secret of the cache, creating it on first use.
+
+        The secret is written to a temporary file and linked in place, so
+        concurrent processes creating it all end up with the first one.
+        """
+        secret_path = os.path.join(self.path, 'secret')
+        if not os.path.exists(secret_path):
+            tmp_path = '{}.{}.tmp'.format(secret_path, os.getpid())
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as secret_file:
+                secret_file.write(secrets.token_bytes(32))
+            try:
+                os.link(tmp_path, secret_path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp_path)
+        with open(secret_path, 'rb') as secret_file:
+            return secret_file.read()
+
+    @staticmethod
+    def key(url, username):
+        """Return the cache key for a base URL and username."""
+        return hashlib.sha256('{}\n{}'.format(url, username).encode('utf-8')).hexdigest()
+
+    def _password_digest(self, key, password):
+        """Return a digest used to check the password of a cached entry.
+
+        The password itself is never written to disk, but a token must only
+        be reused by a client that supplies the same credentials.
+        """
+        return hmac.new(
+            self._secret, '{}\n{}'.format(key, password).encode('utf-8'),
+            hashlib.sha256).hexdigest()
+
+    def _entry_path(self, url, username):
+        return os.path.join(self.path, '{}.json'.format(self.key(url, username)))
+
+    @contextlib.contextmanager
+    def locked(self, url, username):
+        """Hold an exclusive lock on the entry for ``url`` and ``username``.
+
+        Other processes using the same cache block until the lock is released.
+        """
+        lock_path = '{}.lock'.format(self._entry_path(url, username))
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, url, username, password):
+        """Return the cached token, or None if missing, expired or mismatched.
+
+        Arguments:
+            url - Base URL of the Koku server
+            username - Username the token was issued to
+            password - Password that was used to obtain the token
+        """
+        try:
+            with open(self._entry_path(url, username)) as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('expires', 0) <= time.time():
+            return None
+
+        digest = self._password_digest(self.key(url, username), password)
+        if not hmac.compare_digest(entry.get('password') or '', digest):
+            return None
+
+        return entry.get('token')
+
+    def set(self, url, username, password, token):
+        """Store ``token`` for ``url`` and ``username``.
+
+        The entry is written to a temporary file and moved in place so readers
+        never see a partially written entry.
+        """
+        entry_path = self._entry_path(url, username)
+        tmp_path = '{}.{}.tmp'.format(entry_path, os.getpid())
+        entry = {
+            'token': token,
+            'expires': time.time() + self.ttl,
+            'password': self._password_digest(self.key(url, username), password),
+        }
+
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(tmp_path, entry_path)
+
+    def invalidate(self, url, username, token=None):
+        """Remove the cached entry for ``url`` and ``username``.
+
+        Arguments:
+            token - If specified, only remove the entry if it still holds this
+                token, so a token refreshed by another process is kept
+        """
+        entry_path = self._entry_path(url, username)
+        if token is not None:
+            try:
+                with open(entry_path) as entry_file:
+                    if json.load(entry_file).get('token') != token:
+                        return
+            except (OSError, ValueError):
+                return
+
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass